@@ -1,3 +1,6 @@
+import time
+from pathlib import Path
+
 from flask import Flask
 from dotenv import load_dotenv
 
@@ -36,6 +39,26 @@ def _ensure_schema_sqlite():
         db.session.execute(db.text(f"ALTER TABLE {table} ADD COLUMN updated_at DATETIME"))
     if not _has_column(table, "updated_by"):
         db.session.execute(db.text(f"ALTER TABLE {table} ADD COLUMN updated_by VARCHAR(255)"))
+    if not _has_column(table, "surum"):
+        db.session.execute(db.text(f"ALTER TABLE {table} ADD COLUMN surum INTEGER NOT NULL DEFAULT 1"))
+
+    if not _has_column("bankalar", "valor_gun"):
+        db.session.execute(db.text("ALTER TABLE bankalar ADD COLUMN valor_gun INTEGER NOT NULL DEFAULT 1"))
+    if not _has_column("bankalar", "valor_is_gunu"):
+        db.session.execute(db.text("ALTER TABLE bankalar ADD COLUMN valor_is_gunu BOOLEAN NOT NULL DEFAULT 1"))
+
+    if not _has_column("kasalar", "api_anahtari"):
+        db.session.execute(db.text("ALTER TABLE kasalar ADD COLUMN api_anahtari VARCHAR(64)"))
+    db.session.execute(db.text("CREATE UNIQUE INDEX IF NOT EXISTS ix_kasalar_api_anahtari ON kasalar (api_anahtari)"))
+
+    # Satır tablolarında z_raporu_id indeksi (create_all mevcut tabloya indeks eklemez)
+    db.session.execute(db.text("CREATE INDEX IF NOT EXISTS ix_z_kdv_satirlari_z_raporu_id ON z_kdv_satirlari (z_raporu_id)"))
+    db.session.execute(db.text("CREATE INDEX IF NOT EXISTS ix_z_pos_satirlari_z_raporu_id ON z_pos_satirlari (z_raporu_id)"))
+
+    # Z arama indeksleri (tutar, POS, kasiyer, kullanıcı, durum); arşivlerde de aynıları
+    from .zrapor.arama import INDEKSLER
+    for sql in INDEKSLER:
+        db.session.execute(db.text(sql.format(sema="main")))
 
     db.session.commit()
 
@@ -50,7 +73,28 @@ def _ensure_default_users():
     db.session.commit()
 
 
+def bootstrap_db():
+    """
+    Tek seferlik kurulum: tablolar + eksik kolonlar + default kullanıcılar.
+    create_app() bunu ÇAĞIRMAZ; `flask kurulum` (ya da run.py) ile çalıştırılır.
+    """
+    if db.engine.url.get_backend_name() == "sqlite" and db.engine.url.database:
+        Path(db.engine.url.database).parent.mkdir(parents=True, exist_ok=True)
+        # WAL kalıcıdır (dosyada saklanır): rapor okumaları Z yazmalarını bekletmez (bkz. okuma.py)
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+
+    db.create_all()
+    _ensure_schema_sqlite()
+    _ensure_default_users()
+
+    from .zrapor import arsiv
+    arsiv.kimlikleri_hazirla()
+    arsiv.indeksleri_guncelle()
+
+
 def create_app():
+    t0 = time.perf_counter()
     load_dotenv()
 
     app = Flask(__name__, template_folder="templates", static_folder="static")
@@ -78,15 +122,25 @@ def create_app():
     from .auth.routes import auth_bp
     from .admin.routes import admin_bp
     from .zrapor.routes import zrapor_bp
+    from .api.routes import api_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(admin_bp)
     app.register_blueprint(zrapor_bp)
+    app.register_blueprint(api_bp)
+    csrf.exempt(api_bp)  # kasa cihazları oturum/CSRF değil anahtar ile gelir
+
+    # Statik parmak izi/cache + yanıt sıkıştırma
+    from . import statik, sikistirma
+    statik.init_app(app)
+    sikistirma.init_app(app)
+
+    # CLI komutları (flask arsivle ...)
+    from .cli import register_commands
+    register_commands(app)
 
-    # İlk çalıştırmada DB oluştur + schema + default kullanıcı
-    with app.app_context():
-        db.create_all()
-        _ensure_schema_sqlite()
-        _ensure_default_users()
+    # Not: DB kurulumu burada yapılmaz (her worker tekrar etmesin) -> `flask kurulum`
+    app.config["CREATE_APP_MS"] = (time.perf_counter() - t0) * 1000
+    app.logger.info("create_app %.1f ms", app.config["CREATE_APP_MS"])
 
     return app
@@ -1,10 +1,15 @@
+import secrets
 from decimal import Decimal, InvalidOperation
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
 from flask_login import login_required, current_user
+from sqlalchemy.orm import joinedload
 
+from .. import isler
+from ..api.routes import anahtar_ozeti
 from ..extensions import db
-from ..models import Kasa, PosCihazi, Banka, Kasiyer
+from ..models import Kasa, PosCihazi, Banka, Kasiyer, TaramaBulgusu, TaramaDurumu
+from ..zrapor import onbellek, tarama, valor
 
 admin_bp = Blueprint("admin", __name__, url_prefix="/admin")
 
@@ -142,10 +147,36 @@ def kasa_delete(kasa_id):
 
     db.session.delete(kasa)
     db.session.commit()
+    onbellek.temizle()
     flash("Kasa silindi.", "success")
     return redirect(url_for("admin.tanimlamalar"))
 
 
+@admin_bp.post("/kasalar/api-anahtari/<int:kasa_id>")
+@login_required
+def kasa_api_anahtari(kasa_id):
+    """Yeni /api/v1 anahtarı üretir (eskisi geçersiz olur) ya da kaldırır; anahtar sadece bir kez gösterilir."""
+    if not _require_admin():
+        return redirect(url_for("zrapor.dashboard"))
+
+    kasa = db.session.get(Kasa, kasa_id)
+    if not kasa:
+        flash("Kasa bulunamadı.", "danger")
+        return redirect(url_for("admin.tanimlamalar"))
+
+    if request.form.get("islem") == "kaldir":
+        kasa.api_anahtari = None
+        db.session.commit()
+        flash(f"Kasa {kasa.kasa_no} API anahtarı kaldırıldı.", "success")
+        return redirect(url_for("admin.tanimlamalar"))
+
+    anahtar = secrets.token_urlsafe(32)
+    kasa.api_anahtari = anahtar_ozeti(anahtar)
+    db.session.commit()
+    flash(f"Kasa {kasa.kasa_no} API anahtarı (bir daha gösterilmeyecek): {anahtar}", "success")
+    return redirect(url_for("admin.tanimlamalar"))
+
+
 # ----------------- BANKA -----------------
 
 @admin_bp.post("/bankalar/add")
@@ -163,12 +194,48 @@ def banka_add():
         flash("Bu banka zaten var.", "danger")
         return redirect(url_for("admin.tanimlamalar"))
 
-    db.session.add(Banka(ad=ad, aktif=True))
+    valor_gun, is_gunu = _valor_ayari()
+    if valor_gun is None:
+        flash("Valör günü 0-365 arası olmalı.", "danger")
+        return redirect(url_for("admin.tanimlamalar"))
+
+    db.session.add(Banka(ad=ad, aktif=True, valor_gun=valor_gun, valor_is_gunu=is_gunu))
     db.session.commit()
     flash("Banka eklendi.", "success")
     return redirect(url_for("admin.tanimlamalar"))
 
 
+def _valor_ayari():
+    """Formdan (valor_gun, valor_is_gunu); gün geçersizse (None, None)."""
+    raw = (request.form.get("valor_gun") or "1").strip()
+    if not raw.isdigit() or int(raw) > 365:
+        return None, None
+    return int(raw), request.form.get("valor_is_gunu") == "1"
+
+
+@admin_bp.post("/bankalar/valor/<int:banka_id>")
+@login_required
+def banka_valor(banka_id):
+    if not _require_admin():
+        return redirect(url_for("zrapor.dashboard"))
+
+    banka = db.session.get(Banka, banka_id)
+    if not banka:
+        flash("Banka bulunamadı.", "danger")
+        return redirect(url_for("admin.tanimlamalar"))
+
+    valor_gun, is_gunu = _valor_ayari()
+    if valor_gun is None:
+        flash("Valör günü 0-365 arası olmalı.", "danger")
+        return redirect(url_for("admin.tanimlamalar"))
+
+    banka.valor_gun = valor_gun
+    banka.valor_is_gunu = is_gunu
+    db.session.commit()
+    flash("Banka valörü güncellendi.", "success")
+    return redirect(url_for("admin.tanimlamalar"))
+
+
 @admin_bp.post("/bankalar/toggle/<int:banka_id>")
 @login_required
 def banka_toggle(banka_id):
@@ -366,5 +433,54 @@ def pos_delete(pos_id):
 
     db.session.delete(pos)
     db.session.commit()
+    onbellek.temizle()
+    valor.temizle()
     flash("POS silindi.", "success")
     return redirect(url_for("admin.tanimlamalar"))
+
+
+# ----------------- TUTARLILIK TARAMASI -----------------
+
+@admin_bp.get("/tarama")
+@login_required
+def tarama_list():
+    if not _require_admin():
+        return redirect(url_for("zrapor.dashboard"))
+
+    kural = (request.args.get("kural") or "").strip()
+    q = TaramaBulgusu.query.options(joinedload(TaramaBulgusu.kasa))
+    if kural in tarama.KURALLAR:
+        q = q.filter_by(kural=kural)
+    bulgular = q.order_by(TaramaBulgusu.tarih.desc(), TaramaBulgusu.kasa_id.asc()).limit(500).all()
+
+    sayilar = dict(
+        db.session.query(TaramaBulgusu.kural, db.func.count(TaramaBulgusu.id))
+        .group_by(TaramaBulgusu.kural)
+        .all()
+    )
+
+    return render_template(
+        "admin_tarama.html",
+        app_title=current_app.config["APP_TITLE"],
+        bulgular=bulgular,
+        sayilar=sayilar,
+        kurallar=tarama.KURALLAR,
+        kural=kural,
+        durum=db.session.get(TaramaDurumu, 1),
+        calisiyor=isler.calisiyor_mu("tarama"),
+    )
+
+
+@admin_bp.post("/tarama/calistir")
+@login_required
+def tarama_calistir():
+    if not _require_admin():
+        return redirect(url_for("zrapor.dashboard"))
+
+    # Tarama istekte değil, "flask tarama" olarak arka planda çalışır
+    tam = request.form.get("tam") == "1"
+    if isler.baslat("tarama", "tarama", *(["--tam"] if tam else [])):
+        flash("Tarama başlatıldı; bitince sonuçlar bu sayfada görünür.", "success")
+    else:
+        flash("Tarama zaten çalışıyor.", "danger")
+    return redirect(url_for("admin.tarama_list"))
@@ -0,0 +1,237 @@
+"""
+Kasa cihazları için JSON API (/api/v1).
+
+Kimlik: "Authorization: Bearer <anahtar>"; anahtar admin ekranından kasa başına
+üretilir, DB'de sadece SHA-256 özeti tutulur. Oturum/CSRF yok (blueprint CSRF
+dışında). Anahtar hangi kasaya aitse Z'ler o kasaya yazılır.
+
+POST /api/v1/z: tek Z (nesne), liste ya da {"zler": [...]}.
+(tarih, kasa, vardiya) üzerinde idempotent: aynı veri tekrar gönderilirse
+(Z kilitli olsa da) yazma yapılmaz ("degismedi"); farklıysa Z güncellenir. Her
+Z ayrı kısa bir transaction'da kaydedilir (kayit.z_raporu_kaydet), biri
+hatalıysa diğerleri etkilenmez; yanıt Z başına sonuç listesidir.
+
+Yazma, okunan sürüme (ya da girdideki "surum"a) göre yapılır; arada başka biri
+(ör. muhasebe) Z'yi kaydettiyse üzerine yazılmaz, "cakisma" ve güncel sürüm
+döner. Cihaz güncel veriyle (isterse o sürümle) tekrar gönderir.
+"""
+import hashlib
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from flask import Blueprint, current_app, g, jsonify, request
+from sqlalchemy import select
+
+from ..extensions import db
+from ..models import Kasa, Kasiyer, PosCihazi, ZKdvSatiri, ZPosSatiri, ZRaporu
+from ..zrapor.arsiv import arsivlenmis_mi
+from ..zrapor.kayit import KayitHatasi, SurumCakismasi, z_raporu_kaydet
+from ..zrapor.onbellek import tarih_degisti
+from ..zrapor.services import KDV_KODLARI
+
+api_bp = Blueprint("api", __name__, url_prefix="/api/v1")
+
+_SIFIR = Decimal("0.00")
+# Numeric(14, 2): en fazla 12 tam basamak
+_TUTAR_SINIRI = Decimal("1e12")
+_CAKISMA_MESAJI = "Z bu gönderim sırasında başka biri tarafından kaydedildi; güncel sürümle tekrar gönderin."
+
+
+class GecersizZ(Exception):
+    pass
+
+
+def anahtar_ozeti(anahtar: str) -> str:
+    return hashlib.sha256(anahtar.encode("utf-8")).hexdigest()
+
+
+def _hata(mesaj, durum):
+    return jsonify({"hata": mesaj}), durum
+
+
+@api_bp.before_request
+def _kasa_dogrula():
+    yetki = request.headers.get("Authorization", "")
+    if not yetki.startswith("Bearer ") or not yetki[7:].strip():
+        return _hata("Anahtar gerekli (Authorization: Bearer ...).", 401)
+    kasa = Kasa.query.filter_by(api_anahtari=anahtar_ozeti(yetki[7:].strip())).first()
+    if not kasa:
+        return _hata("Anahtar geçersiz.", 401)
+    if not kasa.aktif:
+        return _hata("Kasa pasif.", 403)
+    g.kasa = kasa
+
+
+def _int(deger):
+    if isinstance(deger, int) and not isinstance(deger, bool):
+        return deger
+    s = str(deger if deger is not None else "").strip()
+    return int(s) if s.isdigit() else None
+
+
+def _tutar(deger, alan) -> Decimal:
+    """JSON tutarı: sayı ya da "1234.56" (ondalık nokta); boş -> 0."""
+    if deger is None or deger == "":
+        return _SIFIR
+    if isinstance(deger, bool):
+        raise GecersizZ(f"{alan}: tutar hatalı.")
+    try:
+        val = Decimal(str(deger).strip())
+    except InvalidOperation:
+        raise GecersizZ(f"{alan}: tutar hatalı.")
+    if not val.is_finite() or val < 0:
+        raise GecersizZ(f"{alan}: tutar hatalı.")
+    # Numeric(14, 2) sınırı: quantize'dan önce ("1e30" quantize'da InvalidOperation verir)
+    # ve sonra (yuvarlama 12 basamağı aşabilir)
+    if val >= _TUTAR_SINIRI or val.quantize(_SIFIR) >= _TUTAR_SINIRI:
+        raise GecersizZ(f"{alan}: tutar çok büyük.")
+    return val.quantize(_SIFIR)
+
+
+def _coz(veri, kasa, kasiyerler, poslar):
+    """Tek Z girdisi -> z_raporu_kaydet argümanları; hatalıysa GecersizZ."""
+    if not isinstance(veri, dict):
+        raise GecersizZ("Z bir JSON nesnesi olmalı.")
+    try:
+        tarih = datetime.strptime(str(veri.get("tarih") or ""), "%Y-%m-%d").date()
+    except ValueError:
+        raise GecersizZ("tarih hatalı (YYYY-AA-GG).")
+    vardiya = _int(veri.get("vardiya", 1))
+    if vardiya not in (1, 2, 3):
+        raise GecersizZ("vardiya 1, 2 ya da 3 olmalı.")
+    if veri.get("fm_no") and kasa.fm_no and str(veri["fm_no"]) != kasa.fm_no:
+        raise GecersizZ("fm_no bu kasaya ait değil.")
+    if arsivlenmis_mi(tarih):
+        raise GecersizZ("Bu yıl arşive taşındı. Kapanmış yıla giriş yapılamaz.")
+    kasiyer_id = _int(veri.get("kasiyer_id"))
+    if kasiyer_id not in kasiyerler:
+        raise GecersizZ("kasiyer_id bulunamadı.")
+    surum = veri.get("surum")
+    if surum is not None and _int(surum) is None:
+        raise GecersizZ("surum hatalı.")
+
+    kdv_veri = veri.get("kdv") or {}
+    pos_veri = veri.get("pos") or {}
+    if not isinstance(kdv_veri, dict) or not isinstance(pos_veri, dict):
+        raise GecersizZ("kdv ve pos nesne olmalı.")
+    bilinmeyen = set(kdv_veri) - set(KDV_KODLARI)
+    if bilinmeyen:
+        raise GecersizZ(f"Bilinmeyen KDV kodu: {', '.join(sorted(bilinmeyen))}")
+
+    kdv = {kod: _tutar(kdv_veri.get(kod), kod) for kod in KDV_KODLARI}
+    pos = {}
+    for pos_no, deger in pos_veri.items():
+        if str(pos_no) not in poslar:
+            raise GecersizZ(f"POS bulunamadı: {pos_no}")
+        brut = _tutar(deger, pos_no)
+        if brut > 0:
+            pos[poslar[str(pos_no)]] = brut
+
+    return {
+        "tarih": tarih,
+        "kasa_id": kasa.id,
+        "vardiya": vardiya,
+        "kasiyer_id": kasiyer_id,
+        "fis": _tutar(veri.get("fis_ciro"), "fis_ciro"),
+        "fatura": _tutar(veri.get("fatura_ciro"), "fatura_ciro"),
+        "iade": _tutar(veri.get("iade_tutar"), "iade_tutar"),
+        "kdv": kdv,
+        "pos": pos,
+        # cihazın gördüğü sürüm (yoksa kayıt anında okunan)
+        "surum": _int(surum) if surum is not None else None,
+    }
+
+
+def _ayni_mi(z, a) -> bool:
+    """Mevcut Z, gelen veriyle birebir aynı mı (tekrar gönderim)."""
+    if (z.kasiyer_id, z.fis_ciro, z.fatura_ciro, z.iade_tutar) != (a["kasiyer_id"], a["fis"], a["fatura"], a["iade"]):
+        return False
+    kdv = dict(db.session.execute(
+        select(ZKdvSatiri.oran_kodu, ZKdvSatiri.matrah).where(ZKdvSatiri.z_raporu_id == z.id)
+    ).all())
+    if {k: kdv.get(k, _SIFIR) for k in KDV_KODLARI} != a["kdv"]:
+        return False
+    pos = dict(db.session.execute(
+        select(ZPosSatiri.pos_cihaz_id, ZPosSatiri.brut_tutar).where(ZPosSatiri.z_raporu_id == z.id)
+    ).all())
+    return pos == a["pos"]
+
+
+def _kaydet(a, kullanici):
+    """dönüş: (durum, z_id, surum); arada başka yazma olduysa SurumCakismasi"""
+    z = ZRaporu.query.filter_by(tarih=a["tarih"], kasa_id=a["kasa_id"], vardiya=a["vardiya"]).first()
+    # tekrar gönderim: kilitli Z için de "degismedi" (kilit kontrolünden önce)
+    if z and _ayni_mi(z, a):
+        db.session.rollback()
+        return "degismedi", z.id, z.surum
+    durum = "guncellendi" if z else "yeni"
+    beklenen = a["surum"] if a["surum"] is not None else (z.surum if z else 0)
+
+    z = z_raporu_kaydet(
+        a["tarih"], a["kasa_id"], a["vardiya"], a["kasiyer_id"],
+        a["fis"], a["fatura"], a["iade"], a["kdv"], a["pos"], kullanici, beklenen,
+    )
+    return durum, z.id, z.surum
+
+
+@api_bp.post("/z")
+def z_gonder():
+    govde = request.get_json(silent=True)
+    if isinstance(govde, dict) and "zler" in govde:
+        govde = govde["zler"]
+    zler = govde if isinstance(govde, list) else [govde]
+    if govde is None or not zler:
+        return _hata("Gövde JSON Z nesnesi ya da listesi olmalı.", 400)
+    if len(zler) > current_app.config["API_MAX_PARTI"]:
+        return _hata(f"Bir istekte en fazla {current_app.config['API_MAX_PARTI']} Z gönderilebilir.", 413)
+
+    kasa = g.kasa
+    kullanici = f"kasa-{kasa.kasa_no}"
+    kasiyerler = set(db.session.scalars(select(Kasiyer.id).where(Kasiyer.aktif.is_(True))))
+    poslar = dict(db.session.execute(
+        select(PosCihazi.pos_no, PosCihazi.id).where(PosCihazi.aktif.is_(True), PosCihazi.pos_no.is_not(None))
+    ).all())
+
+    sonuclar = []
+    degisen_tarihler = set()
+    for i, veri in enumerate(zler):
+        sonuc = {"sira": i}
+        if isinstance(veri, dict):
+            sonuc.update(tarih=veri.get("tarih"), vardiya=veri.get("vardiya", 1))
+        try:
+            a = _coz(veri, kasa, kasiyerler, poslar)
+            durum, z_id, surum = _kaydet(a, kullanici)
+            sonuc.update(durum=durum, z_id=z_id, surum=surum)
+            if durum != "degismedi":
+                degisen_tarihler.add(a["tarih"])
+        except SurumCakismasi as e:
+            # son yazan kazanmaz: cihaz güncel sürümü görüp tekrar gönderir
+            db.session.rollback()
+            sonuc.update(durum="cakisma", hata=_CAKISMA_MESAJI, z_id=e.z_id,
+                         surum=db.session.scalar(select(ZRaporu.surum).where(ZRaporu.id == e.z_id)))
+        except (GecersizZ, KayitHatasi) as e:
+            db.session.rollback()
+            sonuc.update(durum="hata", hata=getattr(e, "mesaj", str(e)))
+        sonuclar.append(sonuc)
+
+    for tarih in degisen_tarihler:
+        tarih_degisti(tarih)
+
+    hatali = sum(1 for s in sonuclar if s["durum"] in ("hata", "cakisma"))
+    return jsonify({"kasa_no": kasa.kasa_no, "hatali": hatali, "sonuclar": sonuclar}), (
+        200 if hatali < len(sonuclar) else 422
+    )
+
+
+@api_bp.get("/kasa")
+def kasa_bilgisi():
+    """Cihaz kurulumu için: bu anahtarın kasası, geçerli KDV kodları, aktif POS ve kasiyerler."""
+    poslar = PosCihazi.query.filter(PosCihazi.aktif.is_(True), PosCihazi.pos_no.is_not(None)).order_by(PosCihazi.pos_no)
+    kasiyerler = Kasiyer.query.filter_by(aktif=True).order_by(Kasiyer.ad)
+    return jsonify({
+        "kasa_no": g.kasa.kasa_no,
+        "fm_no": g.kasa.fm_no,
+        "kdv_kodlari": KDV_KODLARI,
+        "poslar": [{"pos_no": p.pos_no, "ad": p.ad} for p in poslar],
+        "kasiyerler": [{"id": k.id, "ad": k.ad} for k in kasiyerler],
+    })
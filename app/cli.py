@@ -0,0 +1,136 @@
+"""
+Flask CLI komutları (flask --app wsgi <komut>).
+"""
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from . import isler
+from .zrapor import arsiv, onbellek
+
+
+@click.command("kurulum")
+@with_appcontext
+def kurulum_command():
+    """DB tabloları, eksik kolonlar ve default kullanıcılar (tek seferlik)."""
+    from . import bootstrap_db
+
+    t0 = time.perf_counter()
+    bootstrap_db()
+    click.echo(f"Kurulum tamam ({(time.perf_counter() - t0) * 1000:.1f} ms)")
+    click.echo(f"create_app: {current_app.config['CREATE_APP_MS']:.1f} ms")
+
+
+@click.command("arsivle")
+@click.argument("yil", type=int)
+@click.option("--vacuum", is_flag=True, help="Taşımadan sonra sıcak DB'yi VACUUM et.")
+@with_appcontext
+def arsivle_command(yil, vacuum):
+    """Kapanmış bir yılın Z kayıtlarını arşiv DB'sine taşır."""
+    try:
+        sayac = arsiv.yili_arsivle(yil, vacuum=vacuum)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    # detay linkleri arşiv adresine döner
+    onbellek.temizle()
+
+    click.echo(f"{yil} arşivlendi -> {arsiv.arsiv_yolu(yil)}")
+    for tablo, adet in sayac.items():
+        click.echo(f"  {tablo}: {adet} satır")
+
+
+@click.command("arsiv-listesi")
+@with_appcontext
+def arsiv_listesi_command():
+    """Diskteki yıl arşivlerini listeler."""
+    yillar = arsiv.arsiv_yillari()
+    if not yillar:
+        click.echo("Arşiv yok.")
+        return
+    for yil in yillar:
+        click.echo(f"{yil}  {arsiv.arsiv_yolu(yil)}")
+
+
+@click.command("aylik-paket")
+@click.argument("ay")
+@click.option("--cikti", type=click.Path(dir_okay=False), help="Çıktı dosyası (varsayılan instance/paketler/).")
+@click.option("--isci", type=int, default=None, help="Process sayısı (varsayılan: PAKET_ISCI ya da CPU sayısı).")
+@with_appcontext
+def aylik_paket_command(ay, cikti, isci):
+    """Ayın (YYYY-AA) tüm Z detaylarını tek yazdırılabilir HTML'e render eder."""
+    from .zrapor import paket
+
+    try:
+        start, end = paket.ay_araligi(ay)
+    except ValueError:
+        raise click.ClickException("Ay formatı YYYY-AA olmalı.")
+
+    isci = isci or current_app.config["PAKET_ISCI"]
+    try:
+        with isler.kilit(f"paket-{ay}"):
+            sonuc = paket.paket_olustur(start, end, cikti or paket.varsayilan_cikti(start, end), isci=isci)
+    except isler.IsCalisiyor:
+        raise click.ClickException(f"{ay} paketi zaten üretiliyor.")
+    click.echo(f"{sonuc['adet']} rapor, {sonuc['sure']:.1f} sn -> {sonuc['yol']}")
+
+
+@click.command("tarama")
+@click.option("--tam", is_flag=True, help="Tüm geçmişi baştan tara (varsayılan: sadece değişenler).")
+@click.option("--isci", type=int, default=1, help="Paralel process sayısı.")
+@click.option("--parca", type=int, default=1000, help="Parça boyutu (Z sayısı).")
+@with_appcontext
+def tarama_command(tam, isci, parca):
+    """Z tutarlılık/anomali taraması; bulgular tarama_bulgulari tablosuna yazılır."""
+    from .zrapor import tarama
+
+    try:
+        with isler.kilit("tarama"):
+            sonuc = tarama.tara(tam=tam, isci=isci, parca=parca)
+    except isler.IsCalisiyor:
+        raise click.ClickException("Tarama zaten çalışıyor.")
+    click.echo(f"{sonuc['taranan']} Z tarandı, {sonuc['bulgu']} bulgu, {sonuc['sure_ms']} ms")
+
+
+@click.command("onbellek")
+@click.option("--temizle", is_flag=True, help="Tüm kayıtları sil.")
+@with_appcontext
+def onbellek_command(temizle):
+    """Rapor önbelleği isabet/ıska sayaçları."""
+    if temizle:
+        onbellek.temizle()
+    ist = onbellek.istatistik()
+    toplam = ist["isabet"] + ist["iska"]
+    oran = f"{ist['isabet'] / toplam:.0%}" if toplam else "-"
+    click.echo(f"{ist['tur']}: {ist['adet']} kayıt, isabet {ist['isabet']}, ıska {ist['iska']} ({oran})")
+
+
+@click.command("eku-aktar")
+@click.argument("yollar", nargs=-1, required=True, type=click.Path(exists=True))
+@click.option("--isci", type=int, default=1, help="Dosyaları çözen process sayısı.")
+@click.option("--kuru", is_flag=True, help="Sadece çöz ve say, DB'ye yazma.")
+@with_appcontext
+def eku_aktar_command(yollar, isci, kuru):
+    """EKÜ/Z dışa aktarım dosyalarından Z'leri aktarır (kasa FM no ile eşlenir)."""
+    from .zrapor import eku
+
+    sonuc = eku.aktar(yollar, isci=isci, kuru=kuru)
+    click.echo(
+        f"{sonuc['dosya']} dosya, {sonuc['z']} Z: {sonuc['yeni']} yeni, {sonuc['guncel']} güncellendi, "
+        f"{sonuc['atlandi']} daha önce aktarılmış, {sonuc['hata']} hata ({sonuc['sure']:.1f} sn)"
+    )
+    for mesaj in sonuc["hatalar"][:20]:
+        click.echo(f"  {mesaj}")
+    if len(sonuc["hatalar"]) > 20:
+        click.echo(f"  ... {len(sonuc['hatalar']) - 20} hata daha")
+
+
+def register_commands(app):
+    app.cli.add_command(kurulum_command)
+    app.cli.add_command(arsivle_command)
+    app.cli.add_command(arsiv_listesi_command)
+    app.cli.add_command(aylik_paket_command)
+    app.cli.add_command(tarama_command)
+    app.cli.add_command(onbellek_command)
+    app.cli.add_command(eku_aktar_command)
@@ -7,9 +7,40 @@ class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY", "dev-secret-change-me")
 
     # SQLite'a KİLİTLE (bu projede Postgres istemiyoruz)
-    default_db_path = BASE_DIR / "instance" / "atik.db"
+    default_db_path = Path(os.environ.get("ATIK_DB_YOLU") or BASE_DIR / "instance" / "atik.db")
     SQLALCHEMY_DATABASE_URI = f"sqlite:///{default_db_path}"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Yazma kilidi için bekleme (sn); aşılırsa "database is locked"
+    SQLALCHEMY_ENGINE_OPTIONS = {"connect_args": {"timeout": float(os.environ.get("SQLITE_BEKLEME", "15"))}}
+
+    # GET rapor uçları için salt okunur engine ("acik" / "kapali"), bkz. app/okuma.py
+    OKUMA_MOTORU = os.environ.get("OKUMA_MOTORU", "acik")
+    OKUMA_HAVUZ_BOYUT = int(os.environ.get("OKUMA_HAVUZ_BOYUT", "5"))
+    OKUMA_HAVUZ_TASMA = int(os.environ.get("OKUMA_HAVUZ_TASMA", "10"))
+
+    # Kapanmış yılların arşiv DB'leri (atik_<yil>.db), bkz. app/zrapor/arsiv.py
+    ARSIV_DIZINI = os.environ.get("ARSIV_DIZINI", str(BASE_DIR / "instance" / "arsiv"))
+
+    # Canlı akış (SSE): bağlantı ömrü ve yoklama aralığı (sn)
+    CANLI_AKIS_SURESI = int(os.environ.get("CANLI_AKIS_SURESI", "300"))
+    CANLI_ARALIK = float(os.environ.get("CANLI_ARALIK", "1.0"))
+    # Worker process başına en fazla açık akış (her biri bir thread tutar; GUNICORN_THREADS'in altında kalmalı)
+    CANLI_MAX_AKIS = int(os.environ.get("CANLI_MAX_AKIS", "8"))
+    # Sınır doluyken tarayıcının yeniden deneme aralığı (sn)
+    CANLI_DOLU_BEKLEME = float(os.environ.get("CANLI_DOLU_BEKLEME", "30"))
+
+    # Aylık paket render process sayısı (boş: CPU sayısı)
+    PAKET_ISCI = int(os.environ["PAKET_ISCI"]) if os.environ.get("PAKET_ISCI") else None
+
+    # /raporlar sonuç önbelleği: "sqlite" (worker'lar arası ortak), "bellek", "kapali"
+    RAPOR_ONBELLEK = os.environ.get("RAPOR_ONBELLEK", "sqlite")
+    RAPOR_ONBELLEK_YOLU = os.environ.get("RAPOR_ONBELLEK_YOLU", str(BASE_DIR / "instance" / "onbellek.db"))
+    RAPOR_ONBELLEK_BOYUT = int(os.environ.get("RAPOR_ONBELLEK_BOYUT", "64"))
+    # Bundan geniş aralıklar önbelleğe alınmaz, akış olarak render edilir (gün)
+    RAPOR_ONBELLEK_MAX_GUN = int(os.environ.get("RAPOR_ONBELLEK_MAX_GUN", "92"))
+
+    # /api/v1/z: bir istekte en fazla kaç Z
+    API_MAX_PARTI = int(os.environ.get("API_MAX_PARTI", "200"))
 
     APP_TITLE = "Atik Muhasebe | Ertan Market - Z Rapor Akışı"
     APP_SUBTITLE = "Ertan Market günlük Z raporlarını girer, Atik Muhasebe her yerden anlık erişir."
@@ -0,0 +1,123 @@
+"""
+Arka plan işleri: uzun işler (aylık paket, tarama) web isteğinde değil, ayrı
+bir process'te ilgili CLI komutu olarak çalışır (flask --app wsgi <komut>).
+
+Aynı iş için tek process: komut çalıştığı sürece instance/isler/<ad>.kilit
+üzerinde flock tutar (kilit()); process ölürse kilit kendiliğinden bırakılır.
+baslat() kilidi kendisi alıp açık dosyayı alt process'e devreder (başlangıç
+anında ikinci bir process açılmaz); çıktı <ad>.log'a eklenir.
+
+<ad>.hata: son çalıştırma başarıyla bitmedi. baslat() işi başlatırken yazar,
+kilit() iş başarıyla bitince siler, hata olursa hata metnini yazar; process
+yarıda ölürse dosya kalır. Dosya varken iş çalışmıyorsa iş başarısız olmuştur.
+"""
+import fcntl
+import os
+import subprocess
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+from flask import current_app
+
+from .config import BASE_DIR
+
+
+class IsCalisiyor(Exception):
+    pass
+
+
+def _kilit_yolu(ad: str) -> Path:
+    d = Path(current_app.instance_path) / "isler"
+    d.mkdir(parents=True, exist_ok=True)
+    return d / f"{ad}.kilit"
+
+
+def _hata_yolu(ad: str) -> Path:
+    return _kilit_yolu(ad).with_suffix(".hata")
+
+
+def _kilitle(ad: str):
+    """Açık dosya (kilit tutuluyor) ya da None (başka process tutuyor)."""
+    f = open(_kilit_yolu(ad), "a")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        f.close()
+        return None
+    return f
+
+
+_DEVREDILEN = "ATIK_IS_KILIDI"
+
+
+@contextmanager
+def kilit(ad: str):
+    """İş boyunca kilidi tutar; iş zaten çalışıyorsa IsCalisiyor."""
+    if os.environ.get(_DEVREDILEN) == ad:
+        # baslat() ile açıldık: kilit miras alınan dosyada, process bitince bırakılır
+        f = None
+    else:
+        f = _kilitle(ad)
+        if f is None:
+            raise IsCalisiyor(ad)
+    try:
+        yield
+    except Exception as e:
+        _hata_yolu(ad).write_text(f"{type(e).__name__}: {e}\n")
+        raise
+    else:
+        _hata_yolu(ad).unlink(missing_ok=True)
+    finally:
+        if f is not None:
+            f.close()
+
+
+def calisiyor_mu(ad: str) -> bool:
+    f = _kilitle(ad)
+    if f is None:
+        return True
+    f.close()
+    return False
+
+
+def hata(ad: str) -> str | None:
+    """
+    Son çalıştırma başarısız olduysa hata metni; iş çalışırken None.
+    """
+    if calisiyor_mu(ad):
+        return None
+    try:
+        return _hata_yolu(ad).read_text().strip() or "İş başarısız oldu."
+    except FileNotFoundError:
+        return None
+
+
+def hatayi_temizle(ad: str) -> None:
+    """Başarısız işin kaydını siler (yeniden denemeden önce)."""
+    if not calisiyor_mu(ad):
+        _hata_yolu(ad).unlink(missing_ok=True)
+
+
+def baslat(ad: str, *komut) -> bool:
+    """
+    `flask --app wsgi <komut...>` komutunu arka planda başlatır.
+    dönüş: False -> iş zaten çalışıyor
+    """
+    f = _kilitle(ad)
+    if f is None:
+        return False
+    _hata_yolu(ad).write_text(f"İş tamamlanmadan sonlandı; ayrıntı: isler/{ad}.log\n")
+    with f, open(_kilit_yolu(ad).with_suffix(".log"), "a") as gunluk:
+        subprocess.Popen(
+            [sys.executable, "-m", "flask", "--app", "wsgi", *komut],
+            cwd=BASE_DIR,
+            env={**os.environ, _DEVREDILEN: ad},
+            pass_fds=(f.fileno(),),
+            stdin=subprocess.DEVNULL,
+            stdout=gunluk,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+    current_app.logger.info("arka plan işi başladı: %s (%s)", ad, " ".join(komut))
+    return True
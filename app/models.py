@@ -25,6 +25,9 @@ class Kasa(db.Model):
     fm_no = db.Column(db.String(50), nullable=True)
     aktif = db.Column(db.Boolean, default=True, nullable=False)
 
+    # /api/v1 anahtarının SHA-256 özeti; anahtarın kendisi saklanmaz (bir kez gösterilir)
+    api_anahtari = db.Column(db.String(64), unique=True, index=True, nullable=True)
+
     def __repr__(self):
         return f"<Kasa {self.kasa_no}>"
 
@@ -36,6 +39,11 @@ class Banka(db.Model):
     ad = db.Column(db.String(120), unique=True, nullable=False)  # "Garanti", "YKB"...
     aktif = db.Column(db.Boolean, default=True, nullable=False)
 
+    # POS tahsilatının hesaba geçişi: satış günü + valor_gun (T+1, bloke 30 gün vb.)
+    valor_gun = db.Column(db.Integer, default=1, server_default="1", nullable=False)
+    # True: hafta sonu sayılmaz ve hafta sonuna düşen valör pazartesiye kayar
+    valor_is_gunu = db.Column(db.Boolean, default=True, server_default="1", nullable=False)
+
     def __repr__(self):
         return f"<Banka {self.ad}>"
 
@@ -82,6 +90,9 @@ class ZRaporu(db.Model):
     updated_at = db.Column(db.DateTime)
     updated_by = db.Column(db.String(255))
 
+    # İyimser eşzamanlılık: her UPDATE "WHERE surum = <okunan>" ile yapılır ve sürümü artırır
+    surum = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+
     pos_satirlari = db.relationship(
         "ZPosSatiri",
         back_populates="z_raporu",
@@ -97,7 +108,10 @@ class ZRaporu(db.Model):
     )
     __table_args__ = (
         UniqueConstraint("tarih", "kasa_id", "vardiya", name="uq_zraporu_tarih_kasa_vardiya"),
+        # AUTOINCREMENT: arşive taşınan id'ler sıcak DB'de tekrar verilmez (bkz. arsiv.py)
+        {"sqlite_autoincrement": True},
     )
+    __mapper_args__ = {"version_id_col": surum}
 
 
 class ZKdvSatiri(db.Model):
@@ -105,12 +119,14 @@ class ZKdvSatiri(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
 
-    z_raporu_id = db.Column(db.Integer, db.ForeignKey("z_raporlari.id"), nullable=False)
+    z_raporu_id = db.Column(db.Integer, db.ForeignKey("z_raporlari.id"), nullable=False, index=True)
     z_raporu = db.relationship("ZRaporu", back_populates="kdv_satirlari")
 
     oran_kodu = db.Column(db.String(20), nullable=False)
     matrah = db.Column(db.Numeric(14, 2), default=Decimal("0.00"), nullable=False)
 
+    __table_args__ = {"sqlite_autoincrement": True}
+
     def __repr__(self):
         return f"<ZKDV {self.oran_kodu} {self.matrah}>"
 
@@ -120,7 +136,7 @@ class ZPosSatiri(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
 
-    z_raporu_id = db.Column(db.Integer, db.ForeignKey("z_raporlari.id"), nullable=False)
+    z_raporu_id = db.Column(db.Integer, db.ForeignKey("z_raporlari.id"), nullable=False, index=True)
     z_raporu = db.relationship("ZRaporu", back_populates="pos_satirlari")
 
     # ✅ ROUTE ile uyumlu isim:
@@ -129,6 +145,8 @@ class ZPosSatiri(db.Model):
 
     brut_tutar = db.Column(db.Numeric(14, 2), default=Decimal("0.00"), nullable=False)
 
+    __table_args__ = {"sqlite_autoincrement": True}
+
     def __repr__(self):
         return f"<ZPOS {self.pos_cihaz_id} {self.brut_tutar}>"
 
@@ -141,3 +159,113 @@ class Kasiyer(db.Model):
 
     def __repr__(self):
         return f"<Kasiyer {self.ad}>"
+
+
+class ZOlay(db.Model):
+    """
+    Canlı akış (SSE) için Z değişiklik olayları.
+    Kaydeden worker yazar, tüm worker'lardaki akışlar buradan okur.
+    """
+    __tablename__ = "z_olaylari"
+
+    id = db.Column(db.Integer, primary_key=True)
+    z_raporu_id = db.Column(db.Integer, nullable=False)
+    tur = db.Column(db.String(20), nullable=False)  # kaydedildi / silindi (SSE event adı)
+    veri = db.Column(db.Text, nullable=False)  # satır özeti (JSON)
+    created_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<ZOlay {self.id} {self.tur} z={self.z_raporu_id}>"
+
+
+class TaramaBulgusu(db.Model):
+    """
+    Tutarlılık taraması bulguları (bkz. app/zrapor/tarama.py).
+    """
+    __tablename__ = "tarama_bulgulari"
+
+    id = db.Column(db.Integer, primary_key=True)
+    z_raporu_id = db.Column(db.Integer, nullable=False, index=True)
+    kural = db.Column(db.String(40), nullable=False)
+    mesaj = db.Column(db.String(255), nullable=False)
+    tarih = db.Column(db.Date, nullable=False)
+    kasa_id = db.Column(db.Integer, db.ForeignKey("kasalar.id"), nullable=False)
+    kasa = db.relationship("Kasa")
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<TaramaBulgusu {self.kural} z={self.z_raporu_id}>"
+
+
+class TaramaDurumu(db.Model):
+    """
+    Tek satır: son taramanın zamanı. Sonraki tarama sadece updated_at > son_baslangic olanlara bakar.
+    """
+    __tablename__ = "tarama_durumu"
+
+    id = db.Column(db.Integer, primary_key=True)
+    son_baslangic = db.Column(db.DateTime)
+    son_bitis = db.Column(db.DateTime)
+    taranan = db.Column(db.Integer, default=0, nullable=False)
+    sure_ms = db.Column(db.Integer, default=0, nullable=False)
+
+
+class ValorGunu(db.Model):
+    """
+    Valör önbelleği hesaplanmış (kapanmış) satış günleri; satırı olmayan gün de
+    burada işaretli olur. Z kaydı o günün kaydını siler (bkz. zrapor/valor.py).
+    """
+    __tablename__ = "valor_gunleri"
+
+    tarih = db.Column(db.Date, primary_key=True)
+
+
+class ValorGunluk(db.Model):
+    """
+    Satış günü + banka başına POS brüt/komisyon (kapanmış günler için önbellek).
+    """
+    __tablename__ = "valor_gunluk"
+
+    id = db.Column(db.Integer, primary_key=True)
+    tarih = db.Column(db.Date, nullable=False, index=True)
+    banka_id = db.Column(db.Integer, nullable=True)  # POS'a banka atanmamışsa NULL
+    brut = db.Column(db.Numeric(14, 2), nullable=False)
+    komisyon = db.Column(db.Numeric(14, 2), nullable=False)
+
+
+class EkuAktarimi(db.Model):
+    """
+    EKÜ/Z dışa aktarım dosyalarından alınmış Z'ler (bkz. zrapor/eku.py).
+    (fm_no, z_no) bir kez aktarılır; sonraki çalıştırmalar bu indeksle atlar.
+    """
+    __tablename__ = "eku_aktarimlari"
+
+    id = db.Column(db.Integer, primary_key=True)
+    fm_no = db.Column(db.String(50), nullable=False)
+    z_no = db.Column(db.Integer, nullable=False)
+    tarih = db.Column(db.Date, nullable=False)
+    vardiya = db.Column(db.Integer, nullable=False)
+    z_raporu_id = db.Column(db.Integer, nullable=False)
+    dosya = db.Column(db.String(255))
+    aktarildi_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("fm_no", "z_no", name="uq_eku_fm_z"),
+        db.Index("ix_eku_fm_tarih", "fm_no", "tarih"),
+    )
+
+
+class KdvBeyani(db.Model):
+    """
+    Kapanmış ay + KDV oran kodu başına KDV dahil brüt / net / KDV (bkz. zrapor/beyan.py).
+    Ayın satırları hep birlikte yazılır; satırı olan ay hesaplanmış sayılır.
+    """
+    __tablename__ = "kdv_beyanlari"
+
+    ay = db.Column(db.String(7), primary_key=True)  # "2026-09"
+    oran_kodu = db.Column(db.String(20), primary_key=True)
+    brut = db.Column(db.Numeric(14, 2), nullable=False)
+    net = db.Column(db.Numeric(14, 2), nullable=True)  # OZEL: oran sabit değil
+    kdv = db.Column(db.Numeric(14, 2), nullable=True)
+    z_adet = db.Column(db.Integer, nullable=False)
+    hesaplandi_at = db.Column(db.DateTime, nullable=False)
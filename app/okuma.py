@@ -0,0 +1,61 @@
+"""
+Rapor okumaları için ayrı, salt okunur SQLite engine.
+
+GET rapor uçları (raporlar, CSV, detay, valör/KDV hesapları, canlı akış)
+sorgularını bu engine'den çalıştırır: "mode=ro" URI, PRAGMA query_only ve
+kendi bağlantı havuzu (OKUMA_HAVUZ_BOYUT / OKUMA_HAVUZ_TASMA). Z kayıtları
+birincil engine'de kalır; uzun bir rapor birincil havuzdan bağlantı tutmaz.
+DB WAL modunda (flask kurulum) olduğundan okuyucu yazanı, yazan okuyucuyu
+beklemez.
+
+OKUMA_MOTORU=kapali ya da dosya olmayan bir DB'de birincil engine döner.
+Engine process başına tembel kurulur (gunicorn fork'undan sonra).
+"""
+import os
+import threading
+from pathlib import Path
+from urllib.parse import quote
+
+from flask import current_app
+from sqlalchemy import create_engine, event
+
+from .extensions import db
+
+_motorlar = {}
+_kilit = threading.Lock()
+
+
+def _kur(app):
+    url = db.engine.url
+    if (app.config["OKUMA_MOTORU"] == "kapali" or url.get_backend_name() != "sqlite"
+            or not url.database or url.database == ":memory:"):
+        return db.engine
+
+    yol = quote(Path(url.database).resolve().as_posix())
+    connect_args = dict(app.config["SQLALCHEMY_ENGINE_OPTIONS"].get("connect_args", {}))
+    motor = create_engine(
+        f"sqlite:///file:{yol}?mode=ro&uri=true",
+        pool_size=app.config["OKUMA_HAVUZ_BOYUT"],
+        max_overflow=app.config["OKUMA_HAVUZ_TASMA"],
+        connect_args=connect_args,
+    )
+
+    @event.listens_for(motor, "connect")
+    def _salt_okunur(dbapi_conn, _kayit):
+        # ATTACH edilen arşivler dahil her türlü yazmayı reddeder
+        dbapi_conn.execute("PRAGMA query_only = ON")
+
+    return motor
+
+
+def motor():
+    """Bu app + process için okuma engine'i."""
+    app = current_app._get_current_object()
+    anahtar = (id(app), os.getpid())
+    m = _motorlar.get(anahtar)
+    if m is None:
+        with _kilit:
+            m = _motorlar.get(anahtar)
+            if m is None:
+                m = _motorlar[anahtar] = _kur(app)
+    return m
@@ -0,0 +1,103 @@
+"""
+Yanıt sıkıştırma (gzip, kuruluysa brotli).
+
+HTML / JSON / CSV (+ CSS/JS) yanıtları Accept-Encoding'e göre sıkıştırılır.
+Akış (streamed) yanıtlar parça parça sıkıştırılır ve her parçada flush
+edilir; tarayıcı ilk baytları beklemeden alır. SSE (text/event-stream)
+sıkıştırılmaz.
+"""
+import gzip
+import zlib
+
+from flask import request
+
+try:
+    import brotli  # opsiyonel: pip install brotli
+except ImportError:
+    brotli = None
+
+SIKISTIRILABILIR = {
+    "text/html",
+    "application/json",
+    "text/csv",
+    "text/css",
+    "text/javascript",
+    "application/javascript",
+}
+
+# Bundan küçük tamponlu yanıtlar olduğu gibi gider
+MIN_BOYUT = 500
+
+
+def _kodlama_sec():
+    kabul = request.accept_encodings
+    if brotli is not None and kabul["br"]:
+        return "br"
+    if kabul["gzip"]:
+        return "gzip"
+    return None
+
+
+def _sikistir(data: bytes, kodlama: str) -> bytes:
+    if kodlama == "br":
+        return brotli.compress(data, quality=5)
+    return gzip.compress(data, compresslevel=6)
+
+
+def _akis_sikistir(parcalar, kodlama: str):
+    """
+    Parça parça sıkıştır; her parçadan sonra flush (akış gecikmesiz kalsın).
+    İç iterable'ın close()'u mutlaka çağrılır (stream_with_context bağlamı).
+    """
+    if kodlama == "br":
+        c = brotli.Compressor(quality=5)
+        isle, flush, bitir = c.process, c.flush, c.finish
+    else:
+        c = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31: gzip başlığı
+        isle, bitir = c.compress, c.flush
+        flush = lambda: c.flush(zlib.Z_SYNC_FLUSH)  # noqa: E731
+
+    try:
+        for parca in parcalar:
+            if isinstance(parca, str):
+                parca = parca.encode("utf-8")
+            if not parca:
+                continue
+            yield isle(parca) + flush()
+        yield bitir()
+    finally:
+        kapat = getattr(parcalar, "close", None)
+        if kapat is not None:
+            kapat()
+
+
+def init_app(app):
+    @app.after_request
+    def _sikistir_yanit(response):
+        if response.mimetype not in SIKISTIRILABILIR:
+            return response
+        response.vary.add("Accept-Encoding")
+
+        if response.status_code != 200 or "Content-Encoding" in response.headers:
+            return response
+
+        kodlama = _kodlama_sec()
+        if kodlama is None:
+            return response
+
+        if response.is_streamed or response.direct_passthrough:
+            response.response = _akis_sikistir(response.response, kodlama)
+            response.direct_passthrough = False
+            response.headers.pop("Content-Length", None)
+        else:
+            data = response.get_data()
+            if len(data) < MIN_BOYUT:
+                return response
+            response.set_data(_sikistir(data, kodlama))
+
+        response.headers["Content-Encoding"] = kodlama
+        # sıkıştırılmış gövde farklı bayt dizisi: ETag zayıf olmalı (304'ler çalışmaya devam eder)
+        etag, zayif = response.get_etag()
+        if etag and not zayif:
+            response.set_etag(etag, weak=True)
+        return response
@@ -0,0 +1,74 @@
+// /raporlar canlı güncelleme: SSE ile gelen Z satırını yerinde güncelle/ekle.
+(function(){
+  const tablo = document.getElementById("raporTablo");
+  if (!tablo || !window.EventSource) return;
+
+  const tbody = tablo.querySelector("tbody");
+  const start = tablo.dataset.start;
+  const end = tablo.dataset.end;
+  const kasaId = tablo.dataset.kasaId;
+  const detayUrl = tablo.dataset.detayUrl;
+  const ALANLAR = ["fis", "fatura", "iade", "nihai", "kdv", "pos_brut", "komisyon", "pos_net"];
+
+  function fmt(v){ return Number(v || 0).toFixed(2); }
+
+  function satirHtml(d){
+    const hucreler = ALANLAR.map(a => {
+      const v = fmt(d[a]);
+      return `<td data-alan="${a}" data-v="${v}">${a === "nihai" ? `<b>${v}</b>` : v}</td>`;
+    }).join("");
+    return `<td>${d.tarih}</td><td>Kasa ${d.kasa_no}</td>${hucreler}` +
+      `<td><a href="${detayUrl.replace(/0$/, String(d.id))}">Detay</a></td>`;
+  }
+
+  // sıralama: tarih azalan, kasa artan (sunucu ile aynı)
+  function onceGelir(d, tr){
+    const t = tr.dataset.tarih;
+    if (d.tarih !== t) return d.tarih > t;
+    return Number(d.kasa_no) < Number(tr.dataset.kasaNo);
+  }
+
+  function toplamlariYenile(){
+    const top = {};
+    ALANLAR.forEach(a => top[a] = 0);
+    tbody.querySelectorAll("td[data-alan]").forEach(td => {
+      top[td.dataset.alan] += Number(td.dataset.v || 0);
+    });
+    tablo.querySelectorAll("tfoot [data-toplam]").forEach(th => {
+      th.textContent = fmt(top[th.dataset.toplam]);
+    });
+  }
+
+  function uygula(d){
+    if (d.tarih < start || d.tarih > end) return;
+    if (kasaId && String(d.kasa_id) !== kasaId) return;
+
+    let tr = tbody.querySelector(`tr[data-z-id="${d.id}"][data-arsiv=""]`);
+    if (!tr){
+      const bos = tbody.querySelector("tr.emptyRow");
+      if (bos) bos.remove();
+      tr = document.createElement("tr");
+      tr.dataset.zId = d.id;
+      tr.dataset.arsiv = "";
+      const sonraki = [...tbody.querySelectorAll("tr[data-z-id]")].find(x => onceGelir(d, x));
+      tbody.insertBefore(tr, sonraki || null);
+    }
+    tr.dataset.tarih = d.tarih;
+    tr.dataset.kasaNo = d.kasa_no;
+    tr.innerHTML = satirHtml(d);
+    toplamlariYenile();
+  }
+
+  const es = new EventSource(tablo.dataset.canliUrl);
+  es.addEventListener("kaydedildi", e => {
+    try { uygula(JSON.parse(e.data)); } catch (err) { /* bozuk olay: yok say */ }
+  });
+  // bırakılan autosave taslağı silindi
+  es.addEventListener("silindi", e => {
+    try {
+      const d = JSON.parse(e.data);
+      const tr = tbody.querySelector(`tr[data-z-id="${d.id}"][data-arsiv=""]`);
+      if (tr){ tr.remove(); toplamlariYenile(); }
+    } catch (err) { /* bozuk olay: yok say */ }
+  });
+})();
@@ -0,0 +1,402 @@
+// z_giris.html: POS satır ekranı, takvim ve toplamlar.
+// POS listesi sayfada window.__POS_DATA__ olarak gelir.
+
+// --- yardımcı: TR sayı parse/format ---
+function parseTR(v){
+  if(!v) return 0;
+  let s = String(v).trim();
+  if(!s) return 0;
+  s = s.replace(/\./g,'').replace(',', '.');
+  const n = Number(s);
+  return isFinite(n) ? n : 0;
+}
+function fmtTR(n){
+  try{
+    return (n || 0).toLocaleString('tr-TR', { minimumFractionDigits: 2, maximumFractionDigits: 2 });
+  }catch(e){
+    return (n || 0).toFixed(2);
+  }
+}
+
+// --- Takvim tıklayınca tarih doldur ---
+(function(){
+  const tarihInput = document.getElementById("tarih");
+  document.querySelectorAll(".cal-day").forEach(btn => {
+    btn.addEventListener("click", () => {
+      const d = btn.getAttribute("data-date");
+      if (tarihInput) tarihInput.value = d;
+    });
+  });
+})();
+
+// --- POS satır ekranı (Banka -> POS -> Tutar -> +) ---
+const POS = (window.__POS_DATA__ || []);
+const bankSelect = document.getElementById("bankSelect");
+const posSelect = document.getElementById("posSelect");
+const posAmount = document.getElementById("posAmount");
+const posRowsTbody = document.getElementById("posRows");
+
+// Bankaları POS listesinden çıkar
+const banksMap = new Map();
+POS.forEach(p => {
+  const key = String(p.banka_id || 0);
+  if (p.banka_id && !banksMap.has(key)) banksMap.set(key, { id: p.banka_id, ad: p.banka_ad });
+});
+
+// bankSelect doldur
+[...banksMap.values()].sort((a,b)=> (a.ad||"").localeCompare(b.ad||"", 'tr'))
+  .forEach(b => {
+    const opt = document.createElement("option");
+    opt.value = String(b.id);
+    opt.textContent = b.ad;
+    bankSelect.appendChild(opt);
+  });
+
+function rebuildPosOptions(){
+  const bid = bankSelect.value;
+  posSelect.innerHTML = "";
+  if(!bid){
+    posSelect.disabled = true;
+    const opt = document.createElement("option");
+    opt.value = "";
+    opt.textContent = "Önce banka seç";
+    posSelect.appendChild(opt);
+    return;
+  }
+  posSelect.disabled = false;
+  const opt0 = document.createElement("option");
+  opt0.value = "";
+  opt0.textContent = "POS seç";
+  posSelect.appendChild(opt0);
+
+  POS.filter(p => String(p.banka_id) === String(bid))
+    .sort((a,b)=> (a.ad||"").localeCompare(b.ad||"", 'tr'))
+    .forEach(p => {
+      const opt = document.createElement("option");
+      opt.value = String(p.id);
+      opt.textContent = p.pos_no ? `${p.ad} (${p.pos_no})` : p.ad;
+      posSelect.appendChild(opt);
+    });
+}
+
+bankSelect.addEventListener("change", rebuildPosOptions);
+rebuildPosOptions();
+
+const usedPosIds = []; // tekrar kontrolü için
+const posLines = [];   // {pos_id, amount}
+
+function updateHiddenPosInputs(){
+  // her pos_{id} hidden input'unu sıfırla
+  POS.forEach(p => {
+    const el = document.getElementById("posHidden_" + p.id);
+    if (el) el.value = "0";
+  });
+
+  // satırlardaki tutarları pos_id bazında topla
+  const sums = new Map();
+  posLines.forEach(line => {
+    const cur = sums.get(line.pos_id) || 0;
+    sums.set(line.pos_id, cur + (line.amount || 0));
+  });
+
+  sums.forEach((val, posId) => {
+    const el = document.getElementById("posHidden_" + posId);
+    if (el) el.value = fmtTR(val);
+  });
+
+  taslakPlanla();
+}
+
+function renderPosRows(){
+  posRowsTbody.innerHTML = "";
+
+  if(posLines.length === 0){
+    const tr = document.createElement("tr");
+    tr.className = "emptyRow";
+    tr.innerHTML = `<td colspan="5" class="muted" style="padding:12px;">Henüz POS satırı yok. Yukarıdan ekleyin.</td>`;
+    posRowsTbody.appendChild(tr);
+    recalcTotals();
+    return;
+  }
+
+  posLines.forEach((line, idx) => {
+    const p = POS.find(x => String(x.id) === String(line.pos_id));
+    const tr = document.createElement("tr");
+
+    tr.innerHTML = `
+      <td>${p ? (p.banka_ad || "-") : "-"}</td>
+      <td><b>${p ? (p.ad || "-") : "-"}</b></td>
+      <td class="muted">${p ? (p.pos_no || "-") : "-"}</td>
+      <td class="posCellRight">${fmtTR(line.amount || 0)}</td>
+      <td class="posCellCenter">
+        <button type="button" class="tinyBtn danger" data-del="${idx}">Sil</button>
+      </td>
+    `;
+    posRowsTbody.appendChild(tr);
+  });
+
+  // sil butonları
+  posRowsTbody.querySelectorAll("button[data-del]").forEach(btn => {
+    btn.addEventListener("click", () => {
+      const i = Number(btn.getAttribute("data-del"));
+      if (!Number.isFinite(i)) return;
+      posLines.splice(i, 1);
+      usedPosIds.splice(i, 1);
+      updateHiddenPosInputs();
+      renderPosRows();
+    });
+  });
+
+  recalcTotals();
+}
+
+function recalcTotals(){
+  // KDV toplam
+  let kdvTop = 0;
+  document.querySelectorAll('input.kdv').forEach(i => kdvTop += parseTR(i.value));
+
+  // POS toplam (satırlardan)
+  let posTop = 0;
+  posLines.forEach(l => posTop += (l.amount || 0));
+
+  // Nihai
+  const fis = parseTR(document.querySelector('[name="fis_ciro"]')?.value);
+  const fatura = parseTR(document.querySelector('[name="fatura_ciro"]')?.value);
+  const iade = parseTR(document.querySelector('[name="iade_tutar"]')?.value);
+  const nihai = fis + fatura - iade;
+
+  document.getElementById("tKdv").textContent = fmtTR(kdvTop);
+  document.getElementById("tPos").textContent = fmtTR(posTop);
+  document.getElementById("tNihai").textContent = fmtTR(nihai);
+}
+
+// POS satır ekleme
+document.getElementById("addPosRow").addEventListener("click", () => {
+  const bid = bankSelect.value;
+  const pid = posSelect.value;
+  const amt = parseTR(posAmount.value);
+
+  if(!bid){
+    alert("Banka seçmelisin.");
+    return;
+  }
+  if(!pid){
+    alert("POS seçmelisin.");
+    return;
+  }
+  if(!(amt > 0)){
+    alert("Tutar 0'dan büyük olmalı.");
+    return;
+  }
+
+  // tekrar kontrolü: aynı POS daha önce seçilmişse her seferinde sor
+  if (posLines.some(l => String(l.pos_id) === String(pid))){
+    const ok = confirm("Bu POS bu Z’de daha önce kullanılmış. Tekrar kullanmak ister misiniz?");
+    if (!ok) return;
+  }
+
+  posLines.push({ pos_id: Number(pid), amount: amt });
+
+  // input temizle
+  posAmount.value = "";
+  posSelect.value = "";
+
+  updateHiddenPosInputs();
+  renderPosRows();
+});
+
+// ciro/kdv değişince totals güncelle
+document.addEventListener("input", (e) => {
+  if (!e.target) return;
+  if (e.target.classList.contains("money") || e.target.classList.contains("kdv")){
+    recalcTotals();
+  }
+});
+
+// form submit: hidden inputlar güncel olsun
+document.getElementById("zForm").addEventListener("submit", () => {
+  updateHiddenPosInputs();
+});
+
+// ilk çizim
+renderPosRows();
+recalcTotals();
+
+// --- Taslak otomatik kayıt: sadece değişen alanlar, debounce ---
+// Aynı anda tek istek; gönderim sürerken gelen değişiklikler sonrakinde birleşir.
+const TASLAK_BEKLEME = 1500;
+let taslakZamanlayici = null;
+let taslakGonderiliyor = false;
+let taslakTekrar = false;
+let taslakAnahtar = "";
+let taslakSon = {};   // bu anahtar için son kaydedilen değerler
+let taslakCakisma = false;
+let taslakAcilan = null;      // autosave'in açtığı, Kaydet'lenmemiş Z: {anahtar, z_id, surum}
+let taslakGonderimi = null;   // uçuştaki istek (Kaydet bunu bekler)
+let surumAnahtar = null;      // form "surum" alanının ait olduğu anahtar
+let surumYuklemesi = null;    // {anahtar, p}: uçuştaki sürüm isteği
+
+function taslakAnahtari(form){
+  const t = form.elements["tarih"].value;
+  const k = form.elements["kasa_id"].value;
+  const v = form.elements["vardiya"].value;
+  return (t && k && v) ? `${t}|${k}|${v}` : null;
+}
+
+function taslakDegerleri(form){
+  // boş / sıfır -> null (ilk gönderimde hiç yollanmaz, mevcut Z ezilmez)
+  const out = {};
+  form.querySelectorAll('input.money[name], input[type="hidden"][name^="pos_"]').forEach(el => {
+    const n = parseTR(el.value);
+    out[el.name] = n > 0 ? n.toFixed(2) : null;
+  });
+  out["kasiyer_id"] = form.elements["kasiyer_id"].value || null;
+  return out;
+}
+
+// Anahtar seçilince düzenlemeye başlanan sürümü yükle (Z yoksa 0: "yeni Z").
+// Kayıt ve autosave bu sürümü gönderir; arada başkası kaydettiyse sunucu reddeder.
+function surumHazir(form){
+  const anahtar = taslakAnahtari(form);
+  if (!anahtar || anahtar === surumAnahtar) return Promise.resolve();
+  if (surumYuklemesi && surumYuklemesi.anahtar === anahtar) return surumYuklemesi.p;
+  form.elements["surum"].value = "";
+  surumAnahtar = null;
+  const [tarih, kasa_id, vardiya] = anahtar.split("|");
+  const p = fetch(`${form.dataset.surumUrl}?${new URLSearchParams({ tarih, kasa_id, vardiya })}`)
+    .then(r => r.json())
+    .then(j => {
+      if (!j.ok || taslakAnahtari(form) !== anahtar) return;
+      form.elements["surum"].value = String(j.surum);
+      surumAnahtar = anahtar;
+      taslakDurum(j.surum ? "Bu Z kayıtlı; değişiklikler mevcut Z'ye yazılır." : "");
+    })
+    .catch(() => taslakDurum("Z sürümü alınamadı (bağlantı)."))
+    .finally(() => {
+      if (surumYuklemesi && surumYuklemesi.anahtar === anahtar) surumYuklemesi = null;
+    });
+  surumYuklemesi = { anahtar, p };
+  return p;
+}
+
+// Form başka anahtara geçtiyse eski anahtarda açılan taslağı sil (değerler yeni anahtara gider)
+function taslakBirak(form){
+  const t = taslakAcilan;
+  if (!t || t.anahtar === taslakAnahtari(form)) return Promise.resolve();
+  taslakAcilan = null;
+  return fetch(form.dataset.taslakBirakUrl, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      "X-CSRFToken": form.elements["csrf_token"].value,
+    },
+    body: JSON.stringify({ z_id: t.z_id, surum: t.surum }),
+  }).catch(() => { /* silinemezse raporlarda taslak olarak kalır */ });
+}
+
+function taslakDurum(msg){
+  const el = document.getElementById("taslakDurum");
+  if (el) el.textContent = msg;
+}
+
+async function taslakGonder(){
+  const form = document.getElementById("zForm");
+  if (!form || !form.dataset.taslakUrl) return;
+  if (taslakGonderiliyor){ taslakTekrar = true; return; }
+  await surumHazir(form);
+  if (taslakGonderiliyor){ taslakTekrar = true; return; }
+
+  const anahtar = taslakAnahtari(form);
+  if (!anahtar || anahtar !== surumAnahtar) return;  // sürüm yüklenemedi: sonraki değişiklikte tekrar
+  if (anahtar !== taslakAnahtar){
+    // başka Z: sürüm yukarıda yüklendi
+    taslakAnahtar = anahtar; taslakSon = {}; taslakCakisma = false;
+  }
+  taslakBirak(form);
+  if (taslakCakisma) return;
+
+  const simdi = taslakDegerleri(form);
+  const fark = {};
+  Object.keys(simdi).forEach(ad => {
+    if (simdi[ad] === (taslakSon[ad] ?? null)) return;
+    fark[ad] = simdi[ad];
+  });
+  if (Object.keys(fark).length === 0) return;
+
+  const [tarih, kasa_id, vardiya] = anahtar.split("|");
+  const govde = {
+    tarih, kasa_id, vardiya, kasiyer_id: simdi["kasiyer_id"], surum: form.elements["surum"].value,
+    alanlar: {}, kdv: {}, pos: {},
+  };
+  Object.entries(fark).forEach(([ad, deger]) => {
+    const v = deger === null ? "0" : deger.replace(".", ",");
+    if (ad.startsWith("kdv_")) govde.kdv[ad.slice(4)] = v;
+    else if (ad.startsWith("pos_")) govde.pos[ad.slice(4)] = v;
+    else if (ad !== "kasiyer_id") govde.alanlar[ad] = v;
+  });
+
+  taslakGonderiliyor = true;
+  let bitti;
+  taslakGonderimi = new Promise(res => { bitti = res; });
+  try {
+    const r = await fetch(form.dataset.taslakUrl, {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+        "X-CSRFToken": form.elements["csrf_token"].value,
+      },
+      body: JSON.stringify(govde),
+    });
+    const j = await r.json();
+    if (r.ok && j.ok){
+      if (j.yeni) taslakAcilan = { anahtar, z_id: j.z_id, surum: j.surum };
+      else if (taslakAcilan && taslakAcilan.z_id === j.z_id) taslakAcilan.surum = j.surum;
+      if (anahtar === taslakAnahtar) Object.assign(taslakSon, fark);
+      if (anahtar === surumAnahtar) form.elements["surum"].value = j.surum;
+      taslakBirak(form);
+      taslakDurum("Taslak kaydedildi " + new Date().toLocaleTimeString("tr-TR", { hour: "2-digit", minute: "2-digit" }));
+    } else {
+      if (r.status === 409 && anahtar === taslakAnahtar) taslakCakisma = true;
+      taslakDurum(j.hata || "Taslak kaydedilemedi.");
+    }
+  } catch (e) {
+    taslakDurum("Taslak kaydedilemedi (bağlantı).");
+  } finally {
+    taslakGonderiliyor = false;
+    taslakGonderimi = null;
+    bitti();
+    if (taslakTekrar){ taslakTekrar = false; taslakPlanla(); }
+  }
+}
+
+function taslakPlanla(){
+  clearTimeout(taslakZamanlayici);
+  taslakZamanlayici = setTimeout(taslakGonder, TASLAK_BEKLEME);
+}
+
+["tarih", "kasa_id", "vardiya"].forEach(ad => {
+  const form = document.getElementById("zForm");
+  form.elements[ad].addEventListener("change", () => surumHazir(form));
+});
+document.querySelectorAll(".cal-day").forEach(btn => {
+  btn.addEventListener("click", () => surumHazir(document.getElementById("zForm")));
+});
+
+document.getElementById("zForm").addEventListener("input", taslakPlanla);
+document.getElementById("zForm").addEventListener("change", taslakPlanla);
+
+// Kaydet: bekleyen autosave iptal; uçuştaki varsa bitmesini bekle (sürüm güncellensin),
+// sürüm yüklenmediyse yükle, başka anahtarda açılmış taslak varsa önce onu sil
+document.getElementById("zForm").addEventListener("submit", (e) => {
+  clearTimeout(taslakZamanlayici);
+  taslakTekrar = false;
+  e.preventDefault();
+  const form = e.target;
+  (taslakGonderimi || Promise.resolve())
+    .then(() => surumHazir(form))
+    .then(() => taslakBirak(form))
+    .then(() => {
+      clearTimeout(taslakZamanlayici);
+      form.submit();
+    });
+});
@@ -0,0 +1,63 @@
+// Toplu Z girişi: değişen satırlar tek "veri" alanında JSON olarak gönderilir.
+(function(){
+  const form = document.getElementById("topluForm");
+  const tablo = document.getElementById("topluTablo");
+  if (!form || !tablo) return;
+
+  function alanlar(tr){
+    return Array.from(tr.querySelectorAll("[data-alan]"));
+  }
+
+  function degisti(tr){
+    if (tr.dataset.degisti === "1") return true;
+    return alanlar(tr).some(el => {
+      if (el.tagName === "SELECT") return Array.from(el.options).some(o => o.selected !== o.defaultSelected);
+      return el.value !== el.defaultValue;
+    });
+  }
+
+  function durumYaz(){
+    const n = tablo.querySelectorAll("tr.degisti").length;
+    document.getElementById("topluDurum").textContent = n ? `${n} satır değişti` : "";
+  }
+
+  function isaretle(e){
+    const tr = e.target.closest("tr[data-tarih]");
+    if (!tr) return;
+    tr.classList.toggle("degisti", degisti(tr));
+    durumYaz();
+  }
+  tablo.addEventListener("input", isaretle);
+  tablo.addEventListener("change", isaretle);
+
+  form.addEventListener("submit", (e) => {
+    const kayitlar = [];
+    tablo.querySelectorAll("tr[data-tarih]").forEach(tr => {
+      if (tr.dataset.kilitli === "1" || !degisti(tr)) return;
+      const k = {
+        tarih: tr.dataset.tarih,
+        kasa_id: tr.dataset.kasaId,
+        vardiya: tr.dataset.vardiya,
+        surum: tr.dataset.surum,
+        kdv: {},
+        pos: {},
+      };
+      alanlar(tr).forEach(el => {
+        const alan = el.dataset.alan;
+        if (alan.startsWith("kdv_")) k.kdv[alan.slice(4)] = el.value;
+        else if (alan.startsWith("pos_")) k.pos[alan.slice(4)] = el.value;
+        else k[alan] = el.value;
+      });
+      kayitlar.push(k);
+    });
+
+    if (!kayitlar.length){
+      e.preventDefault();
+      document.getElementById("topluDurum").textContent = "Değişen satır yok.";
+      return;
+    }
+    form.elements["veri"].value = JSON.stringify(kayitlar);
+  });
+
+  durumYaz();
+})();
@@ -0,0 +1,53 @@
+"""
+Statik dosya parmak izi + uzun süreli cache.
+
+url_for('static', filename=...) otomatik olarak ?v=<içerik özeti> ekler.
+Özet eşleşen isteklere 1 yıllık "immutable" Cache-Control verilir;
+dosya değişince URL değiştiği için tarayıcı yeniden indirir.
+"""
+import hashlib
+import os
+
+from flask import request
+
+# (yol, mtime) -> özet; dosya değişirse (dev) yeniden hesaplanır
+_ozet_cache = {}
+
+UZUN_CACHE = "public, max-age=31536000, immutable"
+
+
+def dosya_ozeti(static_folder: str, filename: str):
+    yol = os.path.join(static_folder, filename)
+    try:
+        mtime = os.stat(yol).st_mtime_ns
+    except OSError:
+        return None
+
+    anahtar = (yol, mtime)
+    ozet = _ozet_cache.get(anahtar)
+    if ozet is None:
+        with open(yol, "rb") as f:
+            ozet = hashlib.sha256(f.read()).hexdigest()[:12]
+        _ozet_cache[anahtar] = ozet
+    return ozet
+
+
+def init_app(app):
+    @app.url_defaults
+    def _statik_surum(endpoint, values):
+        if endpoint != "static" or "v" in values or "filename" not in values:
+            return
+        ozet = dosya_ozeti(app.static_folder, values["filename"])
+        if ozet:
+            values["v"] = ozet
+
+    @app.after_request
+    def _statik_cache(response):
+        if request.endpoint != "static" or response.status_code not in (200, 304):
+            return response
+        v = request.args.get("v")
+        filename = (request.view_args or {}).get("filename")
+        if v and filename and v == dosya_ozeti(app.static_folder, filename):
+            response.headers["Cache-Control"] = UZUN_CACHE
+            response.expires = None
+        return response
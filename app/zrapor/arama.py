@@ -0,0 +1,177 @@
+"""
+Z arama: tutar (başlık / POS / KDV satırı), POS cihazı, kasiyer, durum ve
+kullanıcıya göre; tüm geçmiş (sıcak DB + yıl arşivleri, UNION ALL).
+
+Her filtre INDEKSLER'deki bir indeksle karşılanır; satır filtreleri
+"z.id IN (SELECT z_raporu_id ...)" olarak yazılır, böylece arama satır
+indeksinden başlayıp başlıklara rowid ile gider. İndeksler sıcak DB'de
+flask kurulum, arşivlerde arşivleme (ve kurulum) sırasında oluşturulur.
+
+Tutarlar SQLite'ta INTEGER/REAL saklanır; ifade indeksinin (nihai) kolon
+tipi olmadığından sınırlar float olarak ve yarım kuruş toleransla verilir.
+"""
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import text
+
+from . import arsiv
+from .services import KDV_KODLARI, parse_try
+from .sorgular import rapor_baglantisi
+
+LIMIT = 200
+TOLERANS = 0.005
+
+DURUMLAR = {"draft": "Taslak", "submitted": "Gönderildi", "locked": "Kilitli"}
+TUTAR_ALANLARI = {"nihai": "Nihai ciro", "fis": "Fiş cirosu", "pos": "POS satırı", "kdv": "KDV satırı"}
+
+_NIHAI = "(z.fis_ciro + z.fatura_ciro - z.iade_tutar)"
+
+# {sema}: "main" ya da arşiv şeması
+INDEKSLER = [
+    "CREATE INDEX IF NOT EXISTS {sema}.ix_z_raporlari_nihai ON z_raporlari ((fis_ciro + fatura_ciro - iade_tutar))",
+    "CREATE INDEX IF NOT EXISTS {sema}.ix_z_raporlari_fis ON z_raporlari (fis_ciro)",
+    "CREATE INDEX IF NOT EXISTS {sema}.ix_z_raporlari_kasiyer ON z_raporlari (kasiyer_id, tarih)",
+    "CREATE INDEX IF NOT EXISTS {sema}.ix_z_raporlari_olusturan ON z_raporlari (created_by, tarih)",
+    "CREATE INDEX IF NOT EXISTS {sema}.ix_z_raporlari_guncelleyen ON z_raporlari (updated_by, tarih)",
+    "CREATE INDEX IF NOT EXISTS {sema}.ix_z_raporlari_durum ON z_raporlari (status, tarih)",
+    "CREATE INDEX IF NOT EXISTS {sema}.ix_z_pos_satirlari_cihaz_brut ON z_pos_satirlari (pos_cihaz_id, brut_tutar)",
+    "CREATE INDEX IF NOT EXISTS {sema}.ix_z_pos_satirlari_brut ON z_pos_satirlari (brut_tutar)",
+    "CREATE INDEX IF NOT EXISTS {sema}.ix_z_kdv_satirlari_matrah ON z_kdv_satirlari (matrah, oran_kodu)",
+]
+
+
+def tutar_oku(deger):
+    """ "1.234,56" (TR) ya da "1234.56"; boş/hatalı -> None"""
+    s = (deger or "").strip()
+    if not s:
+        return None
+    if "," in s:
+        return parse_try(s)
+    try:
+        val = Decimal(s)
+    except InvalidOperation:
+        return None
+    return val.quantize(Decimal("0.00")) if val.is_finite() and val >= 0 else None
+
+
+def _sema_sorgusu(sema, f):
+    """Tek şema için SELECT; f: doğrulanmış filtreler."""
+    kosullar = []
+    if f["start"]:
+        kosullar.append("z.tarih >= :start")
+    if f["end"]:
+        kosullar.append("z.tarih <= :end")
+    if f["kasa_id"]:
+        kosullar.append("z.kasa_id = :kasa_id")
+    if f["kasiyer_id"]:
+        kosullar.append("z.kasiyer_id = :kasiyer_id")
+    if f["status"]:
+        kosullar.append("z.status = :status")
+    if f["kullanici"]:
+        kosullar.append("(z.created_by = :kullanici OR z.updated_by = :kullanici)")
+
+    alan = f["alan"]
+    aralik = []
+    if f["min"] is not None:
+        aralik.append("{k} >= :min")
+    if f["max"] is not None:
+        aralik.append("{k} <= :max")
+
+    if alan == "nihai":
+        kosullar += [a.format(k=_NIHAI) for a in aralik]
+    elif alan == "fis":
+        kosullar += [a.format(k="z.fis_ciro") for a in aralik]
+
+    pos_kosul = [a.format(k="brut_tutar") for a in aralik] if alan == "pos" else []
+    if f["pos_cihaz_id"]:
+        pos_kosul.insert(0, "pos_cihaz_id = :pos_cihaz_id")
+    if pos_kosul:
+        kosullar.append(
+            f"z.id IN (SELECT z_raporu_id FROM {sema}.z_pos_satirlari WHERE {' AND '.join(pos_kosul)})"
+        )
+    if alan == "kdv" and (aralik or f["oran_kodu"]):
+        kdv_kosul = [a.format(k="matrah") for a in aralik]
+        if f["oran_kodu"]:
+            kdv_kosul.append("oran_kodu = :oran_kodu")
+        kosullar.append(
+            f"z.id IN (SELECT z_raporu_id FROM {sema}.z_kdv_satirlari WHERE {' AND '.join(kdv_kosul)})"
+        )
+
+    return (
+        f"SELECT z.id AS id, z.tarih AS tarih, z.kasa_id AS kasa_id, z.vardiya AS vardiya, "
+        f"z.kasiyer_id AS kasiyer_id, z.status AS status, {_NIHAI} AS nihai, "
+        f"z.created_by AS created_by, z.updated_by AS updated_by, z.updated_at AS updated_at, "
+        f":arsiv_{sema} AS arsiv "
+        f"FROM {sema}.z_raporlari z"
+        + (f" WHERE {' AND '.join(kosullar)}" if kosullar else "")
+    )
+
+
+def filtreleri_oku(args) -> dict:
+    """request.args -> doğrulanmış filtreler (hatalı değerler yok sayılır)."""
+    def _tarih(ad):
+        try:
+            return date.fromisoformat(args.get(ad) or "")
+        except ValueError:
+            return None
+
+    def _id(ad):
+        s = (args.get(ad) or "").strip()
+        return int(s) if s.isdigit() else None
+
+    alan = args.get("alan") if args.get("alan") in TUTAR_ALANLARI else "nihai"
+    # KDV kodu sadece KDV satırı aramasında uygulanır; başka alanda filtre sayılmaz
+    oran_kodu = args.get("oran_kodu") if alan == "kdv" and args.get("oran_kodu") in KDV_KODLARI else None
+    return {
+        "start": _tarih("start"),
+        "end": _tarih("end"),
+        "kasa_id": _id("kasa_id"),
+        "kasiyer_id": _id("kasiyer_id"),
+        "pos_cihaz_id": _id("pos_cihaz_id"),
+        "status": args.get("status") if args.get("status") in DURUMLAR else None,
+        "kullanici": (args.get("kullanici") or "").strip() or None,
+        "alan": alan,
+        "oran_kodu": oran_kodu,
+        "min": tutar_oku(args.get("min")),
+        "max": tutar_oku(args.get("max")),
+    }
+
+
+def filtre_var_mi(f) -> bool:
+    return any(v is not None for k, v in f.items() if k != "alan")
+
+
+def ara(f: dict, limit: int = LIMIT) -> dict:
+    """
+    dönüş: {"sonuclar": [{id, tarih, kasa_id, vardiya, kasiyer_id, status, nihai,
+            created_by, updated_by, updated_at, arsiv}], "fazlasi_var": bool}
+    Tarih sınırı yoksa tüm arşiv yılları taranır.
+    """
+    if f["start"] or f["end"]:
+        yillar = arsiv.aralik_arsivleri(f["start"] or date.min, f["end"] or date.max)
+    else:
+        yillar = arsiv.arsiv_yillari()
+
+    params = {
+        "start": f["start"] and f["start"].isoformat(), "end": f["end"] and f["end"].isoformat(),
+        "kasa_id": f["kasa_id"], "kasiyer_id": f["kasiyer_id"],
+        "pos_cihaz_id": f["pos_cihaz_id"], "status": f["status"], "kullanici": f["kullanici"],
+        "oran_kodu": f["oran_kodu"],
+        "min": float(f["min"]) - TOLERANS if f["min"] is not None else None,
+        "max": float(f["max"]) + TOLERANS if f["max"] is not None else None,
+        "limit": limit + 1,
+    }
+    with rapor_baglantisi(yillar) as (conn, semalar):
+        for yil, sema in semalar:
+            params[f"arsiv_{sema}"] = yil
+        sql = (
+            f"SELECT * FROM ({' UNION ALL '.join(_sema_sorgusu(sema, f) for _, sema in semalar)}) "
+            f"ORDER BY tarih DESC, id DESC LIMIT :limit"
+        )
+        satirlar = [dict(r._mapping) for r in conn.execute(text(sql), params)]
+
+    for s in satirlar:
+        s["tarih"] = date.fromisoformat(s["tarih"]) if isinstance(s["tarih"], str) else s["tarih"]
+        s["nihai"] = Decimal(str(s["nihai"] or 0)).quantize(Decimal("0.00"))
+    return {"sonuclar": satirlar[:limit], "fazlasi_var": len(satirlar) > limit}
@@ -0,0 +1,260 @@
+"""
+Yıl bazlı arşiv veritabanları.
+
+Kapanmış yılların z_raporlari / z_kdv_satirlari / z_pos_satirlari kayıtları
+instance/arsiv/atik_<yil>.db dosyalarına taşınır. Sıcak DB küçük kalır;
+rapor sorguları (bkz. sorgular.py) aralığın dokunduğu arşivleri ATTACH eder.
+
+Arşiv tabloları sıcak DB'deki tanımla (PK, UNIQUE) oluşturulur. Sıcak DB
+tabloları AUTOINCREMENT'tir: arşive taşınan id'ler tekrar verilmez, z_olaylari /
+tarama_bulgulari / eku_aktarimlari'ndaki z_raporu_id'ler tek bir Z'yi gösterir.
+"""
+import re
+from datetime import date
+from pathlib import Path
+
+from flask import current_app
+
+from ..extensions import db
+
+# Sıra önemli: önce satırlar, sonra başlık (silmede de aynı sıra)
+ARSIV_TABLOLARI = ["z_kdv_satirlari", "z_pos_satirlari", "z_raporlari"]
+
+# Arşiv dosyasında oluşturulan indeksler (sema öneki ATTACH adıyla eklenir)
+ARSIV_INDEKSLERI = [
+    "CREATE INDEX IF NOT EXISTS {sema}.ix_z_raporlari_tarih ON z_raporlari (tarih, kasa_id)",
+    "CREATE INDEX IF NOT EXISTS {sema}.ix_z_kdv_satirlari_z ON z_kdv_satirlari (z_raporu_id)",
+    "CREATE INDEX IF NOT EXISTS {sema}.ix_z_pos_satirlari_z ON z_pos_satirlari (z_raporu_id)",
+]
+
+
+def arsiv_dizini() -> Path:
+    return Path(current_app.config["ARSIV_DIZINI"])
+
+
+def arsiv_yolu(yil: int) -> Path:
+    return arsiv_dizini() / f"atik_{yil}.db"
+
+
+def sema_adi(yil: int) -> str:
+    return f"arsiv_{int(yil)}"
+
+
+def arsiv_yillari() -> list[int]:
+    """
+    Diskteki arşiv dosyalarının yılları (artan).
+    """
+    d = arsiv_dizini()
+    if not d.exists():
+        return []
+    yillar = []
+    for p in d.glob("atik_*.db"):
+        yil = p.stem.split("_", 1)[1]
+        if yil.isdigit():
+            yillar.append(int(yil))
+    return sorted(yillar)
+
+
+def aralik_arsivleri(start: date, end: date) -> list[int]:
+    """
+    [start, end] aralığının dokunduğu arşiv yılları.
+    """
+    return [y for y in arsiv_yillari() if start.year <= y <= end.year]
+
+
+def arsivlenmis_mi(tarih: date) -> bool:
+    """
+    Bu tarihin yılı arşive taşındıysa True (o yıla yeni giriş yapılmaz).
+    """
+    return arsiv_yolu(tarih.year).exists()
+
+
+def _kolonlar(conn, sema: str, tablo: str) -> list[str]:
+    rows = conn.exec_driver_sql(f"PRAGMA {sema}.table_info({tablo})").fetchall()
+    return [r[1] for r in rows]
+
+
+def _tablo_tanimi(conn, sema: str, tablo: str) -> str | None:
+    row = conn.exec_driver_sql(
+        f"SELECT sql FROM {sema}.sqlite_master WHERE type = 'table' AND name = ?", (tablo,)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def _yeniden_adlandir(tanim: str, hedef: str) -> str:
+    """'CREATE TABLE <ad> (...)' tanımını hedef adla yazar."""
+    return re.sub(r"^CREATE TABLE\s+\S+", f"CREATE TABLE {hedef}", tanim, count=1)
+
+
+def _yeniden_kur(conn, sema: str, tablo: str, tanim: str) -> None:
+    """
+    Tabloyu yeni tanımla yeniden kurar: _yeni_<tablo> oluştur, ortak kolonları
+    kopyala, eskisini sil, yeniyi adlandır. Tablonun indeksleri yeniden oluşturulur.
+    """
+    indeksler = [
+        r[0] for r in conn.exec_driver_sql(
+            f"SELECT sql FROM {sema}.sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+            (tablo,),
+        )
+    ]
+    gecici = f"_yeni_{tablo}"
+    conn.exec_driver_sql(f"DROP TABLE IF EXISTS {sema}.{gecici}")
+    conn.exec_driver_sql(_yeniden_adlandir(tanim, f"{sema}.{gecici}"))
+    ortak = set(_kolonlar(conn, sema, tablo))
+    kolonlar = ", ".join(k for k in _kolonlar(conn, sema, gecici) if k in ortak)
+    conn.exec_driver_sql(
+        f"INSERT INTO {sema}.{gecici} ({kolonlar}) SELECT {kolonlar} FROM {sema}.{tablo}"
+    )
+    conn.exec_driver_sql(f"DROP TABLE {sema}.{tablo}")
+    conn.exec_driver_sql(f"ALTER TABLE {sema}.{gecici} RENAME TO {tablo}")
+    for sql in indeksler:
+        conn.exec_driver_sql(re.sub(r"^(CREATE (?:UNIQUE )?INDEX)\s+", rf"\1 {sema}.", sql, count=1))
+
+
+def _arsiv_tablolarini_hazirla(conn, sema: str) -> None:
+    """
+    Arşivde tablo yoksa sıcak DB'deki tanımla (PK, UNIQUE dahil) oluştur.
+    Eski arşivlerde PK'sız (CREATE TABLE AS) tablolar bu tanımla yeniden kurulur.
+    Sıcak DB'ye sonradan kolon eklendiyse (ALTER) arşive de ekle.
+    """
+    for tablo in ARSIV_TABLOLARI:
+        tanim = _tablo_tanimi(conn, "main", tablo)
+        if _tablo_tanimi(conn, sema, tablo) is None:
+            conn.exec_driver_sql(_yeniden_adlandir(tanim, f"{sema}.{tablo}"))
+        elif not any(r[5] for r in conn.exec_driver_sql(f"PRAGMA {sema}.table_info({tablo})")):
+            _yeniden_kur(conn, sema, tablo, tanim)
+        mevcut = set(_kolonlar(conn, sema, tablo))
+        for kolon in _kolonlar(conn, "main", tablo):
+            if kolon not in mevcut:
+                conn.exec_driver_sql(f"ALTER TABLE {sema}.{tablo} ADD COLUMN {kolon}")
+
+    from .arama import INDEKSLER
+
+    for sql in ARSIV_INDEKSLERI + INDEKSLER:
+        conn.exec_driver_sql(sql.format(sema=sema))
+
+
+def _autoincrement_mi(conn, tablo: str) -> bool:
+    return "AUTOINCREMENT" in (_tablo_tanimi(conn, "main", tablo) or "").upper()
+
+
+def _sayaci_ilerlet(conn, tablo: str, en_buyuk: int) -> None:
+    """sqlite_sequence'ı en az en_buyuk yapar (sonraki id en_buyuk + 1'den başlar)."""
+    conn.exec_driver_sql(
+        "UPDATE main.sqlite_sequence SET seq = ? WHERE name = ? AND seq < ?", (en_buyuk, tablo, en_buyuk)
+    )
+    conn.exec_driver_sql(
+        "INSERT INTO main.sqlite_sequence (name, seq) SELECT ?, ? "
+        "WHERE NOT EXISTS (SELECT 1 FROM main.sqlite_sequence WHERE name = ?)",
+        (tablo, en_buyuk, tablo),
+    )
+
+
+def kimlikleri_hazirla() -> None:
+    """
+    (flask kurulum) Sıcak DB'deki Z tablolarını AUTOINCREMENT'e çevirir ve id
+    sayaçlarını arşivlerdeki en büyük id'nin üstüne taşır.
+    """
+    with db.engine.connect() as conn:
+        for tablo in ARSIV_TABLOLARI:
+            if _autoincrement_mi(conn, tablo):
+                continue
+            tanim = _tablo_tanimi(conn, "main", tablo)
+            yeni, n1 = re.subn(r"\bid INTEGER NOT NULL,", "id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,", tanim, count=1)
+            yeni, n2 = re.subn(r",\s*PRIMARY KEY \(id\)", "", yeni, count=1)
+            if not (n1 and n2):
+                current_app.logger.warning("%s tanımı tanınmadı, AUTOINCREMENT'e çevrilmedi", tablo)
+                continue
+            _yeniden_kur(conn, "main", tablo, yeni)
+            conn.commit()
+            current_app.logger.info("%s AUTOINCREMENT'e çevrildi", tablo)
+
+        for yil in arsiv_yillari():
+            sema = sema_adi(yil)
+            conn.exec_driver_sql(f"ATTACH DATABASE ? AS {sema}", (str(arsiv_yolu(yil)),))
+            try:
+                for tablo in ARSIV_TABLOLARI:
+                    if _tablo_tanimi(conn, sema, tablo) is None or not _autoincrement_mi(conn, tablo):
+                        continue
+                    en_buyuk = conn.exec_driver_sql(f"SELECT MAX(id) FROM {sema}.{tablo}").scalar()
+                    if en_buyuk is not None:
+                        _sayaci_ilerlet(conn, tablo, en_buyuk)
+                conn.commit()
+            finally:
+                conn.exec_driver_sql(f"DETACH DATABASE {sema}")
+
+
+def indeksleri_guncelle() -> None:
+    """Mevcut arşiv dosyalarına eksik indeksleri ekler (flask kurulum)."""
+    for yil in arsiv_yillari():
+        sema = sema_adi(yil)
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql(f"ATTACH DATABASE ? AS {sema}", (str(arsiv_yolu(yil)),))
+            try:
+                _arsiv_tablolarini_hazirla(conn, sema)
+                conn.commit()
+            finally:
+                conn.exec_driver_sql(f"DETACH DATABASE {sema}")
+
+
+def yili_arsivle(yil: int, vacuum: bool = False) -> dict:
+    """
+    Kapanmış bir yılın Z kayıtlarını arşiv dosyasına taşır (tek transaction).
+    dönüş: {tablo: taşınan_satır_sayısı}
+    """
+    if yil >= date.today().year:
+        raise ValueError("Sadece kapanmış yıllar arşivlenebilir.")
+    with db.engine.connect() as conn:
+        if not all(_autoincrement_mi(conn, t) for t in ARSIV_TABLOLARI):
+            raise ValueError("Z tabloları AUTOINCREMENT değil; önce `flask kurulum` çalıştırın.")
+
+    yol = arsiv_yolu(yil)
+    yol.parent.mkdir(parents=True, exist_ok=True)
+    yeni_dosya = not yol.exists()
+
+    sema = sema_adi(yil)
+    bas = date(yil, 1, 1).isoformat()
+    son = date(yil, 12, 31).isoformat()
+    alt_sorgu = "SELECT id FROM main.z_raporlari WHERE tarih >= ? AND tarih <= ?"
+
+    sayac = {}
+    with db.engine.connect() as conn:
+        conn.exec_driver_sql(f"ATTACH DATABASE ? AS {sema}", (str(yol),))
+        try:
+            _arsiv_tablolarini_hazirla(conn, sema)
+
+            for tablo in ARSIV_TABLOLARI:
+                kolonlar = ", ".join(_kolonlar(conn, "main", tablo))
+                if tablo == "z_raporlari":
+                    kosul = "tarih >= ? AND tarih <= ?"
+                else:
+                    kosul = f"z_raporu_id IN ({alt_sorgu})"
+                res = conn.exec_driver_sql(
+                    f"INSERT INTO {sema}.{tablo} ({kolonlar}) "
+                    f"SELECT {kolonlar} FROM main.{tablo} WHERE {kosul}",
+                    (bas, son),
+                )
+                sayac[tablo] = res.rowcount
+
+            for tablo in ARSIV_TABLOLARI:
+                if tablo == "z_raporlari":
+                    kosul = "tarih >= ? AND tarih <= ?"
+                else:
+                    kosul = f"z_raporu_id IN ({alt_sorgu})"
+                conn.exec_driver_sql(f"DELETE FROM main.{tablo} WHERE {kosul}", (bas, son))
+
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            conn.exec_driver_sql(f"DETACH DATABASE {sema}")
+            # yarım kalan ilk arşivleme: boş dosya "arşivlendi" sayılmasın
+            if yeni_dosya:
+                yol.unlink(missing_ok=True)
+            raise
+
+        conn.exec_driver_sql(f"DETACH DATABASE {sema}")
+
+        if vacuum:
+            conn.exec_driver_sql("VACUUM")
+
+    return sayac
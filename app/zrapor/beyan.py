@@ -0,0 +1,143 @@
+"""
+Aylık KDV beyanı: oran kodu başına KDV dahil brüt, net ve KDV.
+
+Ay tek GROUP BY sorgusuyla (sıcak DB + gerekli yıl arşivi, UNION ALL)
+hesaplanır. Net/KDV ayrımı kdv_dahil_ayir ile aynı: Z'nin her KDV satırı
+ayrı ayrılıp toplanır (rapor_detay'ların toplamı ile birebir), kuruş
+tamsayısı ve ROUND_HALF_EVEN ile SQL içinde. OZEL'in sabit oranı yok; sadece
+brüt verilir.
+
+Kapanmış ayların sonucu kdv_beyanlari tablosunda saklanır, içinde bulunulan
+ay her seferinde hesaplanır. Z kaydı/taslak, o ayın kaydını kendi
+transaction'ında siler (ay_sil).
+"""
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import delete, insert, text
+
+from ..extensions import db
+from ..models import KdvBeyani
+from . import arsiv
+from .paket import ay_araligi
+from .services import KDV_KODLARI, KDV_ORAN_MAP
+from .sorgular import rapor_baglantisi
+
+# oran kodu -> yüzde (tamsayı); OZEL yok
+_YUZDE = {kod: int(oran * 100) for kod, oran in KDV_ORAN_MAP.items()}
+_YUZDE_SQL = "CASE kod " + " ".join(f"WHEN '{kod}' THEN {y}" for kod, y in _YUZDE.items()) + " END"
+
+# kuruş (KDV dahil) -> net kuruş: b * 100 / (100 + p), banker yuvarlaması
+_NET_KURUS = (
+    "CASE WHEN b <= 0 THEN 0 WHEN p = 0 THEN b ELSE (b * 100) / (100 + p) + "
+    "CASE WHEN 2 * ((b * 100) % (100 + p)) > 100 + p "
+    "OR (2 * ((b * 100) % (100 + p)) = 100 + p AND ((b * 100) / (100 + p)) % 2 = 1) "
+    "THEN 1 ELSE 0 END END"
+)
+
+
+def ay_metni(tarih: date) -> str:
+    return tarih.strftime("%Y-%m")
+
+
+def _ay_sorgusu(semalar):
+    parcalar = [
+        f"SELECT ks.oran_kodu AS kod, ks.z_raporu_id AS z_id, "
+        f"CAST(ROUND(ks.matrah * 100) AS INTEGER) AS b "
+        f"FROM {sema}.z_kdv_satirlari ks "
+        f"JOIN {sema}.z_raporlari z ON z.id = ks.z_raporu_id "
+        f"WHERE z.tarih >= :bas AND z.tarih <= :son"
+        for _, sema in semalar
+    ]
+    sql = (
+        f"SELECT kod, SUM(b) AS brut, SUM({_NET_KURUS}) AS net, COUNT(DISTINCT z_id) AS z_adet "
+        f"FROM (SELECT kod, z_id, b, {_YUZDE_SQL} AS p FROM ({' UNION ALL '.join(parcalar)})) "
+        f"GROUP BY kod"
+    )
+    return text(sql)
+
+
+def _kurus(v) -> Decimal:
+    return (Decimal(int(v or 0)) / 100).quantize(Decimal("0.00"))
+
+
+def _hesapla(conn, semalar, bas, son) -> dict:
+    """{oran_kodu: {"brut", "net", "kdv", "z_adet"}}; her kod için (boşsa sıfır)."""
+    sonuc = {
+        kod: {"brut": Decimal("0.00"),
+              "net": Decimal("0.00") if kod in _YUZDE else None,
+              "kdv": Decimal("0.00") if kod in _YUZDE else None,
+              "z_adet": 0}
+        for kod in KDV_KODLARI
+    }
+    for kod, brut, net, z_adet in conn.execute(_ay_sorgusu(semalar), {"bas": bas, "son": son}):
+        if kod not in sonuc:
+            continue
+        s = sonuc[kod]
+        s["brut"] = _kurus(brut)
+        s["z_adet"] = z_adet
+        if kod in _YUZDE:
+            s["net"] = _kurus(net)
+            s["kdv"] = s["brut"] - s["net"]
+    return sonuc
+
+
+def _ay_toplamlari(ay: str) -> dict:
+    """Kapanmış ay kayıtlıysa tablodan; değilse hesaplanıp (kapanmışsa) saklanır."""
+    kayitli = KdvBeyani.query.filter_by(ay=ay).all()
+    if kayitli:
+        return {k.oran_kodu: {"brut": k.brut, "net": k.net, "kdv": k.kdv, "z_adet": k.z_adet} for k in kayitli}
+
+    bas, son = ay_araligi(ay)
+    kapanmis = son < date.today().replace(day=1)
+    with rapor_baglantisi(arsiv.aralik_arsivleri(bas, son), yazma=kapanmis) as (conn, semalar):
+        if kapanmis:
+            # Z yazanlarla sıralı: hesap + kayıt arasında ay değişemez
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+        sonuc = _hesapla(conn, semalar, bas, son)
+        if kapanmis:
+            simdi = datetime.utcnow()
+            conn.execute(delete(KdvBeyani).where(KdvBeyani.ay == ay))
+            conn.execute(insert(KdvBeyani), [
+                dict(s, ay=ay, oran_kodu=kod, hesaplandi_at=simdi) for kod, s in sonuc.items()
+            ])
+            conn.commit()
+    return sonuc
+
+
+def kdv_beyani(ay: str, yil_sayisi: int = 1) -> dict:
+    """
+    ay: "YYYY-AA"; yil_sayisi: aynı ayın kaç yılı (karşılaştırma, en yeni başta).
+    dönüş: {"ay", "satirlar": [{oran_kodu, brut, net, kdv, z_adet}], "toplam": {...},
+            "karsilastirma": [{"ay", "satirlar": {kod: {...}}, "toplam": {...}}]}
+    """
+    bas, _ = ay_araligi(ay)
+    aylar = [bas.replace(year=bas.year - i).strftime("%Y-%m") for i in range(yil_sayisi)]
+
+    karsilastirma = []
+    for a in aylar:
+        satirlar = _ay_toplamlari(a)
+        toplam = {"brut": Decimal("0.00"), "net": Decimal("0.00"), "kdv": Decimal("0.00")}
+        for s in satirlar.values():
+            toplam["brut"] += s["brut"]
+            toplam["net"] += s["net"] if s["net"] is not None else s["brut"]
+            toplam["kdv"] += s["kdv"] or Decimal("0.00")
+        karsilastirma.append({"ay": a, "satirlar": satirlar, "toplam": toplam})
+
+    ilk = karsilastirma[0]
+    return {
+        "ay": ay,
+        "satirlar": [dict(ilk["satirlar"][kod], oran_kodu=kod) for kod in KDV_KODLARI],
+        "toplam": ilk["toplam"],
+        "karsilastirma": karsilastirma,
+    }
+
+
+def ay_sil(tarih: date):
+    """Z yazma transaction'ı içinde: bu tarihin ayının kaydı (commit çağıranda)."""
+    db.session.execute(delete(KdvBeyani).where(KdvBeyani.ay == ay_metni(tarih)))
+
+
+def temizle():
+    db.session.execute(delete(KdvBeyani))
+    db.session.commit()
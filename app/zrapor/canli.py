@@ -0,0 +1,156 @@
+"""
+Muhasebeye canlı Z bildirimi (server-sent events).
+
+Kayıt anında satır özeti bir kez hesaplanıp z_olaylari tablosuna yazılır
+(kaydın kendi transaction'ı içinde). Akışlar bu tabloyu id > son_id ile
+yoklar; böylece farklı worker process'lerindeki istemciler de olayı görür ve
+kimse aralık sorgusunu yeniden çalıştırmaz.
+
+Her akış bir worker thread'ini tutar; process başına açık akış sayısı
+CANLI_MAX_AKIS ile sınırlıdır, kalan thread'ler form/kayıt isteklerine kalır.
+Sınır doluysa akış sadece "retry" gönderip kapanır, tarayıcı sonra yeniden dener.
+"""
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, text
+
+from .. import okuma
+from ..extensions import db
+from ..models import ZOlay, ZKdvSatiri, ZPosSatiri, PosCihazi
+from .services import satir_ozeti
+
+# Olaylar bu kadar süre tutulur (kopan istemci Last-Event-ID ile devam eder)
+OLAY_SAKLAMA = timedelta(hours=6)
+
+_akis_kilidi = threading.Lock()
+_acik_akis = 0
+
+
+def _para(d) -> str:
+    return f"{d:.2f}"
+
+
+def ozet_veri(z) -> dict:
+    """
+    Kaydedilen Z'nin /raporlar satırı (JSON uyumlu). Flush edilmiş,
+    henüz commit edilmemiş satırları görmek için aynı session kullanılır.
+    """
+    kdv = [
+        (s.oran_kodu, s.matrah)
+        for s in ZKdvSatiri.query.filter_by(z_raporu_id=z.id).all()
+    ]
+    pos = (
+        db.session.query(ZPosSatiri.brut_tutar, PosCihazi.komisyon_orani)
+        .join(PosCihazi, PosCihazi.id == ZPosSatiri.pos_cihaz_id)
+        .filter(ZPosSatiri.z_raporu_id == z.id)
+        .all()
+    )
+    return ozet_satiri(
+        z.id, z.tarih, z.kasa_id, z.kasa.kasa_no, z.vardiya, z.status,
+        z.fis_ciro, z.fatura_ciro, z.iade_tutar, kdv, pos,
+    )
+
+
+def ozet_satiri(z_id, tarih, kasa_id, kasa_no, vardiya, status, fis, fatura, iade, kdv, pos) -> dict:
+    """
+    ozet_veri'nin DB'ye gitmeyen hali (toplu kayıt elindeki değerlerle çağırır).
+    kdv: [(oran_kodu, matrah)], pos: [(brut, komisyon_orani)]
+    """
+    ozet = satir_ozeti(fis, fatura, iade, kdv, pos)
+
+    veri = {
+        "id": z_id,
+        "tarih": tarih.isoformat(),
+        "kasa_id": kasa_id,
+        "kasa_no": kasa_no,
+        "vardiya": vardiya,
+        "status": status,
+        "fis": _para(fis),
+        "fatura": _para(fatura),
+        "iade": _para(iade),
+    }
+    veri.update({k: _para(v) for k, v in ozet.items()})
+    return veri
+
+
+def olay_yayinla(z, tur: str = "kaydedildi") -> None:
+    """
+    Olayı session'a ekler; commit'i çağıran yapar (kayıtla birlikte atomik).
+    """
+    olaylari_yayinla([ozet_veri(z)], tur)
+
+
+def olaylari_yayinla(veriler, tur: str = "kaydedildi") -> None:
+    """
+    Birden çok Z özeti için tek toplu INSERT (ozet_veri/ozet_satiri çıktıları).
+    """
+    now = datetime.utcnow()
+    db.session.execute(insert(ZOlay), [
+        {"z_raporu_id": v["id"], "tur": tur, "veri": json.dumps(v), "created_at": now}
+        for v in veriler
+    ])
+    # eski olayları buda (created_at indeksli)
+    ZOlay.query.filter(ZOlay.created_at < now - OLAY_SAKLAMA).delete()
+
+
+def son_olay_id() -> int:
+    return db.session.query(func.max(ZOlay.id)).scalar() or 0
+
+
+def _akis_ac(limit: int) -> bool:
+    global _acik_akis
+    with _akis_kilidi:
+        if _acik_akis >= limit:
+            return False
+        _acik_akis += 1
+        return True
+
+
+def _akis_kapat() -> None:
+    global _acik_akis
+    with _akis_kilidi:
+        _acik_akis -= 1
+
+
+def olay_akisi(son_id: int, sure: float, aralik: float, limit: int, dolu_bekleme: float,
+               nabiz: float = 15.0):
+    """
+    SSE çerçeveleri üreten generator. `sure` dolunca kapanır; tarayıcı
+    EventSource kendiliğinden Last-Event-ID ile yeniden bağlanır.
+    Her yoklamada bağlantı havuzdan kısa süreli alınır, boşta tutulmaz.
+    Bu process'te `limit` akış açıksa `dolu_bekleme` sn sonra tekrar denetir.
+    """
+    if not _akis_ac(limit):
+        yield f"retry: {int(dolu_bekleme * 1000)}\n\n"
+        return
+    try:
+        yield from _olaylar(son_id, sure, aralik, nabiz)
+    finally:
+        # istemci koptuğunda da (GeneratorExit) slot bırakılır
+        _akis_kapat()
+
+
+def _olaylar(son_id, sure, aralik, nabiz):
+    bitis = time.monotonic() + sure
+    son_nabiz = time.monotonic()
+    sql = text("SELECT id, tur, veri FROM z_olaylari WHERE id > :son ORDER BY id LIMIT 200")
+
+    yield "retry: 3000\n\n"
+    while time.monotonic() < bitis:
+        with okuma.motor().connect() as conn:
+            olaylar = conn.execute(sql, {"son": son_id}).fetchall()
+
+        for olay_id, tur, veri in olaylar:
+            son_id = olay_id
+            yield f"id: {olay_id}\nevent: {tur}\ndata: {veri}\n\n"
+
+        if olaylar:
+            son_nabiz = time.monotonic()
+        elif time.monotonic() - son_nabiz >= nabiz:
+            son_nabiz = time.monotonic()
+            yield ": nabiz\n\n"
+
+        time.sleep(aralik)
@@ -0,0 +1,321 @@
+"""
+EKÜ / Z dışa aktarım dosyalarından Z aktarımı (flask eku-aktar).
+
+Dosyalar satır satır okunur (bellek dosya boyutundan bağımsız); fiş satırları
+gibi tanınmayan satırlar atlanır. Tanınan alanlar (büyük/küçük harf ve Türkçe
+karakter farkı önemsiz; tutarlar TR biçimi, baştaki "*" yok sayılır):
+
+    Z RAPORU                       yeni Z bloğu ("Z RAPORU SONU" bloğu kapatır)
+    MALİ HAFIZA NO / FM NO : ...   kasa (Kasa.fm_no)
+    Z NO : 0123
+    TARİH : 18.10.2026
+    VARDİYA : 2                    (opsiyonel)
+    FİŞ TOPLAMI       *1.234,56
+    FATURA TOPLAMI    *0,00
+    İADE TOPLAMI      *12,00
+    KDV %20 TOPLAM    *1.000,00    (KDV dahil; tanımsız oranlar OZEL'e)
+
+Blok içinde her alanın ilk değeri geçerlidir (Z'den sonra gelen fişlerin
+TARİH satırları bloğu bozmaz).
+
+Önce tüm dosyalar process havuzunda çözülür (bellekte sadece Z özetleri kalır),
+sonra DB'ye sadece ana process, verilen dosya sırasıyla yazar; her dosya tek
+transaction (Z'ler + eku_aktarimlari indeksi). Daha önce aktarılmış (fm_no,
+z_no) atlanır. Yeni Z'ler taslak açılır; mevcut Z sadece taslaksa güncellenir
+(kasiyeri ve POS satırları korunur), gönderilmiş/kilitli Z'ye dokunulmaz.
+Vardiya satırı yoksa aynı FM + gün içindeki Z no sırası kullanılır: bu
+çalıştırmadaki tüm dosyalar ve daha önce aktarılanlar birlikte sıralanır,
+sonuç dosyaların işlenme sırasına bağlı değildir. Aynı FM + gün + vardiyaya
+düşen iki farklı Z hatadır.
+"""
+import multiprocessing
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm.exc import StaleDataError
+
+from ..extensions import db
+from ..models import EkuAktarimi, Kasa, ZKdvSatiri, ZRaporu
+from .arsiv import arsivlenmis_mi
+from .beyan import ay_sil
+from .canli import olay_yayinla
+from .onbellek import tarih_degisti
+from .services import KDV_KODLARI, parse_try
+from .valor import gunu_sil
+
+KULLANICI = "eku"
+
+_TR = str.maketrans({
+    "İ": "I", "ı": "I", "Ş": "S", "ş": "S", "Ğ": "G", "ğ": "G",
+    "Ü": "U", "ü": "U", "Ö": "O", "ö": "O", "Ç": "C", "ç": "C",
+})
+_TUTAR = r".*?\*?\s*([\d.]*\d,\d{2})\s*$"
+
+_BASLANGIC = re.compile(r"^\s*Z\s+RAPORU\b(?!\s+SONU)")
+_BITIS = re.compile(r"^\s*Z\s+RAPORU\s+SONU\b")
+_ALANLAR = [
+    ("fm_no", re.compile(r"^\s*(?:MALI\s+HAFIZA|FM|MF)\s*NO\s*[:.]?\s*(\S+)")),
+    ("z_no", re.compile(r"^\s*Z\s*NO\s*[:.]?\s*(\d+)")),
+    ("tarih", re.compile(r"^\s*TARIH\s*[:.]?\s*(\d{2})[./-](\d{2})[./-](\d{4})")),
+    ("vardiya", re.compile(r"^\s*VARDIYA\s*[:.]?\s*(\d+)")),
+    ("fis", re.compile(r"^\s*(?:FIS|SATIS)\s+TOPLAMI?\b" + _TUTAR)),
+    ("fatura", re.compile(r"^\s*FATURA\s+TOPLAMI?\b" + _TUTAR)),
+    ("iade", re.compile(r"^\s*IADE\s+TOPLAMI?\b" + _TUTAR)),
+]
+_KDV = re.compile(r"^\s*KDV\s*%\s*(\d+)\s+TOPLAMI?\b" + _TUTAR)
+_ORAN_KODU = {k[3:]: k for k in KDV_KODLARI if k.startswith("KDV")}
+
+
+def _satirlar(yol):
+    """Dosyayı satır satır (UTF-8, olmazsa cp1254) okur."""
+    with open(yol, "rb") as f:
+        for ham in f:
+            try:
+                yield ham.decode("utf-8")
+            except UnicodeDecodeError:
+                yield ham.decode("cp1254", errors="replace")
+
+
+def _blok_bitir(blok, satir_no):
+    eksik = [a for a in ("fm_no", "z_no", "tarih") if a not in blok]
+    if eksik:
+        return None, f"satır {satir_no}: Z bloğunda eksik alan ({', '.join(eksik)})"
+    kdv = {kod: Decimal("0.00") for kod in KDV_KODLARI}
+    for oran, tutar in blok.get("kdv", {}).items():
+        kdv[_ORAN_KODU.get(oran, "OZEL")] += tutar
+    return {
+        "fm_no": blok["fm_no"],
+        "z_no": blok["z_no"],
+        "tarih": blok["tarih"],
+        "vardiya": blok.get("vardiya"),
+        "fis": blok.get("fis", Decimal("0.00")),
+        "fatura": blok.get("fatura", Decimal("0.00")),
+        "iade": blok.get("iade", Decimal("0.00")),
+        "kdv": kdv,
+    }, None
+
+
+def z_bloklari(yol):
+    """Dosyadaki Z'ler akış olarak: ("z", dict) ya da ("hata", mesaj)."""
+    blok = None
+    bas_no = 0
+    for satir_no, satir in enumerate(_satirlar(yol), start=1):
+        s = satir.translate(_TR).upper()
+        if _BITIS.match(s) or _BASLANGIC.match(s):
+            if blok is not None:
+                z, hata = _blok_bitir(blok, bas_no)
+                yield ("z", z) if z else ("hata", hata)
+            blok = {} if _BASLANGIC.match(s) else None
+            bas_no = satir_no
+            continue
+        if blok is None:
+            continue
+
+        m = _KDV.match(s)
+        if m:
+            blok.setdefault("kdv", {}).setdefault(m.group(1), parse_try(m.group(2)))
+            continue
+        for alan, desen in _ALANLAR:
+            m = desen.match(s)
+            if not m or alan in blok:
+                continue
+            if alan == "tarih":
+                try:
+                    blok[alan] = date(int(m.group(3)), int(m.group(2)), int(m.group(1)))
+                except ValueError:
+                    pass
+            elif alan in ("z_no", "vardiya"):
+                blok[alan] = int(m.group(1))
+            elif alan == "fm_no":
+                blok[alan] = m.group(1)
+            else:
+                blok[alan] = parse_try(m.group(1))
+            break
+
+    if blok is not None:
+        z, hata = _blok_bitir(blok, bas_no)
+        yield ("z", z) if z else ("hata", hata)
+
+
+def dosya_coz(yol: str) -> dict:
+    """Process havuzunda çalışır (DB'ye dokunmaz). {"dosya", "zler", "hatalar"}"""
+    zler, hatalar = [], []
+    try:
+        for tur, deger in z_bloklari(yol):
+            (zler if tur == "z" else hatalar).append(deger)
+    except OSError as e:
+        hatalar.append(f"okunamadı: {e}")
+    return {"dosya": yol, "zler": zler, "hatalar": hatalar}
+
+
+def dosyalari_bul(yollar):
+    for yol in map(Path, yollar):
+        if yol.is_dir():
+            yield from sorted(p for p in yol.rglob("*") if p.is_file())
+        else:
+            yield yol
+
+
+class _Aktarici:
+    """Ana process: çözülmüş dosyaları sırayla DB'ye yazar."""
+
+    def __init__(self, kuru):
+        self.kuru = kuru
+        self.kasalar = dict(db.session.execute(
+            select(Kasa.fm_no, Kasa.id).where(Kasa.aktif.is_(True), Kasa.fm_no.is_not(None))
+        ).all())
+        self.aktarilmis = set(db.session.execute(select(EkuAktarimi.fm_no, EkuAktarimi.z_no)).all())
+        self.gunler = {}  # (fm_no, tarih) -> {z_no: vardiya}
+        self.calisma_gunleri = {}  # (fm_no, tarih) -> bu çalıştırmadaki tüm Z no'lar
+        self.sayac = {"dosya": 0, "z": 0, "yeni": 0, "guncel": 0, "atlandi": 0, "hata": 0}
+        self.hatalar = []
+
+    def _hata(self, dosya, mesaj):
+        self.sayac["hata"] += 1
+        self.hatalar.append(f"{Path(dosya).name}: {mesaj}")
+
+    def _gun(self, fm_no, tarih):
+        anahtar = (fm_no, tarih)
+        if anahtar not in self.gunler:
+            self.gunler[anahtar] = dict(db.session.execute(
+                select(EkuAktarimi.z_no, EkuAktarimi.vardiya)
+                .where(EkuAktarimi.fm_no == fm_no, EkuAktarimi.tarih == tarih)
+            ).all())
+        return self.gunler[anahtar]
+
+    def calismaya_ekle(self, sonuc):
+        """Yazmadan önce her dosya için: Z no'ları gün bazında toplanır (vardiya sırası)."""
+        for z in sonuc["zler"]:
+            self.calisma_gunleri.setdefault((z["fm_no"], z["tarih"]), set()).add(z["z_no"])
+
+    def _vardiyalar(self, zler):
+        """Vardiya satırı olmayanlara gün içi Z no sırası; çakışanlar hata."""
+        alinan = {}  # bu dosyada (fm_no, tarih, vardiya) -> z_no
+        for z in zler:
+            gun = self._gun(z["fm_no"], z["tarih"])
+            if z["vardiya"] is None:
+                z_nolari = set(gun) | self.calisma_gunleri.get((z["fm_no"], z["tarih"]), set())
+                z["vardiya"] = 1 + sum(1 for n in z_nolari if n < z["z_no"])
+            sahibi = next((n for n, v in gun.items() if v == z["vardiya"]), None)
+            dosyadaki = alinan.get((z["fm_no"], z["tarih"], z["vardiya"]))
+            if z["vardiya"] not in (1, 2, 3):
+                z["hata"] = f"vardiya {z['vardiya']} (1-3 olmalı)"
+            elif sahibi is not None and sahibi != z["z_no"]:
+                z["hata"] = f"vardiya {z['vardiya']} daha önce Z {sahibi} ile aktarıldı"
+            elif dosyadaki is not None:
+                z["hata"] = f"vardiya {z['vardiya']} bu dosyada Z {dosyadaki} ile çakışıyor"
+            else:
+                alinan[(z["fm_no"], z["tarih"], z["vardiya"])] = z["z_no"]
+
+    def dosya_isle(self, sonuc):
+        dosya = sonuc["dosya"]
+        self.sayac["dosya"] += 1
+        self.sayac["z"] += len(sonuc["zler"])
+        for mesaj in sonuc["hatalar"]:
+            self._hata(dosya, mesaj)
+
+        zler = []
+        gorulen = set()
+        for z in sonuc["zler"]:
+            if (z["fm_no"], z["z_no"]) in self.aktarilmis or (z["fm_no"], z["z_no"]) in gorulen:
+                self.sayac["atlandi"] += 1
+            elif z["fm_no"] not in self.kasalar:
+                self._hata(dosya, f"FM {z['fm_no']}: aktif kasa yok")
+            elif arsivlenmis_mi(z["tarih"]):
+                self._hata(dosya, f"Z {z['z_no']}: {z['tarih'].year} arşive taşındı")
+            else:
+                gorulen.add((z["fm_no"], z["z_no"]))
+                zler.append(z)
+        if not zler or self.kuru:
+            return
+
+        self._vardiyalar(zler)
+        yeni = guncel = 0
+        yazilan = []
+        try:
+            for z in zler:
+                if z.get("hata"):
+                    self._hata(dosya, f"Z {z['z_no']}: {z['hata']}")
+                    continue
+                kasa_id = self.kasalar[z["fm_no"]]
+                rapor = ZRaporu.query.filter_by(tarih=z["tarih"], kasa_id=kasa_id, vardiya=z["vardiya"]).first()
+                if rapor and rapor.status != "draft":
+                    durum = "kilitli" if rapor.status == "locked" else "gönderilmiş"
+                    self._hata(dosya, f"Z {z['z_no']}: {z['tarih']} V{z['vardiya']} {durum}, sadece taslak güncellenir")
+                    continue
+                if rapor:
+                    guncel += 1
+                else:
+                    rapor = ZRaporu(tarih=z["tarih"], kasa_id=kasa_id, vardiya=z["vardiya"],
+                                    created_by=KULLANICI, status="draft")
+                    db.session.add(rapor)
+                    yeni += 1
+                rapor.fis_ciro = z["fis"]
+                rapor.fatura_ciro = z["fatura"]
+                rapor.iade_tutar = z["iade"]
+                rapor.updated_at = datetime.utcnow()
+                rapor.updated_by = KULLANICI
+                db.session.flush()
+
+                # POS satırları EKÜ'de cihaz bazında yok: mevcutlar korunur
+                ZKdvSatiri.query.filter_by(z_raporu_id=rapor.id).delete()
+                db.session.add_all(
+                    ZKdvSatiri(z_raporu_id=rapor.id, oran_kodu=kod, matrah=tutar)
+                    for kod, tutar in z["kdv"].items()
+                )
+                olay_yayinla(rapor, "kaydedildi")
+                gunu_sil(z["tarih"])
+                ay_sil(z["tarih"])
+                yazilan.append(dict(z, z_raporu_id=rapor.id))
+
+            if yazilan:
+                simdi = datetime.utcnow()
+                db.session.execute(insert(EkuAktarimi), [
+                    {"fm_no": z["fm_no"], "z_no": z["z_no"], "tarih": z["tarih"], "vardiya": z["vardiya"],
+                     "z_raporu_id": z["z_raporu_id"], "dosya": str(dosya)[-255:], "aktarildi_at": simdi}
+                    for z in yazilan
+                ])
+            db.session.commit()
+        except (StaleDataError, IntegrityError, OperationalError) as e:
+            db.session.rollback()
+            self._hata(dosya, f"dosya yazılamadı, tekrar deneyin ({type(e).__name__})")
+            return
+
+        self.sayac["yeni"] += yeni
+        self.sayac["guncel"] += guncel
+        for z in yazilan:
+            self.aktarilmis.add((z["fm_no"], z["z_no"]))
+            self.gunler[(z["fm_no"], z["tarih"])][z["z_no"]] = z["vardiya"]
+        for tarih in {z["tarih"] for z in yazilan}:
+            tarih_degisti(tarih)
+
+
+def aktar(yollar, isci: int = 1, kuru: bool = False) -> dict:
+    """
+    yollar: dosya ya da dizin (dizinler özyinelemeli taranır).
+    kuru=True: sadece çöz ve say, DB'ye yazma.
+    dönüş: {"dosya", "z", "yeni", "guncel", "atlandi", "hata", "hatalar", "sure"}
+    """
+    t0 = time.perf_counter()
+    dosyalar = [str(p) for p in dosyalari_bul(yollar)]
+    aktarici = _Aktarici(kuru)
+
+    # Önce hepsi çözülür: vardiya sırası tüm çalıştırmanın Z no'larına göre verilir
+    if isci > 1 and len(dosyalar) > 1:
+        with ProcessPoolExecutor(max_workers=isci, mp_context=multiprocessing.get_context("spawn")) as havuz:
+            sonuclar = list(havuz.map(dosya_coz, dosyalar))
+    else:
+        sonuclar = [dosya_coz(d) for d in dosyalar]
+
+    for sonuc in sonuclar:
+        aktarici.calismaya_ekle(sonuc)
+    for sonuc in sonuclar:
+        aktarici.dosya_isle(sonuc)
+
+    return dict(aktarici.sayac, hatalar=aktarici.hatalar, sure=time.perf_counter() - t0)
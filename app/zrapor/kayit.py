@@ -0,0 +1,121 @@
+"""
+Z raporu kaydı (z_giris_post): iyimser eşzamanlılık ile upsert.
+
+Uzun kilit ya da sıralı yeniden deneme yok:
+- yeni Z: INSERT; aynı (tarih, kasa, vardiya) araya girdiyse unique ihlali -> çakışma
+- mevcut Z: başlık önce "UPDATE ... WHERE id = ? AND surum = ?" ile yazılır
+  (ZRaporu.surum = version_id_col); 0 satır -> çakışma. Satırlar ancak
+  bundan sonra silinip yeniden eklenir, hepsi tek transaction.
+İstemci düzenlemeye başladığı sürümü gönderir (beklenen_surum; 0: Z yok
+sanıyor): arada başka bir kayıt olduysa çakışma döner. Sürüm göndermeyen
+kayıt mevcut bir Z'nin üzerine yazamaz (form sürümü anahtar seçilince yükler).
+"""
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm.exc import StaleDataError
+
+from ..extensions import db
+from ..models import PosCihazi, ZKdvSatiri, ZPosSatiri, ZRaporu
+from .beyan import ay_sil
+from .canli import olay_yayinla
+from .services import KDV_KODLARI
+from .valor import gunu_sil
+
+
+class KayitHatasi(Exception):
+    """Kayıt yapılamadı; z_id: mevcut Z (varsa)."""
+
+    def __init__(self, mesaj, z_id=None):
+        super().__init__(mesaj)
+        self.mesaj = mesaj
+        self.z_id = z_id
+
+
+class KilitliRapor(KayitHatasi):
+    pass
+
+
+class SurumCakismasi(KayitHatasi):
+    pass
+
+
+CAKISMA_MESAJI = (
+    "Bu Z raporu sen düzenlerken başka biri tarafından kaydedildi. "
+    "Güncel hali aşağıda; kontrol edip tekrar kaydet."
+)
+
+SURUM_YOK_MESAJI = (
+    "Bu Z raporu zaten kayıtlı ve hangi sürümünü düzenlediğin bilinmiyor. "
+    "Güncel hali aşağıda; kontrol edip tekrar kaydet."
+)
+
+
+def z_raporu_kaydet(tarih, kasa_id, vardiya, kasiyer_id, fis, fatura, iade,
+                    kdv, pos, kullanici, beklenen_surum=None) -> ZRaporu:
+    """
+    kdv: {oran_kodu: Decimal}, pos: {pos_cihaz_id: Decimal}
+    beklenen_surum: istemcinin gördüğü sürüm (0: Z yok sanıyor; None: bilinmiyor,
+    Z varsa reddedilir)
+    Başarıda commit edilmiş Z döner; aksi halde rollback + KayitHatasi.
+    """
+    z = ZRaporu.query.filter_by(tarih=tarih, kasa_id=kasa_id, vardiya=vardiya).first()
+    if z and z.status == "locked":
+        db.session.rollback()
+        raise KilitliRapor("Bu Z raporu kilitli. Düzenlenemez.", z.id)
+    if z and beklenen_surum is None:
+        db.session.rollback()
+        raise SurumCakismasi(SURUM_YOK_MESAJI, z.id)
+    if z and z.surum != beklenen_surum:
+        db.session.rollback()
+        raise SurumCakismasi(CAKISMA_MESAJI, z.id)
+
+    try:
+        if not z:
+            z = ZRaporu(
+                tarih=tarih,
+                kasa_id=kasa_id,
+                created_by=kullanici,
+                status="draft",
+                vardiya=vardiya,
+            )
+            db.session.add(z)
+
+        z.kasiyer_id = kasiyer_id
+        z.fis_ciro = fis
+        z.fatura_ciro = fatura
+        z.iade_tutar = iade
+        z.updated_at = datetime.utcnow()
+        z.updated_by = kullanici
+
+        # başlık önce: INSERT ya da sürüm kontrollü UPDATE
+        db.session.flush()
+
+        ZKdvSatiri.query.filter_by(z_raporu_id=z.id).delete()
+        ZPosSatiri.query.filter_by(z_raporu_id=z.id).delete()
+
+        # KDV satırları: kullanıcı KDV DAHİL tutar giriyor
+        for kod in KDV_KODLARI:
+            db.session.add(ZKdvSatiri(z_raporu_id=z.id, oran_kodu=kod, matrah=kdv.get(kod, 0)))
+
+        aktif = {p.id for p in PosCihazi.query.filter_by(aktif=True)}
+        for pos_id, brut in pos.items():
+            if pos_id in aktif and brut > 0:
+                db.session.add(ZPosSatiri(z_raporu_id=z.id, pos_cihaz_id=pos_id, brut_tutar=brut))
+
+        # Muhasebe ekranlarına canlı bildirim + o günün valör / ayın KDV beyanı kaydı (aynı transaction)
+        olay_yayinla(z, "kaydedildi")
+        gunu_sil(tarih)
+        ay_sil(tarih)
+
+        db.session.commit()
+    except (StaleDataError, IntegrityError):
+        db.session.rollback()
+        mevcut = db.session.query(ZRaporu.id).filter_by(tarih=tarih, kasa_id=kasa_id, vardiya=vardiya).scalar()
+        raise SurumCakismasi(CAKISMA_MESAJI, mevcut)
+    except OperationalError:
+        # SQLite yazma kilidi SQLITE_BEKLEME içinde alınamadı
+        db.session.rollback()
+        raise KayitHatasi("Veritabanı şu an meşgul. Birkaç saniye sonra tekrar kaydet.")
+
+    return z
@@ -0,0 +1,340 @@
+"""
+/raporlar sonuç önbelleği: (start, end, kasa_id) -> (rows, totals), boyutu sınırlı LRU.
+
+Arka uçlar (RAPOR_ONBELLEK):
+- "sqlite": instance/onbellek.db; tüm gunicorn worker'ları aynı dosyayı paylaşır
+- "bellek": process içi OrderedDict (tek process / geliştirme)
+- "kapali": önbellek yok
+
+Sadece RAPOR_ONBELLEK_MAX_GUN'e kadar olan aralıklar önbelleğe girer; daha
+genişleri akış olarak render edilir (bkz. rapor_akisi).
+
+Bir tarihe dokunan yazma (Z kaydı, taslak) sadece aralığı o tarihi kapsayan
+kayıtları siler (tarih_degisti). Her silmede "nesil" artar; hesap sürerken
+geçersiz kılınan sonuç önbelleğe yazılmaz.
+
+sqlite okuması yazma kilidi almaz (tek SELECT). İsabet/ıska sayaçları ve LRU
+erişim zamanları process içinde biriktirilir; ıskadaki yazmayla birlikte ya da
+birikince beklemeden (kilit doluysa sonraya) topluca yazılır. Sayaçlar ve LRU
+sırası bu yüzden yaklaşıktır.
+"""
+import logging
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from pathlib import Path
+
+from flask import current_app
+
+from .sorgular import RaporAkisi, rapor_listesi, rapor_satirlari
+
+log = logging.getLogger(__name__)
+
+
+class _BellekOnbellek:
+    def __init__(self):
+        self.kilit = threading.Lock()
+        self.kayitlar = OrderedDict()
+        self.nesil = 0
+        self.sayac = {"isabet": 0, "iska": 0}
+
+    def getir(self, anahtar):
+        with self.kilit:
+            deger = self.kayitlar.get(anahtar)
+            if deger is None:
+                self.sayac["iska"] += 1
+                return None, self.nesil
+            self.kayitlar.move_to_end(anahtar)
+            self.sayac["isabet"] += 1
+            return deger, self.nesil
+
+    def koy(self, anahtar, deger, nesil, boyut):
+        with self.kilit:
+            if nesil != self.nesil:
+                return
+            self.kayitlar[anahtar] = deger
+            self.kayitlar.move_to_end(anahtar)
+            while len(self.kayitlar) > boyut:
+                self.kayitlar.popitem(last=False)
+
+    def tarih_sil(self, tarih):
+        with self.kilit:
+            self.nesil += 1
+            for anahtar in [a for a in self.kayitlar if a[0] <= tarih <= a[1]]:
+                del self.kayitlar[anahtar]
+
+    def temizle(self):
+        with self.kilit:
+            self.nesil += 1
+            self.kayitlar.clear()
+
+    def istatistik(self):
+        with self.kilit:
+            return dict(self.sayac, adet=len(self.kayitlar))
+
+
+_SQLITE_SEMA = """
+CREATE TABLE IF NOT EXISTS rapor_onbellegi (
+    bas TEXT NOT NULL,
+    son TEXT NOT NULL,
+    kasa_id INTEGER NOT NULL,
+    veri BLOB NOT NULL,
+    erisim REAL NOT NULL,
+    PRIMARY KEY (bas, son, kasa_id)
+);
+CREATE TABLE IF NOT EXISTS onbellek_sayac (
+    ad TEXT PRIMARY KEY,
+    deger INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO onbellek_sayac (ad, deger) VALUES ('isabet', 0), ('iska', 0), ('nesil', 0);
+"""
+
+
+class _SqliteOnbellek:
+    # Bekleyen sayaç/erişim bu kadar olay ya da süreyi aşınca yazılmaya çalışılır
+    BOSALTMA_ADET = 50
+    BOSALTMA_SURE = 10.0
+
+    def __init__(self, yol):
+        self.yol = Path(yol)
+        self.yol.parent.mkdir(parents=True, exist_ok=True)
+        with self._baglan() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SQLITE_SEMA)
+        self.kilit = threading.Lock()
+        self._bekleyen_sayac = {"isabet": 0, "iska": 0}
+        self._bekleyen_erisim = {}
+        self._son_bosaltma = time.monotonic()
+
+    def _baglan(self, timeout=5):
+        # autocommit; yazmalar açık BEGIN IMMEDIATE ile
+        conn = sqlite3.connect(self.yol, timeout=timeout, isolation_level=None)
+        return _Kapanan(conn)
+
+    @staticmethod
+    def _anahtar(anahtar):
+        bas, son, kasa_id = anahtar
+        return bas.isoformat(), son.isoformat(), kasa_id or 0
+
+    def getir(self, anahtar):
+        a = self._anahtar(anahtar)
+        with self._baglan() as conn:
+            # tek ifade: veri ve nesil aynı anlık görüntüden
+            nesil, veri = conn.execute(
+                "SELECT (SELECT deger FROM onbellek_sayac WHERE ad = 'nesil'), "
+                "(SELECT veri FROM rapor_onbellegi WHERE bas = ? AND son = ? AND kasa_id = ?)",
+                a,
+            ).fetchone()
+
+        with self.kilit:
+            if veri is None:
+                self._bekleyen_sayac["iska"] += 1
+            else:
+                self._bekleyen_sayac["isabet"] += 1
+                self._bekleyen_erisim[a] = time.time()
+            bosalt = (
+                sum(self._bekleyen_sayac.values()) >= self.BOSALTMA_ADET
+                or time.monotonic() - self._son_bosaltma >= self.BOSALTMA_SURE
+            )
+        # ıskada koy() zaten yazacak ve bekleyenleri de götürecek
+        if bosalt and veri is not None:
+            self._bosalt()
+        return (pickle.loads(veri) if veri is not None else None), nesil
+
+    def _bekleyenleri_al(self):
+        with self.kilit:
+            sayac, erisim = self._bekleyen_sayac, self._bekleyen_erisim
+            self._bekleyen_sayac = {"isabet": 0, "iska": 0}
+            self._bekleyen_erisim = {}
+            self._son_bosaltma = time.monotonic()
+        return sayac, erisim
+
+    def _geri_koy(self, sayac, erisim):
+        with self.kilit:
+            for ad, n in sayac.items():
+                self._bekleyen_sayac[ad] += n
+            for a, t in erisim.items():
+                self._bekleyen_erisim.setdefault(a, t)
+
+    @staticmethod
+    def _bekleyenleri_yaz(conn, sayac, erisim):
+        for ad, n in sayac.items():
+            if n:
+                conn.execute("UPDATE onbellek_sayac SET deger = deger + ? WHERE ad = ?", (n, ad))
+        conn.executemany(
+            "UPDATE rapor_onbellegi SET erisim = MAX(erisim, ?) WHERE bas = ? AND son = ? AND kasa_id = ?",
+            [(t, *a) for a, t in erisim.items()],
+        )
+
+    def _bosalt(self):
+        """Bekleyenleri yazar; kilit doluysa beklemez, sonraki denemeye bırakır."""
+        sayac, erisim = self._bekleyenleri_al()
+        try:
+            with self._baglan(timeout=0) as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                self._bekleyenleri_yaz(conn, sayac, erisim)
+                conn.execute("COMMIT")
+        except sqlite3.Error:
+            self._geri_koy(sayac, erisim)
+
+    def koy(self, anahtar, deger, nesil, boyut):
+        veri = pickle.dumps(deger, protocol=pickle.HIGHEST_PROTOCOL)
+        sayac, erisim = self._bekleyenleri_al()
+        try:
+            self._koy(anahtar, veri, nesil, boyut, sayac, erisim)
+        except sqlite3.Error:
+            self._geri_koy(sayac, erisim)
+            raise
+
+    def _koy(self, anahtar, veri, nesil, boyut, sayac, erisim):
+        with self._baglan() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._bekleyenleri_yaz(conn, sayac, erisim)
+            guncel = conn.execute("SELECT deger FROM onbellek_sayac WHERE ad = 'nesil'").fetchone()[0]
+            if guncel == nesil:
+                conn.execute(
+                    "INSERT OR REPLACE INTO rapor_onbellegi (bas, son, kasa_id, veri, erisim) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (*self._anahtar(anahtar), veri, time.time()),
+                )
+                conn.execute(
+                    "DELETE FROM rapor_onbellegi WHERE rowid NOT IN "
+                    "(SELECT rowid FROM rapor_onbellegi ORDER BY erisim DESC LIMIT ?)",
+                    (boyut,),
+                )
+            conn.execute("COMMIT")
+
+    def tarih_sil(self, tarih):
+        with self._baglan() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("UPDATE onbellek_sayac SET deger = deger + 1 WHERE ad = 'nesil'")
+            conn.execute(
+                "DELETE FROM rapor_onbellegi WHERE bas <= ? AND son >= ?",
+                (tarih.isoformat(), tarih.isoformat()),
+            )
+            conn.execute("COMMIT")
+
+    def temizle(self):
+        with self._baglan() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("UPDATE onbellek_sayac SET deger = deger + 1 WHERE ad = 'nesil'")
+            conn.execute("DELETE FROM rapor_onbellegi")
+            conn.execute("COMMIT")
+
+    def istatistik(self):
+        self._bosalt()
+        with self._baglan() as conn:
+            sayac = dict(conn.execute("SELECT ad, deger FROM onbellek_sayac"))
+            adet = conn.execute("SELECT COUNT(*) FROM rapor_onbellegi").fetchone()[0]
+        return {"isabet": sayac.get("isabet", 0), "iska": sayac.get("iska", 0), "adet": adet}
+
+
+class _Kapanan:
+    """sqlite3 bağlantısı için with: çıkışta (hata olsa da) kapatır."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, *exc):
+        if self.conn.in_transaction:
+            self.conn.rollback()
+        self.conn.close()
+
+
+_onbellekler = {}
+_kurulum_kilidi = threading.Lock()
+
+
+def _onbellek():
+    tur = current_app.config["RAPOR_ONBELLEK"]
+    if tur == "kapali":
+        return None
+    anahtar = (tur, current_app.config["RAPOR_ONBELLEK_YOLU"])
+    with _kurulum_kilidi:
+        ob = _onbellekler.get(anahtar)
+        if ob is None:
+            if tur == "sqlite":
+                ob = _SqliteOnbellek(current_app.config["RAPOR_ONBELLEK_YOLU"])
+            elif tur == "bellek":
+                ob = _BellekOnbellek()
+            else:
+                raise ValueError(f"Bilinmeyen RAPOR_ONBELLEK: {tur}")
+            _onbellekler[anahtar] = ob
+    return ob
+
+
+def rapor_listesi_onbellekli(start: date, end: date, kasa_id=None):
+    """
+    rapor_listesi ile aynı (rows, totals); varsa önbellekten.
+    Önbellek dosyasına ulaşılamazsa doğrudan hesaplanır.
+    """
+    ob = _onbellek()
+    if ob is None:
+        return rapor_listesi(start, end, kasa_id)
+
+    anahtar = (start, end, kasa_id)
+    try:
+        deger, nesil = ob.getir(anahtar)
+    except sqlite3.Error as e:
+        log.warning("rapor önbelleği okunamadı: %s", e)
+        return rapor_listesi(start, end, kasa_id)
+    if deger is not None:
+        return deger
+
+    deger = rapor_listesi(start, end, kasa_id)
+    try:
+        ob.koy(anahtar, deger, nesil, current_app.config["RAPOR_ONBELLEK_BOYUT"])
+    except sqlite3.Error as e:
+        log.warning("rapor önbelleğine yazılamadı: %s", e)
+    return deger
+
+
+def rapor_akisi(start: date, end: date, kasa_id=None) -> RaporAkisi:
+    """
+    /raporlar için satır akışı. RAPOR_ONBELLEK_MAX_GUN'den kısa aralıklar
+    önbellekten (liste), geniş aralıklar doğrudan DB'den akış olarak gelir.
+    """
+    genis = (end - start).days + 1 > current_app.config["RAPOR_ONBELLEK_MAX_GUN"]
+    if genis or current_app.config["RAPOR_ONBELLEK"] == "kapali":
+        return RaporAkisi(rapor_satirlari(start, end, kasa_id))
+    rows, totals = rapor_listesi_onbellekli(start, end, kasa_id)
+    return RaporAkisi(rows, totals)
+
+
+def tarih_degisti(tarih: date):
+    """
+    Bu tarihi kapsayan önbellek kayıtlarını siler (yazma commit'inden sonra çağrılır).
+    Önbellek dosyasına ulaşılamazsa loglanır; commit edilmiş kayıt hataya dönmez.
+    """
+    ob = _onbellek()
+    if ob is None:
+        return
+    try:
+        ob.tarih_sil(tarih)
+    except sqlite3.Error as e:
+        log.error("rapor önbelleği %s için temizlenemedi (eski sonuç kalabilir): %s", tarih, e)
+
+
+def temizle():
+    """Tüm kayıtlar (arşivleme, kasa/POS silme gibi tarihten bağımsız değişiklikler)."""
+    ob = _onbellek()
+    if ob is None:
+        return
+    try:
+        ob.temizle()
+    except sqlite3.Error as e:
+        log.error("rapor önbelleği temizlenemedi (eski sonuç kalabilir): %s", e)
+
+
+def istatistik() -> dict:
+    """{"tur", "isabet", "iska", "adet"}"""
+    ob = _onbellek()
+    if ob is None:
+        return {"tur": "kapali", "isabet": 0, "iska": 0, "adet": 0}
+    return dict(ob.istatistik(), tur=current_app.config["RAPOR_ONBELLEK"])
@@ -0,0 +1,174 @@
+"""
+Aylık rapor paketi: aralıktaki tüm Z detaylarını tek yazdırılabilir HTML'de toplar.
+
+Detaylar process havuzunda parça parça render edilir, sonuçlar geldikçe sırayla
+diske yazılır. Bekleyen parça sayısı sınırlı tutulur; worker'lar belirli sayıda
+parçadan sonra yenilenir (bellek büyümez).
+
+Paket, üretildiği andaki verinin imzasını (paket_imzasi) <head>'de taşır;
+imza değişmediyse mevcut dosya yeniden üretilmeden sunulur (guncel_mi).
+Üretim web isteğinde değil, "flask aylik-paket" ile (ya da ondan arka planda) yapılır.
+"""
+import multiprocessing
+import os
+import re
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from flask import current_app, render_template
+from sqlalchemy import text
+
+from . import arsiv
+from .services import rapor_detay_hesapla
+from .sorgular import rapor_baglantisi, raporlari_getir, rapor_kimlikleri
+
+# Bir görevde render edilen Z sayısı
+PARCA = 20
+# Bir worker process'in yenilenmeden önce işleyeceği görev sayısı
+GOREV_LIMITI = 20
+
+ICERIK_ISARETI = "<!--ICERIK-->"
+_IMZA_RE = re.compile(r'<meta name="paket-imza" content="([^"]*)"')
+
+_isci_app = None
+
+
+def _isci_baslat():
+    # spawn edilen process: uygulamayı bir kez kur (create_app DB'ye dokunmaz)
+    global _isci_app
+    from .. import create_app
+    _isci_app = create_app()
+
+
+def _parca_html(kimlikler) -> str:
+    parcalar = []
+    for kayit in raporlari_getir(kimlikler):
+        if not kayit:
+            continue
+        z = kayit["z"]
+        detay = rapor_detay_hesapla(
+            z["fis_ciro"], z["fatura_ciro"], z["iade_tutar"],
+            kayit["kdv_map"], kayit["pos_satirlari"],
+        )
+        parcalar.append(render_template("_paket_rapor.html", z=z, **detay))
+    return "".join(parcalar)
+
+
+def _parca_render(kimlikler) -> str:
+    """Process havuzu görevi: bir parça Z'yi HTML'e çevirir."""
+    with _isci_app.app_context():
+        return _parca_html(kimlikler)
+
+
+def ay_araligi(ay: str):
+    """
+    "2024-05" -> (2024-05-01, 2024-05-31); hatalıysa ValueError
+    """
+    bas = datetime.strptime(ay, "%Y-%m").date()
+    if bas.month == 12:
+        sonraki = bas.replace(year=bas.year + 1, month=1)
+    else:
+        sonraki = bas.replace(month=bas.month + 1)
+    return bas, sonraki - timedelta(days=1)
+
+
+def varsayilan_cikti(start: date, end: date) -> Path:
+    d = Path(current_app.instance_path) / "paketler"
+    d.mkdir(parents=True, exist_ok=True)
+    return d / f"z_paketi_{start.isoformat()}_{end.isoformat()}.html"
+
+
+def paket_imzasi(start: date, end: date) -> str:
+    """
+    Aralıktaki Z'lerin imzası: adet, id ve sürüm toplamı, son güncelleme.
+    Z eklenir, güncellenir ya da silinirse değişir.
+    """
+    with rapor_baglantisi(arsiv.aralik_arsivleri(start, end)) as (conn, semalar):
+        sql = " UNION ALL ".join(
+            f"SELECT COUNT(*), COALESCE(SUM(id), 0), COALESCE(SUM(surum), 0), COALESCE(MAX(updated_at), '') "
+            f"FROM {sema}.z_raporlari WHERE tarih >= :start AND tarih <= :end"
+            for _, sema in semalar
+        )
+        satirlar = conn.execute(text(sql), {"start": start.isoformat(), "end": end.isoformat()}).all()
+    return "-".join(str(x) for x in (
+        sum(s[0] for s in satirlar), sum(s[1] for s in satirlar),
+        sum(s[2] for s in satirlar), max(str(s[3]) for s in satirlar),
+    ))
+
+
+def guncel_mi(cikti: Path, imza: str) -> bool:
+    """Dosya var ve aynı imzayla üretilmiş mi (sadece başı okunur)."""
+    try:
+        with open(cikti, encoding="utf-8") as f:
+            bas = f.read(2048)
+    except FileNotFoundError:
+        return False
+    m = _IMZA_RE.search(bas)
+    return bool(m) and m.group(1) == imza
+
+
+def paket_olustur(start: date, end: date, cikti: Path, isci=None) -> dict:
+    """
+    Paketi `cikti` dosyasına yazar (aynı dizinde benzersiz geçici dosya, bitince
+    yerine taşınır; eşzamanlı üretimler birbirini bozmaz).
+    isci: process sayısı (None -> CPU sayısı, 1 -> havuzsuz)
+    dönüş: {"adet", "sure", "yol"}
+    """
+    t0 = time.perf_counter()
+    # imza veriden önce alınır: üretim sırasında gelen kayıt paketi eskimiş bırakır
+    imza = paket_imzasi(start, end)
+    kimlikler = rapor_kimlikleri(start, end)
+    parcalar = [kimlikler[i:i + PARCA] for i in range(0, len(kimlikler), PARCA)]
+    isci = isci or os.cpu_count() or 1
+
+    bas, son = render_template(
+        "rapor_paketi.html",
+        start_date=start,
+        end_date=end,
+        adet=len(kimlikler),
+        imza=imza,
+        olusturma=datetime.now().strftime("%Y-%m-%d %H:%M"),
+    ).split(ICERIK_ISARETI, 1)
+
+    cikti = Path(cikti)
+    f = tempfile.NamedTemporaryFile(
+        "w", encoding="utf-8", dir=cikti.parent, prefix=cikti.name + ".", suffix=".tmp", delete=False,
+    )
+    try:
+        with f:
+            _yaz(f, bas, son, parcalar, isci)
+        os.chmod(f.name, 0o644)
+        os.replace(f.name, cikti)
+    except BaseException:
+        Path(f.name).unlink(missing_ok=True)
+        raise
+    return {"adet": len(kimlikler), "sure": time.perf_counter() - t0, "yol": cikti}
+
+
+def _yaz(f, bas, son, parcalar, isci):
+    f.write(bas)
+
+    if isci <= 1 or len(parcalar) <= 1:
+        for parca in parcalar:
+            f.write(_parca_html(parca))
+    else:
+        with ProcessPoolExecutor(
+            max_workers=isci,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_isci_baslat,
+            max_tasks_per_child=GOREV_LIMITI,
+        ) as havuz:
+            # sırayı koruyarak yaz; aynı anda en fazla 2*isci parça bekler
+            bekleyen = deque()
+            for parca in parcalar:
+                bekleyen.append(havuz.submit(_parca_render, parca))
+                if len(bekleyen) >= 2 * isci:
+                    f.write(bekleyen.popleft().result())
+            while bekleyen:
+                f.write(bekleyen.popleft().result())
+
+    f.write(son)
@@ -1,19 +1,31 @@
+import json
 from datetime import date, datetime, timedelta
-from decimal import Decimal
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
+from flask import (
+    Blueprint, render_template, request, redirect, url_for, flash, current_app,
+    Response, stream_with_context, stream_template, send_file, jsonify,
+)
 from flask_login import login_required, current_user
-from sqlalchemy import distinct
 
+from .. import isler
 from ..extensions import db
-from ..models import Kasa, PosCihazi, ZRaporu, ZKdvSatiri, ZPosSatiri, Kasiyer
+from ..models import Kasa, PosCihazi, ZRaporu, Kasiyer
 from .services import (
     parse_try,
     KDV_KODLARI,
-    komisyon_hesapla,
-    KDV_ORAN_MAP,
-    kdv_dahil_ayir,
+    rapor_detay_hesapla,
 )
+from .sorgular import rapor_getir
+from .onbellek import rapor_akisi, tarih_degisti
+from .arsiv import arsivlenmis_mi
+from .canli import olay_akisi, son_olay_id
+from .paket import ay_araligi, guncel_mi, paket_imzasi, varsayilan_cikti
+from .taslak import TaslakHatasi, taslak_birak, taslak_uygula
+from .kayit import KayitHatasi, z_raporu_kaydet
+from .valor import valor_raporu
+from .beyan import kdv_beyani
+from .arama import DURUMLAR as ARAMA_DURUMLARI, TUTAR_ALANLARI, ara, filtre_var_mi, filtreleri_oku
+from .toplu import MAX_GUN as TOPLU_MAX_GUN, TopluHata, tablo_verisi, toplu_kaydet
 
 zrapor_bp = Blueprint("zrapor", __name__, url_prefix="")
 
@@ -95,6 +107,10 @@ def z_giris_post():
         flash("Tarih formatı hatalı.", "danger")
         return redirect(url_for("zrapor.z_giris"))
 
+    if arsivlenmis_mi(tarih):
+        flash("Bu yıl arşive taşındı. Kapanmış yıla giriş yapılamaz.", "danger")
+        return redirect(url_for("zrapor.z_giris"))
+
     kasa_id = int(kasa_id_raw)
     kasa = db.session.get(Kasa, kasa_id)
     if not kasa or not kasa.aktif:
@@ -121,57 +137,124 @@ def z_giris_post():
     fatura = parse_try(request.form.get("fatura_ciro"))
     iade = parse_try(request.form.get("iade_tutar"))
 
-    # Aynı gün + aynı kasa varsa güncelle
-    z = ZRaporu.query.filter_by(tarih=tarih, kasa_id=kasa_id, vardiya=vardiya).first()
-    if z and z.status == "locked":
-        flash("Bu Z raporu kilitli. Düzenlenemez.", "danger")
-        return redirect(url_for("zrapor.rapor_detay", z_id=z.id))
-    if not z:
-        z = ZRaporu(
-            tarih=tarih,
-            kasa_id=kasa_id,
-            kasiyer_id=kasiyer_id,
-            created_by=current_user.email,
-            status="draft",
-            vardiya=vardiya
+    surum_raw = (request.form.get("surum") or "").strip()
+    beklenen_surum = int(surum_raw) if surum_raw.isdigit() else None
+
+    kdv = {kod: parse_try(request.form.get(f"kdv_{kod}")) for kod in KDV_KODLARI}
+    pos = {p.id: parse_try(request.form.get(f"pos_{p.id}")) for p in PosCihazi.query.filter_by(aktif=True)}
+
+    # Aynı gün + kasa + vardiya varsa sürüm kontrollü güncelle (bkz. kayit.py)
+    try:
+        z = z_raporu_kaydet(
+            tarih, kasa_id, vardiya, kasiyer_id, fis, fatura, iade, kdv, pos,
+            current_user.email, beklenen_surum,
         )
-        db.session.add(z)
-        db.session.flush()
-    else:
-        z.kasiyer_id = kasiyer_id
+    except KayitHatasi as e:
+        flash(e.mesaj, "danger")
+        if e.z_id:
+            return redirect(url_for("zrapor.rapor_detay", z_id=e.z_id))
+        return redirect(url_for("zrapor.z_giris"))
 
+    tarih_degisti(z.tarih)
+    flash("Z raporu kaydedildi.", "success")
+    return redirect(url_for("zrapor.z_giris"))
 
-    z.fis_ciro = fis
-    z.fatura_ciro = fatura
-    z.iade_tutar = iade
+@zrapor_bp.get("/z-giris/surum")
+@login_required
+def z_surum():
+    """
+    Form anahtar (tarih, kasa, vardiya) seçilince düzenlemeye başlanan sürüm.
+    {"z_id", "surum"}; Z yoksa surum=0 (kayıt "yeni Z" bekler).
+    """
+    try:
+        tarih = datetime.strptime(request.args.get("tarih") or "", "%Y-%m-%d").date()
+    except ValueError:
+        return jsonify(ok=False, hata="Tarih formatı hatalı."), 400
+    kasa_id = request.args.get("kasa_id", type=int)
+    vardiya = request.args.get("vardiya", type=int)
+    if kasa_id is None or vardiya is None:
+        return jsonify(ok=False, hata="Kasa ve vardiya gerekli."), 400
 
-    # Eski satırları temizle
-    ZKdvSatiri.query.filter_by(z_raporu_id=z.id).delete()
-    ZPosSatiri.query.filter_by(z_raporu_id=z.id).delete()
+    z = db.session.query(ZRaporu.id, ZRaporu.surum).filter_by(tarih=tarih, kasa_id=kasa_id, vardiya=vardiya).first()
+    return jsonify(ok=True, z_id=z.id if z else None, surum=z.surum if z else 0)
 
-    # KDV satırları: kullanıcı KDV DAHİL tutar giriyor (senin kullanımın)
-    for kod in KDV_KODLARI:
-        brut_kdv_dahil = parse_try(request.form.get(f"kdv_{kod}"))
-        db.session.add(ZKdvSatiri(z_raporu_id=z.id, oran_kodu=kod, matrah=brut_kdv_dahil))
 
-    # POS satırları: input isimleri pos_{id}
-    poslar = PosCihazi.query.filter_by(aktif=True).all()
-    for p in poslar:
-        brut = parse_try(request.form.get(f"pos_{p.id}"))
-        if brut > 0:
-            db.session.add(ZPosSatiri(z_raporu_id=z.id, pos_cihaz_id=p.id, brut_tutar=brut))
-    
-    z.updated_at = datetime.utcnow()
-    z.updated_by = current_user.email
+@zrapor_bp.post("/z-giris/taslak")
+@login_required
+def z_taslak_kaydet():
+    """
+    Autosave (JSON): sadece değişen alanlar/satırlar gönderilir.
+    {"tarih", "kasa_id", "vardiya", "kasiyer_id"?, "surum"?, "alanlar"?, "kdv"?, "pos"?}
+    Gövde ve alanlar/kdv/pos nesne değilse 400.
+    """
+    veri = request.get_json(silent=True)
+    if not isinstance(veri, dict):
+        return jsonify(ok=False, hata="İstek gövdesi JSON nesnesi olmalı."), 400
+    alanlar, kdv, pos = (veri.get(k) or {} for k in ("alanlar", "kdv", "pos"))
+    if not all(isinstance(v, dict) for v in (alanlar, kdv, pos)):
+        return jsonify(ok=False, hata="alanlar/kdv/pos JSON nesnesi olmalı."), 400
 
-    db.session.commit()
-    flash("Z raporu kaydedildi.", "success")
-    return redirect(url_for("zrapor.z_giris"))
+    try:
+        tarih = datetime.strptime(str(veri.get("tarih") or ""), "%Y-%m-%d").date()
+    except ValueError:
+        return jsonify(ok=False, hata="Tarih formatı hatalı."), 400
+    if arsivlenmis_mi(tarih):
+        return jsonify(ok=False, hata="Bu yıl arşive taşındı."), 400
 
-@zrapor_bp.get("/raporlar")
+    kasa_id_raw = str(veri.get("kasa_id") or "")
+    kasa = db.session.get(Kasa, int(kasa_id_raw)) if kasa_id_raw.isdigit() else None
+    if not kasa or not kasa.aktif:
+        return jsonify(ok=False, hata="Kasa bulunamadı."), 400
+
+    vardiya_raw = str(veri.get("vardiya") or "")
+    vardiya = int(vardiya_raw) if vardiya_raw.isdigit() else 0
+    if vardiya not in (1, 2, 3):
+        return jsonify(ok=False, hata="Vardiya seçmelisin."), 400
+
+    kasiyer_id = None
+    kasiyer_id_raw = str(veri.get("kasiyer_id") or "")
+    if kasiyer_id_raw.isdigit():
+        kasiyer = db.session.get(Kasiyer, int(kasiyer_id_raw))
+        if kasiyer and kasiyer.aktif:
+            kasiyer_id = kasiyer.id
+
+    surum_raw = str(veri.get("surum", ""))  # "0": Z yok sanıyor
+    beklenen_surum = int(surum_raw) if surum_raw.isdigit() else None
+
+    try:
+        sonuc = taslak_uygula(
+            tarih, kasa.id, vardiya, kasiyer_id, alanlar, kdv, pos,
+            current_user.email, beklenen_surum,
+        )
+    except TaslakHatasi as e:
+        return jsonify(ok=False, hata=e.mesaj), e.durum
+
+    if sonuc["degisen"]:
+        tarih_degisti(tarih)
+    return jsonify(ok=True, **sonuc)
+
+
+@zrapor_bp.post("/z-giris/taslak/birak")
 @login_required
-def raporlar():
-    # Filtreler
+def z_taslak_birak():
+    """
+    Autosave'in açtığı taslak bırakıldı (form başka anahtara geçti): {"z_id", "surum"}.
+    Taslak değilse, başkası açtıysa ya da arada yazıldıysa silinmez (silindi=false).
+    """
+    veri = request.get_json(silent=True)
+    if not isinstance(veri, dict):
+        return jsonify(ok=False, hata="İstek gövdesi JSON nesnesi olmalı."), 400
+    z_id_raw, surum_raw = str(veri.get("z_id") or ""), str(veri.get("surum") or "")
+    if not (z_id_raw.isdigit() and surum_raw.isdigit()):
+        return jsonify(ok=False, hata="z_id ve surum gerekli."), 400
+
+    tarih = taslak_birak(int(z_id_raw), int(surum_raw), current_user.email)
+    if tarih:
+        tarih_degisti(tarih)
+    return jsonify(ok=True, silindi=tarih is not None)
+
+def _rapor_filtreleri():
+    """/raporlar ve CSV için ortak filtreler: (start, end, kasa_id)"""
     start_raw = request.args.get("start") or ""
     end_raw = request.args.get("end") or ""
     kasa_id_raw = request.args.get("kasa_id") or ""
@@ -192,169 +275,332 @@ def raporlar():
     start_date = _parse_date(start_raw, default_start)
     end_date = _parse_date(end_raw, default_end)
 
-    q = ZRaporu.query.filter(ZRaporu.tarih >= start_date, ZRaporu.tarih <= end_date)
-
     kasa_id = None
     if kasa_id_raw.isdigit():
         kasa_id = int(kasa_id_raw)
-        q = q.filter(ZRaporu.kasa_id == kasa_id)
-
-    rapor_list = q.order_by(ZRaporu.tarih.desc(), ZRaporu.kasa_id.asc()).all()
-
-    rows = []
-    toplam_fis = Decimal("0.00")
-    toplam_fatura = Decimal("0.00")
-    toplam_iade = Decimal("0.00")
-    toplam_pos_brut = Decimal("0.00")
-    toplam_komisyon = Decimal("0.00")
-    toplam_pos_net = Decimal("0.00")
-    toplam_kdv = Decimal("0.00")
-
-    for z in rapor_list:
-        pos_brut = Decimal("0.00")
-        komisyon = Decimal("0.00")
-        kdv_toplam = Decimal("0.00")
-
-        # KDV satırlarından (KDV DAHİL girilen) tutarı KDV'ye ayırıp topla
-        for ks in z.kdv_satirlari:
-            brut = Decimal(ks.matrah)
-            oran = KDV_ORAN_MAP.get(ks.oran_kodu, None)
-            if oran is None:
-                continue  # OZEL gibi sabit oranı olmayanlar
-            _, kdv = kdv_dahil_ayir(brut, oran)
-            kdv_toplam += kdv
-
-        kdv_toplam = kdv_toplam.quantize(Decimal("0.00"))
-
-        for ps in z.pos_satirlari:
-            pos_brut += Decimal(ps.brut_tutar)
-            oran = Decimal(ps.pos_cihaz.komisyon_orani)
-            komisyon += komisyon_hesapla(Decimal(ps.brut_tutar), oran)
-
-        pos_net = (pos_brut - komisyon).quantize(Decimal("0.00"))
-
-        nihai_ciro = (Decimal(z.fis_ciro) + Decimal(z.fatura_ciro) - Decimal(z.iade_tutar)).quantize(Decimal("0.00"))
-
-        rows.append({
-            "id": z.id,
-            "tarih": z.tarih,
-            "kasa_no": z.kasa.kasa_no,
-            "fis": Decimal(z.fis_ciro),
-            "fatura": Decimal(z.fatura_ciro),
-            "iade": Decimal(z.iade_tutar),
-            "nihai": nihai_ciro,
-            "kdv": kdv_toplam,
-            "pos_brut": pos_brut,
-            "komisyon": komisyon,
-            "pos_net": pos_net,
-        })
 
-        toplam_fis += Decimal(z.fis_ciro)
-        toplam_fatura += Decimal(z.fatura_ciro)
-        toplam_iade += Decimal(z.iade_tutar)
-        toplam_pos_brut += pos_brut
-        toplam_komisyon += komisyon
-        toplam_pos_net += pos_net
-        toplam_kdv += kdv_toplam
+    return start_date, end_date, kasa_id
+
+
+def _parcalari_birlestir(parcalar, boyut=8192):
+    """
+    Akış şablonunun küçük parçalarını ~boyut karakterlik yazmalara toplar.
+    İç iterator'ın close()'u çağrılır (istemci koparsa DB bağlantısı bırakılır).
+    """
+    tampon = []
+    uzunluk = 0
+    try:
+        for parca in parcalar:
+            tampon.append(parca)
+            uzunluk += len(parca)
+            if uzunluk >= boyut:
+                yield "".join(tampon)
+                tampon = []
+                uzunluk = 0
+        if tampon:
+            yield "".join(tampon)
+    finally:
+        if hasattr(parcalar, "close"):
+            parcalar.close()
+
+
+def _toplu_aralik():
+    """Toplu giriş aralığı (varsayılan: son 7 gün, en fazla MAX_GUN) + vardiya sayısı."""
+    today = date.today()
+    try:
+        end_date = datetime.strptime(request.values.get("end") or "", "%Y-%m-%d").date()
+    except ValueError:
+        end_date = today
+    try:
+        start_date = datetime.strptime(request.values.get("start") or "", "%Y-%m-%d").date()
+    except ValueError:
+        start_date = end_date - timedelta(days=6)
+    if start_date > end_date:
+        start_date = end_date
+    if (end_date - start_date).days + 1 > TOPLU_MAX_GUN:
+        start_date = end_date - timedelta(days=TOPLU_MAX_GUN - 1)
+
+    vardiya_raw = (request.values.get("vardiya_sayisi") or "2").strip()
+    vardiya_sayisi = int(vardiya_raw) if vardiya_raw in ("1", "2", "3") else 2
+    return start_date, end_date, vardiya_sayisi
 
-    kasalar = Kasa.query.order_by(Kasa.kasa_no.asc()).all()
 
+def _toplu_sayfa(start_date, end_date, vardiya_sayisi, gonderilen=None, hatalar=None):
     return render_template(
+        "z_toplu.html",
+        app_title=current_app.config["APP_TITLE"],
+        start_date=start_date,
+        end_date=end_date,
+        vardiya_sayisi=vardiya_sayisi,
+        max_gun=TOPLU_MAX_GUN,
+        gonderilen=gonderilen or {},
+        hatalar=hatalar or [],
+        **tablo_verisi(start_date, end_date, vardiya_sayisi),
+    )
+
+
+@zrapor_bp.get("/z-giris/toplu")
+@login_required
+def z_toplu():
+    start_date, end_date, vardiya_sayisi = _toplu_aralik()
+    return _toplu_sayfa(start_date, end_date, vardiya_sayisi)
+
+
+@zrapor_bp.post("/z-giris/toplu")
+@login_required
+def z_toplu_post():
+    """
+    Izgaradaki değişen satırlar tek "veri" alanında JSON olarak gelir
+    (binlerce input ayrı form alanı olarak gönderilmez).
+    """
+    start_date, end_date, vardiya_sayisi = _toplu_aralik()
+    try:
+        kayitlar = json.loads(request.form.get("veri") or "[]")
+        if not isinstance(kayitlar, list) or not all(isinstance(k, dict) for k in kayitlar):
+            raise ValueError
+    except ValueError:
+        flash("Toplu giriş verisi okunamadı.", "danger")
+        return redirect(url_for("zrapor.z_toplu", start=start_date, end=end_date, vardiya_sayisi=vardiya_sayisi))
+
+    try:
+        sonuc = toplu_kaydet(kayitlar, current_user.email)
+    except TopluHata as e:
+        # girilenler kaybolmasın: sayfa gönderilen değerlerle yeniden çizilir
+        gonderilen = {
+            f"{k.get('tarih')}|{k.get('kasa_id')}|{k.get('vardiya')}": k for k in kayitlar
+        }
+        return _toplu_sayfa(
+            start_date, end_date, vardiya_sayisi,
+            gonderilen=gonderilen, hatalar=[m for _, m in e.hatalar],
+        ), 400
+
+    for tarih in sonuc["tarihler"]:
+        tarih_degisti(tarih)
+    flash(f"{sonuc['yeni'] + sonuc['guncel']} Z kaydedildi ({sonuc['yeni']} yeni, {sonuc['guncel']} güncellendi).", "success")
+    return redirect(url_for("zrapor.z_toplu", start=start_date, end=end_date, vardiya_sayisi=vardiya_sayisi))
+
+
+@zrapor_bp.get("/raporlar")
+@login_required
+def raporlar():
+    start_date, end_date, kasa_id = _rapor_filtreleri()
+
+    kasalar = Kasa.query.order_by(Kasa.kasa_no.asc()).all()
+    # Canlı akış bu olaydan sonrasını ister: sorgu ile bağlantı arasındaki kayıtlar kaçmaz
+    son_olay = son_olay_id()
+
+    # Sıcak DB + aralığın dokunduğu yıl arşivleri (bkz. sorgular.py).
+    # Satırlar şablon render edilirken üretilir; toplamlar tfoot'a gelindiğinde hazırdır.
+    rapor = rapor_akisi(start_date, end_date, kasa_id)
+
+    return Response(_parcalari_birlestir(stream_template(
         "raporlar.html",
         app_title=current_app.config["APP_TITLE"],
-        rows=rows,
+        rapor=rapor,
         kasalar=kasalar,
         start_date=start_date,
         end_date=end_date,
         kasa_id=kasa_id,
-        totals={
-            "fis": toplam_fis,
-            "fatura": toplam_fatura,
-            "iade": toplam_iade,
-            "pos_brut": toplam_pos_brut,
-            "komisyon": toplam_komisyon,
-            "pos_net": toplam_pos_net,
-            "kdv": toplam_kdv.quantize(Decimal("0.00")),
-            "nihai": (toplam_fis + toplam_fatura - toplam_iade).quantize(Decimal("0.00"))
-        }
+        son_olay=son_olay,
+    )), mimetype="text/html")
+
+@zrapor_bp.get("/raporlar/csv")
+@login_required
+def raporlar_csv():
+    """Aynı filtrelerle CSV (Excel için ; ayraç, virgüllü ondalık, BOM), akış olarak."""
+    start_date, end_date, kasa_id = _rapor_filtreleri()
+    rapor = rapor_akisi(start_date, end_date, kasa_id)
+    alanlar = ("fis", "fatura", "iade", "nihai", "kdv", "pos_brut", "komisyon", "pos_net")
+
+    def _tutar(v):
+        return f"{v:.2f}".replace(".", ",")
+
+    def _uret():
+        yield "\ufeffTarih;Kasa;Fiş;Fatura;İade;Nihai Ciro;KDV;POS Brüt;Komisyon;POS Net\r\n"
+        for r in rapor:
+            yield ";".join([r["tarih"].isoformat(), str(r["kasa_no"]), *(_tutar(r[a]) for a in alanlar)]) + "\r\n"
+        yield ";".join(["TOPLAM", "", *(_tutar(rapor.toplam[a]) for a in alanlar)]) + "\r\n"
+
+    dosya = f"z_raporlari_{start_date.isoformat()}_{end_date.isoformat()}.csv"
+    return Response(
+        _parcalari_birlestir(stream_with_context(_uret())),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{dosya}"'},
     )
 
-@zrapor_bp.get("/raporlar/<int:z_id>")
+@zrapor_bp.get("/raporlar/canli")
 @login_required
-def rapor_detay(z_id):
-    z = db.session.get(ZRaporu, z_id)
-    if not z:
-        flash("Kayıt bulunamadı.", "danger")
+def raporlar_canli():
+    """
+    SSE: yeni/değişen Z satırlarının özeti. Last-Event-ID ile kaldığı yerden devam;
+    ilk bağlantıda sayfanın render edildiği andaki olay id'si (?son=).
+    """
+    son_raw = request.headers.get("Last-Event-ID") or request.args.get("son") or ""
+    son_id = int(son_raw) if son_raw.isdigit() else son_olay_id()
+
+    cfg = current_app.config
+    akis = olay_akisi(
+        son_id, cfg["CANLI_AKIS_SURESI"], cfg["CANLI_ARALIK"],
+        cfg["CANLI_MAX_AKIS"], cfg["CANLI_DOLU_BEKLEME"],
+    )
+
+    # Akış boyunca session bağlantısı tutulmasın
+    db.session.remove()
+
+    return Response(
+        stream_with_context(akis),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@zrapor_bp.get("/raporlar/paket")
+@login_required
+def rapor_paketi():
+    """
+    Aylık paket: ayın tüm Z detayları tek yazdırılabilir sayfada.
+    Güncel paket varsa dosyadan sunulur; yoksa arka planda üretilir
+    (flask aylik-paket) ve sayfa hazır olana kadar kendini yeniler.
+    Üretim başarısız olduysa hata gösterilir.
+    """
+    ay = request.args.get("ay") or ""
+    try:
+        start_date, end_date = ay_araligi(ay)
+    except ValueError:
+        flash("Ay seçmelisin (YYYY-AA).", "danger")
         return redirect(url_for("zrapor.raporlar"))
 
-    # ---- KDV: KDV DAHİL tutarı içinden ayır ----
-    kdv_map = {s.oran_kodu: Decimal(s.matrah) for s in z.kdv_satirlari}
-
-    order = ["KDV0", "KDV5", "KDV10", "KDV16", "KDV20", "OZEL"]
-    kdv_rows = []
-
-    toplam_brut = Decimal("0.00")
-    toplam_net = Decimal("0.00")
-    toplam_kdv = Decimal("0.00")
-
-    for kod in order:
-        brut = kdv_map.get(kod, Decimal("0.00"))  # kullanıcı girişi: KDV dahil
-        oran = KDV_ORAN_MAP.get(kod, None)
-
-        if oran is None:
-            # OZEL: oran sabit değil -> hesap yapmıyoruz
-            net = brut
-            kdv = Decimal("0.00")
-            oran_yuzde = None
-        else:
-            net, kdv = kdv_dahil_ayir(brut, oran)
-            oran_yuzde = (oran * Decimal("100")).quantize(Decimal("0.00"))
-
-        kdv_rows.append({
-            "kod": kod,
-            "oran_yuzde": oran_yuzde,
-            "brut": brut,
-            "net": net,
-            "kdv": kdv,
-        })
+    cikti = varsayilan_cikti(start_date, end_date)
+    if guncel_mi(cikti, paket_imzasi(start_date, end_date)):
+        return send_file(cikti, mimetype="text/html")
+
+    # başarısız iş sayfa yenilendikçe yeniden başlatılmaz; kullanıcı "Tekrar dene" der
+    is_adi = f"paket-{ay}"
+    if request.args.get("yeniden"):
+        isler.hatayi_temizle(is_adi)
+        return redirect(url_for("zrapor.rapor_paketi", ay=ay))
+    hata = isler.hata(is_adi)
+    if hata is None:
+        isler.baslat(is_adi, "aylik-paket", ay)
+    return render_template(
+        "paket_hazirlaniyor.html",
+        app_title=current_app.config["APP_TITLE"],
+        ay=ay,
+        hata=hata,
+    )
 
-        toplam_brut += brut
-        toplam_net += net
-        toplam_kdv += kdv
-
-    # ---- POS detay hesap ----
-    pos_detay = []
-    pos_brut = Decimal("0.00")
-    komisyon = Decimal("0.00")
-
-    for ps in z.pos_satirlari:
-        brut = Decimal(ps.brut_tutar)
-        oran = Decimal(ps.pos_cihaz.komisyon_orani)
-        kom = komisyon_hesapla(brut, oran)
-        net = (brut - kom).quantize(Decimal("0.00"))
-        pos_detay.append({
-            "ad": ps.pos_cihaz.ad,
-            "banka": (ps.pos_cihaz.banka.ad if ps.pos_cihaz and ps.pos_cihaz.banka else "-"),
-            "oran": oran,
-            "brut": brut,
-            "kom": kom,
-            "net": net
-        })
-        pos_brut += brut
-        komisyon += kom
+@zrapor_bp.get("/raporlar/valor")
+@login_required
+def valor():
+    """
+    Banka tahsilat tahmini: POS net, banka + valör tarihi bazında.
+    """
+    today = date.today()
+    try:
+        start_date = datetime.strptime(request.args.get("start") or "", "%Y-%m-%d").date()
+    except ValueError:
+        start_date = today - timedelta(days=7)
+    try:
+        end_date = datetime.strptime(request.args.get("end") or "", "%Y-%m-%d").date()
+    except ValueError:
+        end_date = today + timedelta(days=30)
+    if end_date < start_date:
+        flash("Bitiş başlangıçtan önce olamaz.", "danger")
+        end_date = start_date
+
+    return render_template(
+        "valor.html",
+        app_title=current_app.config["APP_TITLE"],
+        start_date=start_date,
+        end_date=end_date,
+        today=today,
+        **valor_raporu(start_date, end_date),
+    )
+
+@zrapor_bp.get("/raporlar/kdv")
+@login_required
+def kdv_beyani_sayfasi():
+    """
+    Aylık KDV beyanı: oran kodu başına brüt / net / KDV + aynı ayın önceki yılları.
+    """
+    gecen_ay = (date.today().replace(day=1) - timedelta(days=1)).strftime("%Y-%m")
+    ay = request.args.get("ay") or gecen_ay
+    try:
+        ay_araligi(ay)
+    except ValueError:
+        flash("Ay formatı YYYY-AA olmalı.", "danger")
+        ay = gecen_ay
+
+    yil_raw = (request.args.get("yil_sayisi") or "3").strip()
+    yil_sayisi = min(max(int(yil_raw), 1), 5) if yil_raw.isdigit() else 3
+
+    return render_template(
+        "kdv_beyani.html",
+        app_title=current_app.config["APP_TITLE"],
+        yil_sayisi=yil_sayisi,
+        kdv_kodlari=KDV_KODLARI,
+        **kdv_beyani(ay, yil_sayisi),
+    )
 
-    pos_net = (pos_brut - komisyon).quantize(Decimal("0.00"))
-    nihai_ciro = (Decimal(z.fis_ciro) + Decimal(z.fatura_ciro) - Decimal(z.iade_tutar)).quantize(Decimal("0.00"))
+@zrapor_bp.get("/raporlar/ara")
+@login_required
+def arama():
+    """
+    Z arama: tutar aralığı (nihai / fiş / POS satırı / KDV satırı), POS cihazı,
+    kasiyer, durum, kullanıcı. Tarih boşsa tüm geçmiş (arşivler dahil).
+    """
+    filtreler = filtreleri_oku(request.args)
+    sonuc = ara(filtreler) if filtre_var_mi(filtreler) else None
+
+    return render_template(
+        "arama.html",
+        app_title=current_app.config["APP_TITLE"],
+        f=filtreler,
+        args=request.args,
+        sonuc=sonuc,
+        kasalar={k.id: k.kasa_no for k in Kasa.query.order_by(Kasa.kasa_no.asc())},
+        kasiyerler={k.id: k.ad for k in Kasiyer.query.order_by(Kasiyer.ad.asc())},
+        poslar=PosCihazi.query.order_by(PosCihazi.ad.asc()).all(),
+        durumlar=ARAMA_DURUMLARI,
+        tutar_alanlari=TUTAR_ALANLARI,
+        kdv_kodlari=KDV_KODLARI,
+    )
+
+
+@zrapor_bp.get("/raporlar/ara.json")
+@login_required
+def arama_json():
+    """Aynı filtreler, JSON; en az bir filtre zorunlu."""
+    filtreler = filtreleri_oku(request.args)
+    if not filtre_var_mi(filtreler):
+        return jsonify({"hata": "En az bir filtre gerekli."}), 400
+    sonuc = ara(filtreler)
+    return jsonify({
+        "fazlasi_var": sonuc["fazlasi_var"],
+        "sonuclar": [
+            dict(s, tarih=s["tarih"].isoformat(), nihai=str(s["nihai"]),
+                 url=url_for("zrapor.rapor_detay", z_id=s["id"], yil=s["arsiv"]))
+            for s in sonuc["sonuclar"]
+        ],
+    })
+
+@zrapor_bp.get("/raporlar/<int:z_id>")
+@zrapor_bp.get("/raporlar/arsiv/<int:yil>/<int:z_id>")
+@login_required
+def rapor_detay(z_id, yil=None):
+    kayit = rapor_getir(z_id, yil)
+    if not kayit:
+        flash("Kayıt bulunamadı.", "danger")
+        return redirect(url_for("zrapor.raporlar"))
+
+    z = kayit["z"]
+    detay = rapor_detay_hesapla(
+        z["fis_ciro"], z["fatura_ciro"], z["iade_tutar"],
+        kayit["kdv_map"], kayit["pos_satirlari"],
+    )
 
     return render_template(
         "rapor_detay.html",
         app_title=current_app.config["APP_TITLE"],
         z=z,
-        nihai=nihai_ciro,
-        kdv_rows=kdv_rows,
-        kdv_totals={"brut": toplam_brut, "net": toplam_net, "kdv": toplam_kdv},
-        pos_detay=pos_detay,
-        pos_brut=pos_brut,
-        komisyon=komisyon,
-        pos_net=pos_net
+        **detay
     )
@@ -61,4 +61,125 @@ def kdv_dahil_ayir(brut_kdv_dahil: Decimal, oran: Decimal) -> tuple[Decimal, Dec
 
     net = (brut_kdv_dahil / (Decimal("1.00") + oran)).quantize(Decimal("0.00"))
     kdv = (brut_kdv_dahil - net).quantize(Decimal("0.00"))
-    return (net, kdv)
\ No newline at end of file
+    return (net, kdv)
+
+def satir_ozeti(fis: Decimal, fatura: Decimal, iade: Decimal, kdv_satirlari, pos_satirlari) -> dict:
+    """
+    /raporlar satırı hesabı (tek Z için):
+    - kdv_satirlari: [(oran_kodu, kdv_dahil_tutar), ...]
+    - pos_satirlari: [(brut, komisyon_orani), ...]
+    dönüş: nihai, kdv, pos_brut, komisyon, pos_net
+    """
+    kdv_toplam = Decimal("0.00")
+    for kod, brut in kdv_satirlari:
+        oran = KDV_ORAN_MAP.get(kod, None)
+        if oran is None:
+            continue  # OZEL gibi sabit oranı olmayanlar
+        _, kdv = kdv_dahil_ayir(Decimal(brut), oran)
+        kdv_toplam += kdv
+
+    pos_brut = Decimal("0.00")
+    komisyon = Decimal("0.00")
+    for brut, oran in pos_satirlari:
+        pos_brut += Decimal(brut)
+        komisyon += komisyon_hesapla(Decimal(brut), Decimal(oran))
+
+    return {
+        "nihai": (Decimal(fis) + Decimal(fatura) - Decimal(iade)).quantize(Decimal("0.00")),
+        "kdv": kdv_toplam.quantize(Decimal("0.00")),
+        "pos_brut": pos_brut,
+        "komisyon": komisyon,
+        "pos_net": (pos_brut - komisyon).quantize(Decimal("0.00")),
+    }
+
+
+TOPLAM_ALANLARI = ["fis", "fatura", "iade", "pos_brut", "komisyon", "pos_net", "kdv"]
+
+
+def toplam_baslat() -> dict:
+    return {k: Decimal("0.00") for k in TOPLAM_ALANLARI}
+
+
+def toplama_ekle(totals: dict, row: dict) -> None:
+    for k in TOPLAM_ALANLARI:
+        totals[k] += row[k]
+
+
+def toplam_kapat(totals: dict) -> dict:
+    """
+    Şablona gidecek son hali: kdv yuvarlanır, nihai ciro eklenir.
+    """
+    out = dict(totals)
+    out["kdv"] = totals["kdv"].quantize(Decimal("0.00"))
+    out["nihai"] = (totals["fis"] + totals["fatura"] - totals["iade"]).quantize(Decimal("0.00"))
+    return out
+
+
+def rapor_detay_hesapla(fis: Decimal, fatura: Decimal, iade: Decimal, kdv_map: dict, pos_satirlari) -> dict:
+    """
+    rapor_detay ekranının hesapları.
+    - kdv_map: {oran_kodu: kdv_dahil_tutar}
+    - pos_satirlari: [{"ad", "banka", "oran", "brut"}, ...]
+    dönüş: şablon değişkenleri (nihai, kdv_rows, kdv_totals, pos_detay, pos_brut, komisyon, pos_net)
+    """
+    # ---- KDV: KDV DAHİL tutarı içinden ayır ----
+    kdv_rows = []
+    toplam_brut = Decimal("0.00")
+    toplam_net = Decimal("0.00")
+    toplam_kdv = Decimal("0.00")
+
+    for kod in KDV_KODLARI:
+        brut = Decimal(kdv_map.get(kod, Decimal("0.00")))  # kullanıcı girişi: KDV dahil
+        oran = KDV_ORAN_MAP.get(kod, None)
+
+        if oran is None:
+            # OZEL: oran sabit değil -> hesap yapmıyoruz
+            net = brut
+            kdv = Decimal("0.00")
+            oran_yuzde = None
+        else:
+            net, kdv = kdv_dahil_ayir(brut, oran)
+            oran_yuzde = (oran * Decimal("100")).quantize(Decimal("0.00"))
+
+        kdv_rows.append({
+            "kod": kod,
+            "oran_yuzde": oran_yuzde,
+            "brut": brut,
+            "net": net,
+            "kdv": kdv,
+        })
+
+        toplam_brut += brut
+        toplam_net += net
+        toplam_kdv += kdv
+
+    # ---- POS detay hesap ----
+    pos_detay = []
+    pos_brut = Decimal("0.00")
+    komisyon = Decimal("0.00")
+
+    for ps in pos_satirlari:
+        brut = Decimal(ps["brut"])
+        oran = Decimal(ps["oran"])
+        kom = komisyon_hesapla(brut, oran)
+        net = (brut - kom).quantize(Decimal("0.00"))
+        pos_detay.append({
+            "ad": ps["ad"],
+            "banka": ps["banka"] or "-",
+            "oran": oran,
+            "brut": brut,
+            "kom": kom,
+            "net": net
+        })
+        pos_brut += brut
+        komisyon += kom
+
+    return {
+        "nihai": (Decimal(fis) + Decimal(fatura) - Decimal(iade)).quantize(Decimal("0.00")),
+        "kdv_rows": kdv_rows,
+        "kdv_totals": {"brut": toplam_brut, "net": toplam_net, "kdv": toplam_kdv},
+        "pos_detay": pos_detay,
+        "pos_brut": pos_brut,
+        "komisyon": komisyon,
+        "pos_net": (pos_brut - komisyon).quantize(Decimal("0.00")),
+    }
@@ -0,0 +1,246 @@
+"""
+Rapor sorgu katmanı.
+
+Sıcak DB (main) + aralığın dokunduğu yıl arşivleri (arsiv.py) tek bağlantıda
+ATTACH edilir, başlık sorguları UNION ALL ile birleşir. Satırlar (KDV/POS)
+başlıklarla aynı şemadan, parti parti (IN listesi) okunur.
+"""
+from contextlib import contextmanager
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import bindparam, text
+
+from .. import okuma
+from ..extensions import db
+from . import arsiv
+from .services import satir_ozeti, toplam_baslat, toplama_ekle, toplam_kapat
+
+# Satır sorgularında tek seferde işlenen Z sayısı
+PARTI = 500
+
+_BASLIK_KOLONLARI = dict(
+    tarih=db.Date,
+    fis_ciro=db.Numeric(14, 2),
+    fatura_ciro=db.Numeric(14, 2),
+    iade_tutar=db.Numeric(14, 2),
+)
+
+
+@contextmanager
+def rapor_baglantisi(yillar, yazma=False):
+    """
+    Verilen arşiv yıllarını ATTACH eden bağlantı; salt okunur engine'den
+    (bkz. app/okuma.py). yazma=True: aynı bağlantıda önbellek yazacaklar için birincil engine.
+    yield: (conn, [(arsiv_yili|None, sema), ...])
+    """
+    conn = (db.engine if yazma else okuma.motor()).connect()
+    semalar = [(None, "main")]
+    try:
+        for yil in yillar:
+            sema = arsiv.sema_adi(yil)
+            conn.exec_driver_sql(f"ATTACH DATABASE ? AS {sema}", (str(arsiv.arsiv_yolu(yil)),))
+            semalar.append((yil, sema))
+        yield conn, semalar
+    finally:
+        conn.rollback()
+        for yil, sema in semalar[1:]:
+            conn.exec_driver_sql(f"DETACH DATABASE {sema}")
+        conn.close()
+
+
+def _baslik_sorgusu(semalar, kasa_id, artan=False):
+    parcalar = []
+    for yil, sema in semalar:
+        sql = (
+            f"SELECT z.id AS id, z.tarih AS tarih, z.kasa_id AS kasa_id, k.kasa_no AS kasa_no, "
+            f"z.fis_ciro AS fis_ciro, z.fatura_ciro AS fatura_ciro, z.iade_tutar AS iade_tutar, "
+            f"{yil if yil is not None else 'NULL'} AS arsiv "
+            f"FROM {sema}.z_raporlari z JOIN main.kasalar k ON k.id = z.kasa_id "
+            f"WHERE z.tarih >= :start AND z.tarih <= :end"
+        )
+        if kasa_id is not None:
+            sql += " AND z.kasa_id = :kasa_id"
+        parcalar.append(sql)
+
+    sira = "tarih ASC, kasa_no ASC, id ASC" if artan else "tarih DESC, kasa_id ASC"
+    sql = " UNION ALL ".join(parcalar) + f" ORDER BY {sira}"
+    stmt = text(sql).bindparams(
+        bindparam("start", type_=db.Date),
+        bindparam("end", type_=db.Date),
+    )
+    return stmt.columns(**_BASLIK_KOLONLARI)
+
+
+def _satirlari_getir(conn, sema, ids):
+    """
+    Bir şemadaki Z id'leri için KDV ve POS satırları.
+    dönüş: ({z_id: [(oran_kodu, matrah)]}, {z_id: [(brut, komisyon_orani)]})
+    """
+    kdv = {i: [] for i in ids}
+    pos = {i: [] for i in ids}
+
+    stmt = text(
+        f"SELECT z_raporu_id, oran_kodu, matrah FROM {sema}.z_kdv_satirlari "
+        f"WHERE z_raporu_id IN :ids"
+    ).bindparams(bindparam("ids", expanding=True)).columns(matrah=db.Numeric(14, 2))
+    for z_id, kod, matrah in conn.execute(stmt, {"ids": ids}):
+        kdv[z_id].append((kod, matrah))
+
+    stmt = text(
+        f"SELECT ps.z_raporu_id, ps.brut_tutar, p.komisyon_orani "
+        f"FROM {sema}.z_pos_satirlari ps JOIN main.pos_cihazlari p ON p.id = ps.pos_cihaz_id "
+        f"WHERE ps.z_raporu_id IN :ids"
+    ).bindparams(bindparam("ids", expanding=True)).columns(
+        brut_tutar=db.Numeric(14, 2), komisyon_orani=db.Numeric(6, 4)
+    )
+    for z_id, brut, oran in conn.execute(stmt, {"ids": ids}):
+        pos[z_id].append((brut, oran))
+
+    return kdv, pos
+
+
+def _parti_satirlari(conn, sema_map, parti):
+    satir_kdv = {}
+    satir_pos = {}
+    for yil in {b.arsiv for b in parti}:
+        ids = [b.id for b in parti if b.arsiv == yil]
+        kdv, pos = _satirlari_getir(conn, sema_map[yil], ids)
+        satir_kdv[yil] = kdv
+        satir_pos[yil] = pos
+
+    for b in parti:
+        row = {
+            "id": b.id,
+            "arsiv": b.arsiv,
+            "tarih": b.tarih,
+            "kasa_no": b.kasa_no,
+            "fis": Decimal(b.fis_ciro),
+            "fatura": Decimal(b.fatura_ciro),
+            "iade": Decimal(b.iade_tutar),
+        }
+        row.update(satir_ozeti(
+            b.fis_ciro, b.fatura_ciro, b.iade_tutar,
+            satir_kdv[b.arsiv][b.id], satir_pos[b.arsiv][b.id],
+        ))
+        yield row
+
+
+def rapor_satirlari(start: date, end: date, kasa_id=None):
+    """
+    /raporlar satırları (generator). Arşivdeki kayıtlarda "arsiv" = yıl.
+    Başlıklar da imleçten PARTI'lar halinde okunur; bellek aralık genişliğinden bağımsız.
+    """
+    with rapor_baglantisi(arsiv.aralik_arsivleri(start, end)) as (conn, semalar):
+        sema_map = dict(semalar)
+        params = {"start": start, "end": end}
+        if kasa_id is not None:
+            params["kasa_id"] = kasa_id
+
+        res = conn.execute(_baslik_sorgusu(semalar, kasa_id), params)
+        for parti in res.partitions(PARTI):
+            yield from _parti_satirlari(conn, sema_map, parti)
+
+
+class RaporAkisi:
+    """
+    Satırları gezerken toplamları biriktirir (şablonda tfoot satırlardan sonra gelir).
+    `toplam` iterasyon bitince dolar; önbellekten gelen liste için baştan verilir.
+    """
+
+    def __init__(self, satirlar, toplam=None):
+        self._satirlar = satirlar
+        self.toplam = toplam
+
+    def __iter__(self):
+        if self.toplam is not None:
+            yield from self._satirlar
+            return
+        totals = toplam_baslat()
+        for row in self._satirlar:
+            toplama_ekle(totals, row)
+            yield row
+        self.toplam = toplam_kapat(totals)
+
+
+def rapor_kimlikleri(start: date, end: date, kasa_id=None):
+    """
+    Aralıktaki Z'lerin (id, arsiv_yili|None) listesi, tarih/kasa artan (baskı sırası).
+    """
+    with rapor_baglantisi(arsiv.aralik_arsivleri(start, end)) as (conn, semalar):
+        params = {"start": start, "end": end}
+        if kasa_id is not None:
+            params["kasa_id"] = kasa_id
+        res = conn.execute(_baslik_sorgusu(semalar, kasa_id, artan=True), params)
+        return [(b.id, b.arsiv) for b in res]
+
+
+def rapor_listesi(start: date, end: date, kasa_id=None):
+    """
+    dönüş: (rows, totals) — liste olarak (önbellek için).
+    """
+    akis = RaporAkisi(rapor_satirlari(start, end, kasa_id))
+    rows = list(akis)
+    return rows, akis.toplam
+
+
+def raporlari_getir(kimlikler):
+    """
+    [(z_id, arsiv_yili|None), ...] için rapor_detay verileri (aynı sırada).
+    Her eleman: {"z": {...}, "kdv_map": {...}, "pos_satirlari": [...]} ya da None
+    """
+    mevcut = set(arsiv.arsiv_yillari())
+    yillar = sorted({yil for _, yil in kimlikler if yil is not None and yil in mevcut})
+
+    sonuc = {}
+    with rapor_baglantisi(yillar) as (conn, semalar):
+        for yil, sema in semalar:
+            ids = [z_id for z_id, y in kimlikler if y == yil]
+            if not ids:
+                continue
+
+            stmt = text(
+                f"SELECT z.id, z.tarih, z.vardiya, z.status, k.kasa_no, "
+                f"z.fis_ciro, z.fatura_ciro, z.iade_tutar "
+                f"FROM {sema}.z_raporlari z JOIN main.kasalar k ON k.id = z.kasa_id "
+                f"WHERE z.id IN :ids"
+            ).bindparams(bindparam("ids", expanding=True)).columns(**_BASLIK_KOLONLARI)
+            for b in conn.execute(stmt, {"ids": ids}).mappings():
+                z = dict(b)
+                z["arsiv"] = yil
+                sonuc[(b["id"], yil)] = {"z": z, "kdv_map": {}, "pos_satirlari": []}
+
+            stmt = text(
+                f"SELECT z_raporu_id, oran_kodu, matrah FROM {sema}.z_kdv_satirlari "
+                f"WHERE z_raporu_id IN :ids"
+            ).bindparams(bindparam("ids", expanding=True)).columns(matrah=db.Numeric(14, 2))
+            for z_id, kod, matrah in conn.execute(stmt, {"ids": ids}):
+                if (z_id, yil) in sonuc:
+                    sonuc[(z_id, yil)]["kdv_map"][kod] = matrah
+
+            stmt = text(
+                f"SELECT ps.z_raporu_id, p.ad, b.ad AS banka, p.komisyon_orani, ps.brut_tutar "
+                f"FROM {sema}.z_pos_satirlari ps "
+                f"JOIN main.pos_cihazlari p ON p.id = ps.pos_cihaz_id "
+                f"LEFT JOIN main.bankalar b ON b.id = p.banka_id "
+                f"WHERE ps.z_raporu_id IN :ids ORDER BY ps.id"
+            ).bindparams(bindparam("ids", expanding=True)).columns(
+                komisyon_orani=db.Numeric(6, 4), brut_tutar=db.Numeric(14, 2)
+            )
+            for z_id, ad, banka, oran, brut in conn.execute(stmt, {"ids": ids}):
+                if (z_id, yil) in sonuc:
+                    sonuc[(z_id, yil)]["pos_satirlari"].append(
+                        {"ad": ad, "banka": banka, "oran": oran, "brut": brut}
+                    )
+
+    return [sonuc.get((z_id, yil)) for z_id, yil in kimlikler]
+
+
+def rapor_getir(z_id: int, yil=None):
+    """
+    Tek Z (sıcak DB ya da yıl arşivi) + satırları, rapor_detay için düz veri.
+    dönüş: {"z": {...}, "kdv_map": {...}, "pos_satirlari": [...]} ya da None
+    """
+    if yil is not None and yil not in arsiv.arsiv_yillari():
+        return None
+    return raporlari_getir([(z_id, yil)])[0]
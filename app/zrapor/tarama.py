@@ -0,0 +1,241 @@
+"""
+Z tutarlılık / anomali taraması.
+
+Tüm geçmiş id sırasına göre (keyset) parça parça okunur; bellek parça
+boyutuyla sınırlıdır. Kurallar:
+- kdv_ciro: KDV dahil matrah toplamı = fiş + fatura - iade olmalı
+- pos_ciro: POS brüt toplamı nihai ciroyu aşmamalı
+- vardiya_boslugu: aynı gün + kasada vardiyalar 1'den başlayıp boşluksuz gitmeli
+
+Bulgular her parçadan sonra yazılır. Artımlı çalışmada sadece son taramadan
+sonra değişen (updated_at) Z'ler taranır. Not: arşive taşınmış yıllar taranmaz.
+Paralel taramada her görev tek bir parça id aralığıdır ve aynı anda sınırlı
+sayıda görev bekler; bellek yine parça boyutuyla sınırlı kalır.
+Web'den başlatılan tarama "flask tarama" olarak arka planda çalışır (app/isler.py).
+"""
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import bindparam, insert, text
+
+from ..extensions import db
+from ..models import TaramaBulgusu, TaramaDurumu
+
+PARCA = 1000
+TOLERANS = Decimal("0.01")
+
+KURALLAR = {
+    "kdv_ciro": "KDV matrah toplamı cirodan farklı",
+    "pos_ciro": "POS brüt ciroyu aşıyor",
+    "vardiya_boslugu": "Vardiya sırasında boşluk",
+}
+
+_BASLIK_SQL = (
+    "SELECT id, tarih, kasa_id, vardiya, fis_ciro, fatura_ciro, iade_tutar "
+    "FROM z_raporlari WHERE id > :son_id AND id <= :id_son {kosul} ORDER BY id LIMIT :limit"
+)
+
+
+def _parca_oku(conn, son_id, id_son, esik, limit):
+    kosul = "AND updated_at > :esik" if esik is not None else ""
+    stmt = text(_BASLIK_SQL.format(kosul=kosul)).columns(
+        tarih=db.Date,
+        fis_ciro=db.Numeric(14, 2),
+        fatura_ciro=db.Numeric(14, 2),
+        iade_tutar=db.Numeric(14, 2),
+    )
+    params = {"son_id": son_id, "id_son": id_son, "limit": limit}
+    if esik is not None:
+        stmt = stmt.bindparams(bindparam("esik", type_=db.DateTime))
+        params["esik"] = esik
+    return conn.execute(stmt, params).fetchall()
+
+
+def _toplamlar(conn, tablo, kolon, ids):
+    stmt = text(
+        f"SELECT z_raporu_id, SUM({kolon}) FROM {tablo} "
+        f"WHERE z_raporu_id IN :ids GROUP BY z_raporu_id"
+    ).bindparams(bindparam("ids", expanding=True))
+    return {
+        z_id: Decimal(str(toplam or 0)).quantize(Decimal("0.00"))
+        for z_id, toplam in conn.execute(stmt, {"ids": ids})
+    }
+
+
+def _vardiya_gruplari(conn, basliklar):
+    """
+    Parçadaki (tarih, kasa) çiftlerinin TÜM vardiyaları: {(tarih, kasa_id): [(vardiya, id), ...]}
+    """
+    ciftler = {(b.tarih, b.kasa_id) for b in basliklar}
+    tarihler = sorted({t for t, _ in ciftler})
+    stmt = text(
+        "SELECT tarih, kasa_id, vardiya, id FROM z_raporlari WHERE tarih IN :tarihler"
+    ).bindparams(bindparam("tarihler", expanding=True, type_=db.Date)).columns(tarih=db.Date)
+
+    gruplar = {c: [] for c in ciftler}
+    for tarih, kasa_id, vardiya, z_id in conn.execute(stmt, {"tarihler": tarihler}):
+        if (tarih, kasa_id) in gruplar:
+            gruplar[(tarih, kasa_id)].append((vardiya, z_id))
+    return gruplar
+
+
+def kurallari_uygula(basliklar, kdv_toplam, pos_toplam, gruplar):
+    """
+    dönüş: (bulgular, vardiya_grubu_idleri)
+    vardiya_grubu_idleri: vardiya kuralı yeniden değerlendirilen tüm Z id'leri
+    """
+    simdi = datetime.utcnow()
+    bulgular = []
+
+    def ekle(z_id, tarih, kasa_id, kural, mesaj):
+        bulgular.append({
+            "z_raporu_id": z_id, "tarih": tarih, "kasa_id": kasa_id,
+            "kural": kural, "mesaj": mesaj, "created_at": simdi,
+        })
+
+    for b in basliklar:
+        nihai = (Decimal(b.fis_ciro) + Decimal(b.fatura_ciro) - Decimal(b.iade_tutar)).quantize(Decimal("0.00"))
+
+        kdv = kdv_toplam.get(b.id, Decimal("0.00"))
+        if abs(kdv - nihai) > TOLERANS:
+            ekle(b.id, b.tarih, b.kasa_id, "kdv_ciro", f"KDV matrah {kdv:.2f} / ciro {nihai:.2f}")
+
+        pos = pos_toplam.get(b.id, Decimal("0.00"))
+        if pos > nihai + TOLERANS:
+            ekle(b.id, b.tarih, b.kasa_id, "pos_ciro", f"POS brüt {pos:.2f} / ciro {nihai:.2f}")
+
+    grup_idleri = []
+    for (tarih, kasa_id), uyeler in gruplar.items():
+        vardiyalar = {v for v, _ in uyeler}
+        for v, z_id in uyeler:
+            grup_idleri.append(z_id)
+            eksik = [x for x in range(1, v) if x not in vardiyalar]
+            if eksik:
+                ekle(z_id, tarih, kasa_id, "vardiya_boslugu",
+                     f"Vardiya {v} var, {', '.join(map(str, eksik))} yok")
+
+    return bulgular, grup_idleri
+
+
+def _aralik_tara(conn, id_bas, id_son, esik, parca):
+    """
+    (id_bas, id_son] aralığını parça parça tarar; her parça için
+    (taranan_idler, bulgular, vardiya_grubu_idleri) üretir.
+    """
+    son_id = id_bas
+    while True:
+        basliklar = _parca_oku(conn, son_id, id_son, esik, parca)
+        if not basliklar:
+            return
+        ids = [b.id for b in basliklar]
+        kdv = _toplamlar(conn, "z_kdv_satirlari", "matrah", ids)
+        pos = _toplamlar(conn, "z_pos_satirlari", "brut_tutar", ids)
+        bulgular, grup_idleri = kurallari_uygula(basliklar, kdv, pos, _vardiya_gruplari(conn, basliklar))
+        yield ids, bulgular, grup_idleri
+        son_id = ids[-1]
+
+
+def _bulgulari_yaz(ids, bulgular, grup_idleri):
+    """
+    Parçanın eski bulgularını silip yenilerini yazar (tek transaction).
+    """
+    tablo = TaramaBulgusu.__table__
+    db.session.execute(
+        tablo.delete().where(tablo.c.z_raporu_id.in_(ids), tablo.c.kural != "vardiya_boslugu")
+    )
+    db.session.execute(
+        tablo.delete().where(tablo.c.z_raporu_id.in_(grup_idleri), tablo.c.kural == "vardiya_boslugu")
+    )
+    if bulgular:
+        db.session.execute(insert(TaramaBulgusu), bulgular)
+    db.session.commit()
+
+
+_isci_app = None
+
+
+def _isci_baslat():
+    global _isci_app
+    from .. import create_app
+    _isci_app = create_app()
+
+
+def _isci_gorevi(id_bas, id_son, esik):
+    """
+    Process havuzu görevi: (id_bas, id_son] aralığını (en fazla bir parça) tarar.
+    dönüş: (taranan_idler, bulgular, vardiya_grubu_idleri) ya da None
+    """
+    with _isci_app.app_context():
+        with db.engine.connect() as conn:
+            return next(_aralik_tara(conn, id_bas, id_son, esik, id_son - id_bas), None)
+
+
+def tara(tam: bool = False, isci: int = 1, parca: int = PARCA) -> dict:
+    """
+    tam=False: son taramadan sonra değişen Z'ler; tam=True: tüm geçmiş.
+    isci > 1: id aralığı parça genişliğinde görevlere bölünüp process'lere dağıtılır.
+    dönüş: {"taranan", "bulgu", "sure_ms"}
+    """
+    t0 = time.perf_counter()
+    baslangic = datetime.utcnow()
+
+    durum = db.session.get(TaramaDurumu, 1)
+    if durum is None:
+        durum = TaramaDurumu(id=1, taranan=0, sure_ms=0)
+        db.session.add(durum)
+    esik = None if tam or durum.son_baslangic is None else durum.son_baslangic
+
+    if esik is None:
+        db.session.execute(TaramaBulgusu.__table__.delete())
+    else:
+        # silinen / arşive taşınan Z'lerin bulguları
+        db.session.execute(text(
+            "DELETE FROM tarama_bulgulari WHERE z_raporu_id NOT IN (SELECT id FROM z_raporlari)"
+        ))
+    db.session.commit()
+
+    max_id = db.session.execute(text("SELECT COALESCE(MAX(id), 0) FROM z_raporlari")).scalar()
+    taranan = 0
+    bulgu = 0
+
+    def _yaz(sonuc):
+        nonlocal taranan, bulgu
+        if sonuc is None:
+            return
+        ids, bulgular, grup_idleri = sonuc
+        _bulgulari_yaz(ids, bulgular, grup_idleri)
+        taranan += len(ids)
+        bulgu += len(bulgular)
+
+    if isci <= 1:
+        with db.engine.connect() as conn:
+            for sonuc in _aralik_tara(conn, 0, max_id, esik, parca):
+                _yaz(sonuc)
+    else:
+        with ProcessPoolExecutor(
+            max_workers=isci,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_isci_baslat,
+        ) as havuz:
+            # görev = tek parça; aynı anda en fazla 2*isci görevin sonucu bellekte
+            bekleyen = deque()
+            for bas in range(0, max_id, parca):
+                bekleyen.append(havuz.submit(_isci_gorevi, bas, min(bas + parca, max_id), esik))
+                if len(bekleyen) >= 2 * isci:
+                    _yaz(bekleyen.popleft().result())
+            while bekleyen:
+                _yaz(bekleyen.popleft().result())
+
+    sure_ms = int((time.perf_counter() - t0) * 1000)
+    durum = db.session.get(TaramaDurumu, 1)
+    durum.son_baslangic = baslangic
+    durum.son_bitis = datetime.utcnow()
+    durum.taranan = taranan
+    durum.sure_ms = sure_ms
+    db.session.commit()
+
+    return {"taranan": taranan, "bulgu": bulgu, "sure_ms": sure_ms}
@@ -0,0 +1,203 @@
+"""
+Taslak otomatik kayıt: sadece değişen alan/satırlar için minimal UPDATE.
+
+z_giris_post tüm başlığı yeniden yazar ve satırları silip ekler; autosave
+ise gelen alanları mevcut değerlerle karşılaştırır, farklı olanları tek
+tek günceller. Hiçbir şey değişmediyse DB'ye yazmaz.
+
+Yazan her istek başlığı "WHERE surum = ?" ile günceller ve sürümü artırır
+(kayit.py ile aynı iyimser eşzamanlılık); istemci gördüğü sürümü gönderir
+(0: Z yok sanıyor). Sürümsüz istek mevcut Z'yi değiştiremez.
+
+(tarih, kasa, vardiya) için Z yoksa ilk autosave onu taslak olarak açar ("yeni"
+döner); kasiyerin girdiği POS slipleri Kaydet'e basılmadan da kaybolmaz.
+İstemci anahtarı değiştirirse eski anahtarda açtığı ve Kaydet'lenmemiş taslağı
+taslak_birak ile siler (form değerleri yeni anahtara taşınır); sayfa kapanırsa
+taslak kalır ve raporlarda "Taslak" olarak görünür.
+"""
+from datetime import datetime
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from ..extensions import db
+from ..models import PosCihazi, ZKdvSatiri, ZPosSatiri, ZRaporu
+from .beyan import ay_sil
+from .canli import olay_yayinla, olaylari_yayinla
+from .kayit import CAKISMA_MESAJI, SURUM_YOK_MESAJI
+from .services import KDV_KODLARI, parse_try
+from .valor import gunu_sil
+
+BASLIK_ALANLARI = ("fis_ciro", "fatura_ciro", "iade_tutar")
+
+
+class TaslakHatasi(Exception):
+    """Autosave isteği uygulanamadı (mesaj kullanıcıya gösterilir)."""
+
+    def __init__(self, mesaj, durum=400):
+        super().__init__(mesaj)
+        self.mesaj = mesaj
+        self.durum = durum
+
+
+def taslak_uygula(tarih, kasa_id, vardiya, kasiyer_id, alanlar, kdv, pos, kullanici,
+                  beklenen_surum=None) -> dict:
+    """
+    alanlar: {"fis_ciro": "1.234,56", ...} (sadece değişenler)
+    kdv:     {"KDV10": "...", ...}
+    pos:     {pos_cihaz_id: "...", ...}  (0 -> satır silinir)
+    beklenen_surum: istemcinin gördüğü sürüm (0: Z yok sanıyor; None: bilinmiyor)
+    dönüş: {"z_id", "degisen", "surum", "yeni"}; yeni=True -> Z bu istekle açıldı
+    """
+    try:
+        return _uygula(tarih, kasa_id, vardiya, kasiyer_id, alanlar, kdv, pos, kullanici, beklenen_surum)
+    except IntegrityError:
+        # aynı (tarih, kasa, vardiya) için eşzamanlı ilk kayıt
+        db.session.rollback()
+        raise TaslakHatasi(CAKISMA_MESAJI, 409)
+
+
+def _uygula(tarih, kasa_id, vardiya, kasiyer_id, alanlar, kdv, pos, kullanici, beklenen_surum):
+    degisen = 0
+
+    z = db.session.execute(
+        select(ZRaporu.id, ZRaporu.status, ZRaporu.kasiyer_id, ZRaporu.surum,
+               ZRaporu.fis_ciro, ZRaporu.fatura_ciro, ZRaporu.iade_tutar)
+        .where(ZRaporu.tarih == tarih, ZRaporu.kasa_id == kasa_id, ZRaporu.vardiya == vardiya)
+    ).first()
+
+    if z is not None and z.status == "locked":
+        raise TaslakHatasi("Bu Z raporu kilitli. Düzenlenemez.", 409)
+    if z is not None and beklenen_surum is None:
+        raise TaslakHatasi(SURUM_YOK_MESAJI, 409)
+    if z is not None and z.surum != beklenen_surum:
+        raise TaslakHatasi(CAKISMA_MESAJI, 409)
+
+    if z is None and beklenen_surum:
+        # istemcinin gördüğü Z arada silinmiş
+        db.session.rollback()
+        raise TaslakHatasi(CAKISMA_MESAJI, 409)
+
+    yeni_baslik = {k: parse_try(v) for k, v in alanlar.items() if k in BASLIK_ALANLARI}
+
+    if z is None:
+        z_id = db.session.execute(
+            insert(ZRaporu).values(
+                tarih=tarih, kasa_id=kasa_id, vardiya=vardiya, kasiyer_id=kasiyer_id,
+                status="draft", created_by=kullanici, surum=1,
+                updated_at=datetime.utcnow(), updated_by=kullanici,
+                **{k: yeni_baslik.get(k, 0) for k in BASLIK_ALANLARI},
+            )
+        ).inserted_primary_key[0]
+        degisen += 1
+        surum = 1
+        baslik_farki = {}
+    else:
+        z_id = z.id
+        surum = z.surum
+        baslik_farki = {k: v for k, v in yeni_baslik.items() if getattr(z, k) != v}
+        if kasiyer_id is not None and kasiyer_id != z.kasiyer_id:
+            baslik_farki["kasiyer_id"] = kasiyer_id
+
+    # ---- KDV: sadece gelen kodlar ----
+    kdv_yeni = {k: parse_try(v) for k, v in kdv.items() if k in KDV_KODLARI}
+    if kdv_yeni:
+        mevcut = {
+            r.oran_kodu: r
+            for r in db.session.execute(
+                select(ZKdvSatiri.id, ZKdvSatiri.oran_kodu, ZKdvSatiri.matrah)
+                .where(ZKdvSatiri.z_raporu_id == z_id, ZKdvSatiri.oran_kodu.in_(list(kdv_yeni)))
+            )
+        }
+        for kod, tutar in kdv_yeni.items():
+            satir = mevcut.get(kod)
+            if satir is None:
+                db.session.execute(insert(ZKdvSatiri).values(z_raporu_id=z_id, oran_kodu=kod, matrah=tutar))
+                degisen += 1
+            elif satir.matrah != tutar:
+                db.session.execute(update(ZKdvSatiri).where(ZKdvSatiri.id == satir.id).values(matrah=tutar))
+                degisen += 1
+
+    # ---- POS: cihaz başına tek satır (z_giris_post ile aynı model) ----
+    pos_yeni = {int(k): parse_try(v) for k, v in pos.items() if str(k).isdigit()}
+    if pos_yeni:
+        gecerli = set(db.session.scalars(
+            select(PosCihazi.id).where(PosCihazi.id.in_(list(pos_yeni)), PosCihazi.aktif.is_(True))
+        ))
+        mevcut = {}
+        for r in db.session.execute(
+            select(ZPosSatiri.id, ZPosSatiri.pos_cihaz_id, ZPosSatiri.brut_tutar)
+            .where(ZPosSatiri.z_raporu_id == z_id, ZPosSatiri.pos_cihaz_id.in_(list(pos_yeni)))
+            .order_by(ZPosSatiri.id)
+        ):
+            mevcut.setdefault(r.pos_cihaz_id, []).append(r)
+
+        for pos_id, tutar in pos_yeni.items():
+            satirlar = mevcut.get(pos_id, [])
+            if tutar <= 0 or pos_id not in gecerli:
+                if satirlar:
+                    db.session.execute(delete(ZPosSatiri).where(ZPosSatiri.id.in_([r.id for r in satirlar])))
+                    degisen += 1
+                continue
+            if not satirlar:
+                db.session.execute(insert(ZPosSatiri).values(z_raporu_id=z_id, pos_cihaz_id=pos_id, brut_tutar=tutar))
+                degisen += 1
+                continue
+            if len(satirlar) > 1:
+                db.session.execute(delete(ZPosSatiri).where(ZPosSatiri.id.in_([r.id for r in satirlar[1:]])))
+                degisen += 1
+            if satirlar[0].brut_tutar != tutar:
+                db.session.execute(update(ZPosSatiri).where(ZPosSatiri.id == satirlar[0].id).values(brut_tutar=tutar))
+                degisen += 1
+
+    # ---- başlık: değişen alanlar + izleme bilgisi, sürüm kontrollü tek UPDATE ----
+    if z is not None and (baslik_farki or degisen):
+        sonuc = db.session.execute(
+            update(ZRaporu)
+            .where(ZRaporu.id == z_id, ZRaporu.surum == surum, ZRaporu.status != "locked")
+            .values(updated_at=datetime.utcnow(), updated_by=kullanici, surum=surum + 1, **baslik_farki)
+        )
+        if sonuc.rowcount != 1:
+            db.session.rollback()
+            raise TaslakHatasi(CAKISMA_MESAJI, 409)
+        surum += 1
+        degisen += len(baslik_farki)
+
+    if degisen:
+        # canlı /raporlar satırı + o günün valör / ayın KDV beyanı kaydı (aynı transaction)
+        olay_yayinla(db.session.get(ZRaporu, z_id, populate_existing=True), "kaydedildi")
+        gunu_sil(tarih)
+        ay_sil(tarih)
+        db.session.commit()
+    else:
+        db.session.rollback()
+
+    return {"z_id": z_id, "degisen": degisen, "surum": surum, "yeni": z is None}
+
+
+def taslak_birak(z_id, surum, kullanici):
+    """
+    Autosave'in açtığı ve sonra bırakılan taslağı siler: sadece taslak, aynı
+    kullanıcının açtığı ve istemcinin gördüğü sürümde (arada kimse yazmamış) ise.
+    dönüş: silinen Z'nin tarihi ya da None (silinmedi)
+    """
+    z = db.session.execute(
+        select(ZRaporu.tarih, ZRaporu.kasa_id)
+        .where(ZRaporu.id == z_id, ZRaporu.surum == surum, ZRaporu.status == "draft",
+               ZRaporu.created_by == kullanici)
+    ).first()
+    if z is None:
+        db.session.rollback()
+        return None
+
+    db.session.execute(delete(ZKdvSatiri).where(ZKdvSatiri.z_raporu_id == z_id))
+    db.session.execute(delete(ZPosSatiri).where(ZPosSatiri.z_raporu_id == z_id))
+    sonuc = db.session.execute(delete(ZRaporu).where(ZRaporu.id == z_id, ZRaporu.surum == surum))
+    if sonuc.rowcount != 1:
+        db.session.rollback()
+        return None
+    olaylari_yayinla([{"id": z_id, "tarih": z.tarih.isoformat(), "kasa_id": z.kasa_id}], "silindi")
+    gunu_sil(z.tarih)
+    ay_sil(z.tarih)
+    db.session.commit()
+    return z.tarih
@@ -0,0 +1,279 @@
+"""
+Toplu Z girişi: birden çok gün x kasa x vardiya tek istekte.
+
+Doğrulama, baştan bir kez yüklenen referans görüntüsüne (aktif kasa/kasiyer/
+POS, arşiv yılları, aralıktaki mevcut Z başlıkları) karşı yapılır; satır başına
+sorgu yok. Yazma tek transaction: yeni başlıklar toplu INSERT ... RETURNING,
+mevcutlar sürüm kontrollü toplu UPDATE (kayit.py ile aynı CAS), satırlar toplu
+DELETE + INSERT, canlı olaylar toplu INSERT.
+"""
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import bindparam, delete, insert, select, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from ..extensions import db
+from ..models import Kasa, Kasiyer, PosCihazi, ZKdvSatiri, ZPosSatiri, ZRaporu
+from . import arsiv
+from .beyan import ay_sil
+from .canli import olaylari_yayinla, ozet_satiri
+from .kayit import CAKISMA_MESAJI
+from .services import KDV_KODLARI, parse_try
+from .valor import gunu_sil
+
+# Tek seferde açılabilecek en uzun aralık (gün)
+MAX_GUN = 14
+BASLIK_ALANLARI = ("fis_ciro", "fatura_ciro", "iade_tutar")
+
+
+class TopluHata(Exception):
+    """hatalar: [(anahtar|None, mesaj)]; anahtar = (tarih, kasa_id, vardiya)"""
+
+    def __init__(self, hatalar):
+        super().__init__(f"{len(hatalar)} hata")
+        self.hatalar = hatalar
+
+
+def _anahtar_metni(anahtar, kasa_no):
+    tarih, kasa_id, vardiya = anahtar
+    return f"{tarih.isoformat()} Kasa {kasa_no.get(kasa_id, kasa_id)} V{vardiya}"
+
+
+def _mevcut_zler(start: date, end: date):
+    """
+    Aralıktaki Z başlıkları (tek sorgu); kdv/pos boş gelir, gerekirse _satirlari_ekle doldurur.
+    dönüş: {(tarih, kasa_id, vardiya): {"id", "status", "surum", "kasiyer_id", alanlar, "kdv": {}, "pos": {}}}
+    """
+    zler = {}
+    for z in db.session.execute(
+        select(ZRaporu.id, ZRaporu.tarih, ZRaporu.kasa_id, ZRaporu.vardiya, ZRaporu.status,
+               ZRaporu.surum, ZRaporu.kasiyer_id, ZRaporu.fis_ciro, ZRaporu.fatura_ciro, ZRaporu.iade_tutar)
+        .where(ZRaporu.tarih >= start, ZRaporu.tarih <= end)
+    ):
+        zler[(z.tarih, z.kasa_id, z.vardiya)] = dict(z._mapping, kdv={}, pos={})
+    return zler
+
+
+def _satirlari_ekle(zler):
+    by_id = {z["id"]: z for z in zler.values()}
+    if not by_id:
+        return
+    for z_id, kod, matrah in db.session.execute(
+        select(ZKdvSatiri.z_raporu_id, ZKdvSatiri.oran_kodu, ZKdvSatiri.matrah)
+        .where(ZKdvSatiri.z_raporu_id.in_(list(by_id)))
+    ):
+        by_id[z_id]["kdv"][kod] = matrah
+    for z_id, pos_id, brut in db.session.execute(
+        select(ZPosSatiri.z_raporu_id, ZPosSatiri.pos_cihaz_id, ZPosSatiri.brut_tutar)
+        .where(ZPosSatiri.z_raporu_id.in_(list(by_id)))
+    ):
+        by_id[z_id]["pos"][pos_id] = by_id[z_id]["pos"].get(pos_id, 0) + brut
+
+
+def tablo_verisi(start: date, end: date, vardiya_sayisi: int) -> dict:
+    """
+    Izgara için: aktif kasalar, kasiyerler, POS'lar ve gün x kasa x vardiya satırları
+    (mevcut Z varsa değerleriyle).
+    """
+    kasalar = Kasa.query.filter_by(aktif=True).order_by(Kasa.kasa_no.asc()).all()
+    zler = _mevcut_zler(start, end)
+    _satirlari_ekle(zler)
+
+    satirlar = []
+    d = start
+    while d <= end:
+        for k in kasalar:
+            for v in range(1, vardiya_sayisi + 1):
+                satirlar.append({"tarih": d, "kasa": k, "vardiya": v, "z": zler.get((d, k.id, v))})
+        d += timedelta(days=1)
+
+    return {
+        "kasalar": kasalar,
+        "kasiyerler": Kasiyer.query.filter_by(aktif=True).all(),
+        "poslar": PosCihazi.query.filter_by(aktif=True).order_by(PosCihazi.ad.asc()).all(),
+        "kdv_kodlari": KDV_KODLARI,
+        "satirlar": satirlar,
+        "arsivli": set(arsiv.arsiv_yillari()) & set(range(start.year, end.year + 1)),
+    }
+
+
+def _int(v):
+    s = str(v if v is not None else "").strip()
+    return int(s) if s.isdigit() else None
+
+
+def _dogrula(kayitlar):
+    """
+    Referans görüntüsünü bir kez yükler, tüm satırları ona göre doğrular.
+    dönüş: (temiz satırlar, mevcut Z'ler, kasa_no map, pos oran map)
+    """
+    kasa_no = dict(db.session.execute(select(Kasa.id, Kasa.kasa_no).where(Kasa.aktif.is_(True))).all())
+    kasiyerler = set(db.session.scalars(select(Kasiyer.id).where(Kasiyer.aktif.is_(True))))
+    pos_oran = dict(db.session.execute(
+        select(PosCihazi.id, PosCihazi.komisyon_orani).where(PosCihazi.aktif.is_(True))
+    ).all())
+    arsiv_yillari = set(arsiv.arsiv_yillari())
+
+    hatalar = []
+    temiz = []
+    tarihler = []
+    for i, k in enumerate(kayitlar, start=1):
+        try:
+            tarih = datetime.strptime(str(k.get("tarih") or ""), "%Y-%m-%d").date()
+        except ValueError:
+            hatalar.append((None, f"{i}. satır: tarih hatalı."))
+            continue
+        kasa_id, vardiya = _int(k.get("kasa_id")), _int(k.get("vardiya"))
+        if kasa_id not in kasa_no or vardiya not in (1, 2, 3):
+            hatalar.append((None, f"{i}. satır: kasa/vardiya hatalı."))
+            continue
+        anahtar = (tarih, kasa_id, vardiya)
+        if tarih.year in arsiv_yillari:
+            hatalar.append((anahtar, f"{_anahtar_metni(anahtar, kasa_no)}: yıl arşive taşındı."))
+            continue
+        kasiyer_id = _int(k.get("kasiyer_id"))
+        if kasiyer_id not in kasiyerler:
+            hatalar.append((anahtar, f"{_anahtar_metni(anahtar, kasa_no)}: kasiyer seçmelisin."))
+            continue
+
+        pos_veri, kdv_veri = k.get("pos") or {}, k.get("kdv") or {}
+        if not isinstance(pos_veri, dict) or not isinstance(kdv_veri, dict):
+            hatalar.append((anahtar, f"{_anahtar_metni(anahtar, kasa_no)}: POS/KDV verisi hatalı."))
+            continue
+
+        pos = {}
+        for pos_id, tutar in pos_veri.items():
+            pid = _int(pos_id)
+            brut = parse_try(tutar)
+            if brut <= 0:
+                continue
+            if pid not in pos_oran:
+                hatalar.append((anahtar, f"{_anahtar_metni(anahtar, kasa_no)}: POS bulunamadı."))
+                break
+            pos[pid] = brut
+
+        temiz.append({
+            "anahtar": anahtar,
+            "kasiyer_id": kasiyer_id,
+            "surum": _int(k.get("surum")),
+            **{a: parse_try(k.get(a)) for a in BASLIK_ALANLARI},
+            "kdv": {kod: parse_try(kdv_veri.get(kod)) for kod in KDV_KODLARI},
+            "pos": pos,
+        })
+        tarihler.append(tarih)
+
+    anahtarlar = [t["anahtar"] for t in temiz]
+    if len(set(anahtarlar)) != len(anahtarlar):
+        hatalar.append((None, "Aynı gün + kasa + vardiya birden fazla satırda."))
+
+    mevcut = _mevcut_zler(min(tarihler), max(tarihler)) if tarihler else {}
+    for t in temiz:
+        z = mevcut.get(t["anahtar"])
+        if z is None:
+            continue
+        if z["status"] == "locked":
+            hatalar.append((t["anahtar"], f"{_anahtar_metni(t['anahtar'], kasa_no)}: Z kilitli."))
+        elif t["surum"] is not None and t["surum"] != z["surum"]:
+            hatalar.append((t["anahtar"], f"{_anahtar_metni(t['anahtar'], kasa_no)}: {CAKISMA_MESAJI}"))
+
+    if hatalar:
+        raise TopluHata(hatalar)
+    return temiz, mevcut, kasa_no, pos_oran
+
+
+def toplu_kaydet(kayitlar, kullanici) -> dict:
+    """
+    kayitlar: [{"tarih", "kasa_id", "vardiya", "kasiyer_id", "surum"?, "fis_ciro", "fatura_ciro",
+                "iade_tutar", "kdv": {kod: tutar}, "pos": {pos_id: tutar}}]
+    Hepsi yazılır ya da hiçbiri (TopluHata). dönüş: {"yeni", "guncel", "tarihler"}
+    """
+    if not kayitlar:
+        raise TopluHata([(None, "Değişen satır yok.")])
+
+    temiz, mevcut, kasa_no, pos_oran = _dogrula(kayitlar)
+    simdi = datetime.utcnow()
+
+    yeniler = [t for t in temiz if t["anahtar"] not in mevcut]
+    guncellenen = [t for t in temiz if t["anahtar"] in mevcut]
+
+    try:
+        ids = {}
+        if yeniler:
+            sonuc = db.session.execute(
+                insert(ZRaporu).returning(ZRaporu.id, sort_by_parameter_order=True),
+                [{
+                    "tarih": t["anahtar"][0], "kasa_id": t["anahtar"][1], "vardiya": t["anahtar"][2],
+                    "kasiyer_id": t["kasiyer_id"], "status": "draft", "surum": 1,
+                    "created_by": kullanici, "updated_at": simdi, "updated_by": kullanici,
+                    **{a: t[a] for a in BASLIK_ALANLARI},
+                } for t in yeniler],
+            )
+            for t, z_id in zip(yeniler, sonuc.scalars()):
+                ids[t["anahtar"]] = z_id
+
+        if guncellenen:
+            tablo = ZRaporu.__table__
+            sonuc = db.session.connection().execute(
+                update(tablo)
+                .where(tablo.c.id == bindparam("_id"), tablo.c.surum == bindparam("_surum"),
+                       tablo.c.status != "locked")
+                .values(
+                    surum=bindparam("_surum") + 1, kasiyer_id=bindparam("_kasiyer_id"),
+                    updated_at=simdi, updated_by=kullanici,
+                    **{a: bindparam(f"_{a}") for a in BASLIK_ALANLARI},
+                ),
+                [{
+                    "_id": mevcut[t["anahtar"]]["id"], "_surum": mevcut[t["anahtar"]]["surum"],
+                    "_kasiyer_id": t["kasiyer_id"], **{f"_{a}": t[a] for a in BASLIK_ALANLARI},
+                } for t in guncellenen],
+            )
+            if sonuc.rowcount != len(guncellenen):
+                # görüntü alındıktan sonra başka biri yazdı
+                raise TopluHata([(None, CAKISMA_MESAJI)])
+            for t in guncellenen:
+                ids[t["anahtar"]] = mevcut[t["anahtar"]]["id"]
+
+            eski = [mevcut[t["anahtar"]]["id"] for t in guncellenen]
+            db.session.execute(delete(ZKdvSatiri).where(ZKdvSatiri.z_raporu_id.in_(eski)))
+            db.session.execute(delete(ZPosSatiri).where(ZPosSatiri.z_raporu_id.in_(eski)))
+
+        kdv_satirlari = [
+            {"z_raporu_id": ids[t["anahtar"]], "oran_kodu": kod, "matrah": tutar}
+            for t in temiz for kod, tutar in t["kdv"].items()
+        ]
+        pos_satirlari = [
+            {"z_raporu_id": ids[t["anahtar"]], "pos_cihaz_id": pid, "brut_tutar": brut}
+            for t in temiz for pid, brut in t["pos"].items()
+        ]
+        db.session.execute(insert(ZKdvSatiri), kdv_satirlari)
+        if pos_satirlari:
+            db.session.execute(insert(ZPosSatiri), pos_satirlari)
+
+        # Canlı olaylar: elimizdeki değerlerle, Z başına sorgu olmadan
+        olaylari_yayinla([
+            ozet_satiri(
+                ids[t["anahtar"]], t["anahtar"][0], t["anahtar"][1], kasa_no[t["anahtar"][1]],
+                t["anahtar"][2], mevcut.get(t["anahtar"], {}).get("status", "draft"), t["fis_ciro"], t["fatura_ciro"], t["iade_tutar"],
+                list(t["kdv"].items()), [(brut, pos_oran[pid]) for pid, brut in t["pos"].items()],
+            )
+            for t in temiz
+        ])
+
+        tarihler = sorted({t["anahtar"][0] for t in temiz})
+        for tarih in tarihler:
+            gunu_sil(tarih)
+            ay_sil(tarih)
+
+        db.session.commit()
+    except TopluHata:
+        db.session.rollback()
+        raise
+    except IntegrityError:
+        # aynı anahtara eşzamanlı ilk kayıt
+        db.session.rollback()
+        raise TopluHata([(None, CAKISMA_MESAJI)])
+    except OperationalError:
+        db.session.rollback()
+        raise TopluHata([(None, "Veritabanı şu an meşgul. Birkaç saniye sonra tekrar kaydet.")])
+
+    return {"yeni": len(yeniler), "guncel": len(guncellenen), "tarihler": tarihler}
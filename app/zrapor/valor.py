@@ -0,0 +1,173 @@
+"""
+Banka valör tahmini: POS net tutarları banka + valör tarihi bazında.
+
+Satış günü + banka başına brüt/komisyon tek GROUP BY sorgusuyla (sıcak DB +
+gerekli yıl arşivleri, UNION ALL) hesaplanır. Kapanmış günlerin sonucu
+valor_gunluk tablosunda saklanır; bugün ve sonrası her seferinde canlı
+hesaplanır. Z kaydı/taslak, o günün önbelleğini kendi transaction'ında siler
+(gunu_sil). Valör tarihi banka ayarından (valor_gun, valor_is_gunu) okuma
+anında hesaplanır, ayar değişikliği önbelleği bozmaz.
+
+Komisyon, komisyon_hesapla ile aynı şekilde satır başına kuruşa yuvarlanır
+(ROUND_HALF_EVEN, tamsayı aritmetiği).
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from sqlalchemy import bindparam, delete, insert, select, text
+
+from ..extensions import db
+from ..models import Banka, ValorGunluk, ValorGunu
+from . import arsiv
+from .sorgular import rapor_baglantisi
+
+# kuruş * on-binde -> komisyon kuruşu (banker yuvarlaması)
+_KOMISYON_KURUS = (
+    "CASE WHEN b > 0 AND o > 0 THEN (b * o) / 10000 + "
+    "CASE WHEN (b * o) % 10000 > 5000 OR ((b * o) % 10000 = 5000 AND ((b * o) / 10000) % 2 = 1) "
+    "THEN 1 ELSE 0 END ELSE 0 END"
+)
+
+
+def valor_tarihi(tarih: date, gun: int, is_gunu: bool) -> date:
+    """
+    Satış günü -> paranın hesaba geçeceği gün.
+    is_gunu: cumartesi/pazar sayılmaz; hafta sonuna düşen valör pazartesiye kayar.
+    """
+    if not is_gunu:
+        return tarih + timedelta(days=gun)
+    d = tarih
+    kalan = gun
+    while kalan > 0:
+        d += timedelta(days=1)
+        if d.weekday() < 5:
+            kalan -= 1
+    while d.weekday() >= 5:
+        d += timedelta(days=1)
+    return d
+
+
+def _gunluk_sorgusu(semalar):
+    parcalar = [
+        f"SELECT z.tarih AS tarih, p.banka_id AS banka_id, "
+        f"CAST(ROUND(ps.brut_tutar * 100) AS INTEGER) AS b, "
+        f"CAST(ROUND(p.komisyon_orani * 10000) AS INTEGER) AS o "
+        f"FROM {sema}.z_pos_satirlari ps "
+        f"JOIN {sema}.z_raporlari z ON z.id = ps.z_raporu_id "
+        f"JOIN main.pos_cihazlari p ON p.id = ps.pos_cihaz_id "
+        f"WHERE z.tarih IN :tarihler"
+        for _, sema in semalar
+    ]
+    sql = (
+        f"SELECT tarih, banka_id, SUM(b) AS brut, SUM({_KOMISYON_KURUS}) AS komisyon "
+        f"FROM ({' UNION ALL '.join(parcalar)}) GROUP BY tarih, banka_id"
+    )
+    return text(sql).bindparams(bindparam("tarihler", expanding=True, type_=db.Date)).columns(tarih=db.Date)
+
+
+def _kurus(v) -> Decimal:
+    return (Decimal(int(v or 0)) / 100).quantize(Decimal("0.00"))
+
+
+def _gunluk_toplamlar(bas: date, son: date) -> dict:
+    """
+    Satış günü aralığı için {(tarih, banka_id): (brut, komisyon)}.
+    Kapanmış ve önbellekte olmayan günler hesaplanıp aynı write transaction'da yazılır.
+    """
+    bugun = date.today()
+    sonuc = {}
+
+    hazir = set(db.session.scalars(
+        select(ValorGunu.tarih).where(ValorGunu.tarih >= bas, ValorGunu.tarih <= son)
+    ))
+    for r in db.session.execute(
+        select(ValorGunluk.tarih, ValorGunluk.banka_id, ValorGunluk.brut, ValorGunluk.komisyon)
+        .where(ValorGunluk.tarih >= bas, ValorGunluk.tarih <= son)
+    ):
+        if r.tarih in hazir:
+            sonuc[(r.tarih, r.banka_id)] = (r.brut, r.komisyon)
+
+    gunler = [bas + timedelta(days=i) for i in range((son - bas).days + 1)]
+    eksik = [g for g in gunler if g < bugun and g not in hazir]
+    acik = [g for g in gunler if g >= bugun]
+    if not eksik and not acik:
+        return sonuc
+
+    sorgu_gunleri = eksik + acik
+    yillar = arsiv.aralik_arsivleri(sorgu_gunleri[0], sorgu_gunleri[-1])
+    with rapor_baglantisi(yillar, yazma=bool(eksik)) as (conn, semalar):
+        if eksik:
+            # Z yazanlarla sıralı: hesap + önbellek yazımı arasında gün değişemez
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+        satirlar = conn.execute(_gunluk_sorgusu(semalar), {"tarihler": sorgu_gunleri}).all()
+
+        yeni = []
+        for tarih, banka_id, brut, komisyon in satirlar:
+            sonuc[(tarih, banka_id)] = (_kurus(brut), _kurus(komisyon))
+            if tarih < bugun:
+                yeni.append({"tarih": tarih, "banka_id": banka_id,
+                             "brut": _kurus(brut), "komisyon": _kurus(komisyon)})
+
+        if eksik:
+            conn.execute(delete(ValorGunluk).where(ValorGunluk.tarih.in_(eksik)))
+            if yeni:
+                conn.execute(insert(ValorGunluk), yeni)
+            conn.execute(insert(ValorGunu).prefix_with("OR IGNORE"), [{"tarih": g} for g in eksik])
+            conn.commit()
+
+    return sonuc
+
+
+def valor_raporu(start: date, end: date) -> dict:
+    """
+    Valör tarihi [start, end] aralığına düşen tahsilatlar.
+    dönüş: {"satirlar": [{valor, banka, brut, komisyon, net, gerceklesti}],
+            "bankalar": [{banka, brut, komisyon, net}], "toplam": {...}}
+    """
+    bankalar = {b.id: b for b in Banka.query.all()}
+    en_uzun = max((b.valor_gun for b in bankalar.values()), default=1)
+    # iş günü valörü takvimde ~7/5 kat uzar; hafta sonu kayması için pay
+    satis_bas = start - timedelta(days=en_uzun * 7 // 5 + 4)
+
+    toplamlar = {}
+    for (tarih, banka_id), (brut, komisyon) in _gunluk_toplamlar(satis_bas, end).items():
+        banka = bankalar.get(banka_id)
+        vt = valor_tarihi(tarih, banka.valor_gun, banka.valor_is_gunu) if banka else tarih
+        if not (start <= vt <= end):
+            continue
+        t = toplamlar.setdefault((vt, banka_id), [Decimal("0.00"), Decimal("0.00")])
+        t[0] += brut
+        t[1] += komisyon
+
+    def _ad(banka_id):
+        return bankalar[banka_id].ad if banka_id in bankalar else "Banka tanımsız"
+
+    bugun = date.today()
+    satirlar = []
+    banka_top = {}
+    toplam = {"brut": Decimal("0.00"), "komisyon": Decimal("0.00"), "net": Decimal("0.00")}
+    for (vt, banka_id), (brut, komisyon) in sorted(toplamlar.items(), key=lambda x: (x[0][0], _ad(x[0][1]))):
+        satir = {"valor": vt, "banka": _ad(banka_id), "brut": brut, "komisyon": komisyon,
+                 "net": brut - komisyon, "gerceklesti": vt <= bugun}
+        satirlar.append(satir)
+        bt = banka_top.setdefault(satir["banka"], {"banka": satir["banka"], "brut": Decimal("0.00"),
+                                                    "komisyon": Decimal("0.00"), "net": Decimal("0.00")})
+        for k in ("brut", "komisyon", "net"):
+            bt[k] += satir[k]
+            toplam[k] += satir[k]
+
+    return {"satirlar": satirlar, "bankalar": sorted(banka_top.values(), key=lambda b: b["banka"]),
+            "toplam": toplam}
+
+
+def gunu_sil(tarih: date):
+    """Z yazma transaction'ı içinde: bu satış gününün önbelleği (commit çağıranda)."""
+    db.session.execute(delete(ValorGunluk).where(ValorGunluk.tarih == tarih))
+    db.session.execute(delete(ValorGunu).where(ValorGunu.tarih == tarih))
+
+
+def temizle():
+    """Tüm valör önbelleği (POS silme gibi geçmişi etkileyen tanım değişiklikleri)."""
+    db.session.execute(delete(ValorGunluk))
+    db.session.execute(delete(ValorGunu))
+    db.session.commit()
@@ -0,0 +1,40 @@
+"""
+Prod başlatıcı: gunicorn -c gunicorn.conf.py wsgi:app
+
+Uygulama master'da BİR kez yüklenir (preload_app), worker'lar fork ile çoğalır.
+DB kurulumu burada yapılmaz; deploy öncesi bir kez: flask --app wsgi kurulum
+"""
+import os
+import time
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", "4"))
+# Canlı akış (SSE) bağlantıları boşta bekler: sync worker yerine thread havuzu.
+# Akışlar worker başına CANLI_MAX_AKIS thread ile sınırlı, kalanı kayıt isteklerine kalır.
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "16"))
+preload_app = True
+
+_t0 = time.perf_counter()
+
+
+def when_ready(server):
+    app = server.app.wsgi()
+    server.log.info(
+        "app hazır: create_app %.1f ms, master başlangıç %.1f ms",
+        app.config.get("CREATE_APP_MS", 0.0),
+        (time.perf_counter() - _t0) * 1000,
+    )
+
+
+def post_fork(server, worker):
+    # Master'dan kalan havuz bağlantıları worker'lar arasında paylaşılmasın
+    from app.extensions import db
+
+    app = server.app.wsgi()
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    worker.log.info("worker %s hazır (%.1f ms)", worker.pid, (time.perf_counter() - _t0) * 1000)
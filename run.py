@@ -1,6 +1,9 @@
-from app import create_app
+from app import create_app, bootstrap_db
 
 app = create_app()
 
 if __name__ == "__main__":
+    # Geliştirme: tek process, kurulumu burada yap (prod: flask kurulum + gunicorn)
+    with app.app_context():
+        bootstrap_db()
     app.run(debug=True)
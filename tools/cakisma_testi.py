@@ -0,0 +1,148 @@
+"""
+Z kaydı eşzamanlılık testi: aynı (tarih, kasa, vardiya) Z'sine çok sayıda
+thread'den aynı anda taslak + tam kayıt gönderir.
+
+    python tools/cakisma_testi.py --thread 16 --tekrar 25
+
+Geçici bir SQLite DB kullanır (instance/atik.db'ye dokunmaz). Kontroller:
+- hiçbir istek 500 dönmez (unique ihlali / StaleDataError yakalanır)
+- son sürüm = başarılı yazma sayısı (her yazma sürümü tam 1 artırır)
+- sürümsüz kayıt mevcut Z'nin üzerine yazmaz (en fazla Z'yi ilk açan olabilir)
+- Z başına KDV kodu / POS cihazı için en fazla bir satır
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+from pathlib import Path
+
+KOK = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(KOK))
+
+TARIH = "2026-01-15"
+
+
+def hazirla():
+    from app import bootstrap_db, create_app
+    from app.extensions import db
+    from app.models import Banka, Kasa, Kasiyer, PosCihazi
+
+    app = create_app()
+    app.config["WTF_CSRF_ENABLED"] = False
+    with app.app_context():
+        bootstrap_db()
+        db.session.add(Kasa(kasa_no=1))
+        db.session.add(Banka(ad="Test"))
+        db.session.add(Kasiyer(ad="Test"))
+        db.session.flush()
+        for i in range(1, 4):
+            db.session.add(PosCihazi(pos_no=f"P{i}", ad=f"POS-{i}", banka_id=1, komisyon_orani=Decimal("0.02")))
+        db.session.commit()
+    return app
+
+
+def isci(app, no, tekrar, sayac, kilit):
+    c = app.test_client()
+    c.post("/auth/login", data={"email": "admin@atik.local", "password": "123"})
+    yerel = Counter()
+    anahtar = {"tarih": TARIH, "kasa_id": "1", "vardiya": "1", "kasiyer_id": "1"}
+
+    for i in range(tekrar):
+        tutar = f"{random.randint(1, 9999)},00"
+
+        # 0) form gibi: anahtar seçilince güncel sürümü yükle (Z yoksa 0)
+        r = c.get("/z-giris/surum", query_string=anahtar)
+        surum = str(r.get_json()["surum"]) if r.status_code == 200 else ""
+
+        # 1) taslak: tek alan, yüklenen sürümle; dönen sürümü "gördüğümüz" sürüm say
+        r = c.post("/z-giris/taslak", json=dict(anahtar, surum=surum, alanlar={"fis_ciro": tutar}))
+        if r.status_code == 200:
+            j = r.get_json()
+            surum = str(j["surum"])
+            yerel["taslak_yazdi" if j["degisen"] else "taslak_degismedi"] += 1
+        elif r.status_code == 409:
+            yerel["taslak_cakisma"] += 1
+        else:
+            yerel[f"taslak_{r.status_code}"] += 1
+
+        # 2) tam kayıt: yarısı gördüğümüz sürümle, yarısı sürümsüz (mevcut Z'ye yazamamalı)
+        form = dict(anahtar, fis_ciro=tutar, kdv_KDV20=tutar, pos_1=tutar, pos_2="0")
+        if i % 2 == 0:
+            form["surum"] = surum
+        r = c.post("/z-giris", data=form)
+        if r.status_code != 302:
+            yerel[f"kayit_{r.status_code}"] += 1
+        elif "/raporlar/" in r.headers["Location"]:
+            yerel["kayit_cakisma" if i % 2 == 0 else "kayit_surumsuz_red"] += 1
+        else:
+            yerel["kayit_yazdi" if i % 2 == 0 else "kayit_surumsuz_yazdi"] += 1
+
+    with kilit:
+        sayac.update(yerel)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--thread", type=int, default=16)
+    ap.add_argument("--tekrar", type=int, default=25)
+    args = ap.parse_args()
+
+    gecici = tempfile.mkdtemp(prefix="atik_cakisma_")
+    os.environ["ATIK_DB_YOLU"] = os.path.join(gecici, "atik.db")
+    os.environ["ARSIV_DIZINI"] = os.path.join(gecici, "arsiv")
+    os.environ["RAPOR_ONBELLEK"] = "bellek"
+    app = hazirla()
+
+    sayac = Counter()
+    kilit = threading.Lock()
+    t0 = time.perf_counter()
+    threadler = [
+        threading.Thread(target=isci, args=(app, n, args.tekrar, sayac, kilit))
+        for n in range(args.thread)
+    ]
+    for t in threadler:
+        t.start()
+    for t in threadler:
+        t.join()
+    sure = time.perf_counter() - t0
+
+    from app.extensions import db
+    from app.models import ZKdvSatiri, ZPosSatiri, ZRaporu
+
+    with app.app_context():
+        z = ZRaporu.query.filter_by(vardiya=1).one()
+        kdv = Counter(k.oran_kodu for k in ZKdvSatiri.query.filter_by(z_raporu_id=z.id))
+        pos = Counter(p.pos_cihaz_id for p in ZPosSatiri.query.filter_by(z_raporu_id=z.id))
+        surum = z.surum
+        db.session.remove()
+
+    istek = args.thread * args.tekrar * 2
+    print(f"{istek} istek, {sure:.1f} sn ({istek / sure:.0f} istek/sn)")
+    for ad, adet in sorted(sayac.items()):
+        print(f"  {ad}: {adet}")
+
+    yazma = sayac["taslak_yazdi"] + sayac["kayit_yazdi"] + sayac["kayit_surumsuz_yazdi"]
+    hatalar = []
+    if any(ad.endswith(("_500", "_400")) for ad in sayac):
+        hatalar.append("beklenmeyen HTTP durumu")
+    if sayac["kayit_surumsuz_yazdi"] > 1:
+        hatalar.append("sürümsüz kayıt mevcut Z'nin üzerine yazdı")
+    if surum != yazma:
+        hatalar.append(f"sürüm {surum} != başarılı yazma {yazma}")
+    if any(a > 1 for a in kdv.values()) or any(a > 1 for a in pos.values()):
+        hatalar.append(f"tekrarlanan satır: kdv={dict(kdv)} pos={dict(pos)}")
+
+    print(f"son sürüm: {surum}")
+    if hatalar:
+        print("HATA: " + "; ".join(hatalar))
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
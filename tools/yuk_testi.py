@@ -0,0 +1,374 @@
+"""
+Uçtan uca yük testi: tohumlanmış geçici SQLite DB + yerel gunicorn (çok worker).
+
+    python tools/yuk_testi.py --magaza 6 --muhasebe 4 --admin 1 --sure 30
+
+Sanal kullanıcılar (thread) gerçek HTTP ile çalışır, yönlendirmeleri izler (PRG):
+- magaza:   /z-giris yükler, Z kaydeder (kendi kasası, bugün, vardiya 1-2)
+- muhasebe: /raporlar (son 7 gün / bu ay / geçen ay / rastgele aralık) ve rapor detayı
+- admin:    tanımlamalar sayfası + kasiyer aktif/pasif
+
+Rapor: işlem başına adet, istek/sn, p50/p99 (ms), hata (5xx), kilit bekleme
+("Veritabanı şu an meşgul"), sürüm çakışması; gunicorn toplam/worker tepe RSS.
+instance/ altındaki DB ve önbelleğe dokunmaz.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from datetime import date, timedelta
+from pathlib import Path
+
+KOK = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(KOK))
+
+KASA = 6
+POS = 6
+KILIT_METNI = "Veritabanı şu an meşgul"
+CAKISMA_METNI = "başka biri tarafından kaydedildi"
+CSRF_RE = re.compile(r'name="csrf_token" value="([^"]+)"')
+
+
+# ---------------- tohum ----------------
+
+def tohumla(gun):
+    """Geçici DB'ye gun x KASA x 2 vardiya Z (KDV + POS satırlarıyla)."""
+    from app import bootstrap_db, create_app
+    from app.extensions import db
+    from app.models import Banka, Kasa, Kasiyer, PosCihazi, ZKdvSatiri, ZPosSatiri, ZRaporu
+
+    app = create_app()
+    rnd = random.Random(1)
+    with app.app_context():
+        bootstrap_db()
+        db.session.add_all([Kasa(kasa_no=i, fm_no=f"FM{i:04d}") for i in range(1, KASA + 1)])
+        db.session.add_all([Banka(ad=ad) for ad in ("Garanti", "YKB", "İş")])
+        db.session.add_all([Kasiyer(ad=ad) for ad in ("Ali", "Ayşe", "Veli", "Yük")])
+        db.session.flush()
+        db.session.add_all([
+            PosCihazi(pos_no=f"P{i}", ad=f"POS-{i}", banka_id=(i % 3) + 1, komisyon_orani="0.0250")
+            for i in range(1, POS + 1)
+        ])
+        db.session.commit()
+
+        d0 = date.today() - timedelta(days=gun)
+        basliklar = []
+        for g in range(gun):
+            d = d0 + timedelta(days=g)
+            for k in range(1, KASA + 1):
+                for v in (1, 2):
+                    basliklar.append({
+                        "tarih": d, "kasa_id": k, "vardiya": v, "kasiyer_id": 1, "status": "draft",
+                        "fis_ciro": rnd.randint(1000, 50000), "fatura_ciro": rnd.randint(0, 5000),
+                        "iade_tutar": rnd.randint(0, 300), "surum": 1, "created_by": "admin@atik.local",
+                    })
+        db.session.execute(ZRaporu.__table__.insert(), basliklar)
+        ids = db.session.scalars(db.select(ZRaporu.id).order_by(ZRaporu.id)).all()
+
+        kdv, pos = [], []
+        for z_id, b in zip(ids, basliklar):
+            nihai = b["fis_ciro"] + b["fatura_ciro"] - b["iade_tutar"]
+            kdv.append({"z_raporu_id": z_id, "oran_kodu": "KDV20", "matrah": nihai})
+            pos.append({"z_raporu_id": z_id, "pos_cihaz_id": b["kasa_id"], "brut_tutar": nihai // 2})
+        db.session.execute(ZKdvSatiri.__table__.insert(), kdv)
+        db.session.execute(ZPosSatiri.__table__.insert(), pos)
+        db.session.commit()
+        kasiyer_id = db.session.scalar(db.select(Kasiyer.id).where(Kasiyer.ad == "Yük"))
+        db.engine.dispose()
+    return ids[0], ids[-1], kasiyer_id
+
+
+# ---------------- sunucu ----------------
+
+def bos_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def sunucu_baslat(env, port, zaman_asimi=30):
+    log = open(Path(env["YUK_DIZINI"]) / "gunicorn.log", "w")
+    p = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+        cwd=KOK, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    son = time.time() + zaman_asimi
+    while time.time() < son:
+        if p.poll() is not None:
+            raise SystemExit(f"gunicorn başlamadı, bkz. {log.name}")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/auth/login", timeout=1)
+            return p
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    p.terminate()
+    raise SystemExit("gunicorn zaman aşımı")
+
+
+def _rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for satir in f:
+                if satir.startswith("VmRSS:"):
+                    return int(satir.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _cocuklar(pid):
+    sonuc = []
+    for d in os.listdir("/proc"):
+        if not d.isdigit():
+            continue
+        try:
+            with open(f"/proc/{d}/stat") as f:
+                if int(f.read().rsplit(")", 1)[1].split()[1]) == pid:
+                    sonuc.append(int(d))
+        except (OSError, IndexError, ValueError):
+            pass
+    return sonuc
+
+
+class RssIzleyici(threading.Thread):
+    """gunicorn master + worker'ların RSS'ini örnekler (Linux /proc)."""
+
+    def __init__(self, pid, aralik=0.25):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.aralik = aralik
+        self.dur = threading.Event()
+        self.tepe_toplam = 0
+        self.tepe_worker = 0
+
+    def run(self):
+        while not self.dur.is_set():
+            isciler = [_rss_kb(c) for c in _cocuklar(self.pid)]
+            self.tepe_toplam = max(self.tepe_toplam, _rss_kb(self.pid) + sum(isciler))
+            self.tepe_worker = max([self.tepe_worker, *isciler])
+            self.dur.wait(self.aralik)
+
+
+# ---------------- istemci ----------------
+
+class Istemci:
+    def __init__(self, taban, eposta):
+        self.taban = taban
+        self.acici = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+        )
+        self.csrf = None
+        self._giris(eposta)
+
+    def istek(self, yol, veri=None):
+        """dönüş: (durum, gövde, ms) — yönlendirmeler izlenir"""
+        govde = urllib.parse.urlencode(veri).encode() if veri is not None else None
+        t0 = time.perf_counter()
+        try:
+            with self.acici.open(self.taban + yol, data=govde, timeout=60) as r:
+                icerik = r.read().decode("utf-8", "replace")
+                durum = r.status
+        except urllib.error.HTTPError as e:
+            icerik, durum = e.read().decode("utf-8", "replace"), e.code
+        except (urllib.error.URLError, ConnectionError, TimeoutError) as e:
+            icerik, durum = str(e), 599
+        return durum, icerik, (time.perf_counter() - t0) * 1000
+
+    def _giris(self, eposta):
+        _, html, _ = self.istek("/auth/login")
+        self.csrf = CSRF_RE.search(html).group(1)
+        self.istek("/auth/login", {"csrf_token": self.csrf, "email": eposta, "password": "123"})
+
+
+class Olcum:
+    def __init__(self):
+        self.kilit = threading.Lock()
+        self.sureler = defaultdict(list)
+        self.hata = defaultdict(int)
+        self.kilit_bekleme = defaultdict(int)
+        self.cakisma = defaultdict(int)
+
+    def kaydet(self, islem, sonuc):
+        durum, icerik, ms = sonuc
+        with self.kilit:
+            self.sureler[islem].append(ms)
+            if durum >= 500:
+                self.hata[islem] += 1
+                if "database is locked" in icerik:
+                    self.kilit_bekleme[islem] += 1
+            elif KILIT_METNI in icerik:
+                self.kilit_bekleme[islem] += 1
+            elif CAKISMA_METNI in icerik:
+                self.cakisma[islem] += 1
+
+
+def magaza(ist, olcum, bitis, no, dusunme, _ctx):
+    kasa_id = (no % KASA) + 1
+    rnd = random.Random(no)
+    while time.time() < bitis:
+        olcum.kaydet("magaza: z-giris", ist.istek("/z-giris"))
+        tutar = rnd.randint(1000, 50000)
+        anahtar = {"tarih": date.today().isoformat(), "kasa_id": kasa_id, "vardiya": rnd.choice((1, 2))}
+        # form gibi: anahtar seçilince düzenlenen sürüm yüklenir
+        sonuc = ist.istek("/z-giris/surum?" + urllib.parse.urlencode(anahtar))
+        olcum.kaydet("magaza: surum", sonuc)
+        surum = json.loads(sonuc[1]).get("surum", "") if sonuc[0] == 200 else ""
+        form = {
+            "csrf_token": ist.csrf, **anahtar, "kasiyer_id": 1, "surum": surum,
+            "fis_ciro": f"{tutar},00", "kdv_KDV20": f"{tutar},00", f"pos_{kasa_id}": f"{tutar // 2},00",
+        }
+        olcum.kaydet("magaza: kaydet", ist.istek("/z-giris", form))
+        time.sleep(dusunme)
+
+
+def muhasebe(ist, olcum, bitis, no, dusunme, ctx):
+    rnd = random.Random(1000 + no)
+    bugun = date.today()
+    ay_basi = bugun.replace(day=1)
+    gecen_ay_son = ay_basi - timedelta(days=1)
+    araliklar = [
+        (bugun - timedelta(days=6), bugun),
+        (ay_basi, bugun),
+        (gecen_ay_son.replace(day=1), gecen_ay_son),
+    ]
+    while time.time() < bitis:
+        if rnd.random() < 0.8:
+            bas, son = rnd.choice(araliklar)
+        else:
+            son = bugun - timedelta(days=rnd.randint(0, ctx["gun"]))
+            bas = son - timedelta(days=rnd.randint(0, 60))
+        olcum.kaydet("muhasebe: raporlar", ist.istek(f"/raporlar?start={bas}&end={son}"))
+        z_id = rnd.randint(ctx["ilk_id"], ctx["son_id"])
+        olcum.kaydet("muhasebe: detay", ist.istek(f"/raporlar/{z_id}"))
+        time.sleep(dusunme)
+
+
+def admin(ist, olcum, bitis, no, dusunme, ctx):
+    while time.time() < bitis:
+        olcum.kaydet("admin: tanımlamalar", ist.istek("/admin/tanimlamalar"))
+        olcum.kaydet(
+            "admin: kasiyer değiştir",
+            ist.istek(f"/admin/kasiyerler/toggle/{ctx['kasiyer_id']}", {"csrf_token": ist.csrf}),
+        )
+        time.sleep(dusunme)
+
+
+SENARYOLAR = {
+    "magaza": (magaza, "admin@atik.local"),
+    "muhasebe": (muhasebe, "muhasebe@atik.local"),
+    "admin": (admin, "admin@atik.local"),
+}
+
+
+def _yuzdelik(sirali, p):
+    if not sirali:
+        return 0.0
+    return sirali[min(len(sirali) - 1, int(round(p / 100 * (len(sirali) - 1))))]
+
+
+def rapor(olcum, sure, rss):
+    satirlar = []
+    print(f"\n{'işlem':<26}{'adet':>7}{'ist/sn':>9}{'p50 ms':>9}{'p99 ms':>9}{'5xx':>6}{'kilit':>7}{'çakışma':>9}")
+    for islem in sorted(olcum.sureler):
+        s = sorted(olcum.sureler[islem])
+        satir = {
+            "islem": islem, "adet": len(s), "ist_sn": len(s) / sure,
+            "p50": _yuzdelik(s, 50), "p99": _yuzdelik(s, 99),
+            "hata": olcum.hata[islem], "kilit": olcum.kilit_bekleme[islem], "cakisma": olcum.cakisma[islem],
+        }
+        satirlar.append(satir)
+        print(f"{islem:<26}{satir['adet']:>7}{satir['ist_sn']:>9.1f}{satir['p50']:>9.1f}"
+              f"{satir['p99']:>9.1f}{satir['hata']:>6}{satir['kilit']:>7}{satir['cakisma']:>9}")
+    toplam = sum(r["adet"] for r in satirlar)
+    print(f"\ntoplam {toplam} istek, {toplam / sure:.1f} istek/sn ({sure:.0f} sn)")
+    print(f"tepe RSS: toplam {rss.tepe_toplam / 1024:.1f} MB, worker başına {rss.tepe_worker / 1024:.1f} MB")
+    return {"sure": sure, "islemler": satirlar,
+            "rss_toplam_kb": rss.tepe_toplam, "rss_worker_kb": rss.tepe_worker}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--magaza", type=int, default=6, help="Z giren mağaza kullanıcısı")
+    ap.add_argument("--muhasebe", type=int, default=4, help="rapor gezen muhasebeci")
+    ap.add_argument("--admin", type=int, default=1, help="tanımlama düzenleyen admin")
+    ap.add_argument("--sure", type=float, default=30, help="ölçüm süresi (sn)")
+    ap.add_argument("--dusunme", type=float, default=0.0, help="kullanıcı başına istekler arası bekleme (sn)")
+    ap.add_argument("--gun", type=int, default=365, help="tohum verisi gün sayısı")
+    ap.add_argument("--isci", type=int, default=4, help="gunicorn worker sayısı")
+    ap.add_argument("--thread", type=int, default=16, help="worker başına thread")
+    ap.add_argument("--onbellek", default="sqlite", choices=("sqlite", "bellek", "kapali"))
+    ap.add_argument("--json", help="sonuçları bu dosyaya da yaz")
+    ap.add_argument("--sakla", action="store_true", help="geçici dizini silme")
+    args = ap.parse_args()
+
+    dizin = Path(tempfile.mkdtemp(prefix="atik_yuk_"))
+    port = bos_port()
+    env = dict(
+        os.environ,
+        YUK_DIZINI=str(dizin),
+        ATIK_DB_YOLU=str(dizin / "atik.db"),
+        ARSIV_DIZINI=str(dizin / "arsiv"),
+        RAPOR_ONBELLEK=args.onbellek,
+        RAPOR_ONBELLEK_YOLU=str(dizin / "onbellek.db"),
+        GUNICORN_BIND=f"127.0.0.1:{port}",
+        GUNICORN_WORKERS=str(args.isci),
+        GUNICORN_THREADS=str(args.thread),
+    )
+    os.environ.update(env)
+
+    t0 = time.perf_counter()
+    ilk_id, son_id, kasiyer_id = tohumla(args.gun)
+    print(f"tohum: {son_id - ilk_id + 1} Z, {time.perf_counter() - t0:.1f} sn -> {dizin}")
+    ctx = {"ilk_id": ilk_id, "son_id": son_id, "kasiyer_id": kasiyer_id, "gun": args.gun}
+
+    sunucu = sunucu_baslat(env, port)
+    rss = RssIzleyici(sunucu.pid)
+    rss.start()
+    try:
+        taban = f"http://127.0.0.1:{port}"
+        olcum = Olcum()
+        kullanicilar = []
+        for ad, adet in (("magaza", args.magaza), ("muhasebe", args.muhasebe), ("admin", args.admin)):
+            fn, eposta = SENARYOLAR[ad]
+            kullanicilar += [(fn, Istemci(taban, eposta), n) for n in range(adet)]
+
+        bas = time.time()
+        bitis = bas + args.sure
+        threadler = [
+            threading.Thread(target=fn, args=(ist, olcum, bitis, n, args.dusunme, ctx))
+            for fn, ist, n in kullanicilar
+        ]
+        for t in threadler:
+            t.start()
+        for t in threadler:
+            t.join()
+        sonuc = rapor(olcum, time.time() - bas, rss)
+    finally:
+        rss.dur.set()
+        sunucu.terminate()
+        sunucu.wait(10)
+
+    sonuc["ayar"] = vars(args)
+    if args.json:
+        Path(args.json).write_text(json.dumps(sonuc, ensure_ascii=False, indent=2), encoding="utf-8")
+    if args.sakla:
+        print(f"geçici dizin: {dizin}")
+    else:
+        shutil.rmtree(dizin, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()